@@ -1,7 +1,7 @@
 # [h] transform all open fonts
 
 import hTools2.dialogs.all_fonts.actions
-import importlib
-importlib.reload(hTools2.dialogs.all_fonts.actions)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.all_fonts.actions)
 
 hTools2.dialogs.all_fonts.actions.actionsDialog()
@@ -1,7 +1,7 @@
 # [h] genenerate all open fonts
 
 import hTools2.dialogs.all_fonts.generate
-import importlib
-importlib.reload(hTools2.dialogs.all_fonts.generate)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.all_fonts.generate)
 
 hTools2.dialogs.all_fonts.generate.generateAllFontsDialog()
@@ -1,7 +1,7 @@
 # [h] apply actions
 
 import hTools2.dialogs.folder.actions
-import importlib
-importlib.reload(hTools2.dialogs.folder.actions)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.folder.actions)
 
 hTools2.dialogs.folder.actions.actionsFolderDialog()
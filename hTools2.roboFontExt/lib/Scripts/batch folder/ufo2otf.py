@@ -1,7 +1,7 @@
 # [h] batch generate otfs from folder
 
 import hTools2.dialogs.folder.ufo2otf
-import importlib
-importlib.reload(hTools2.dialogs.folder.ufo2otf)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.folder.ufo2otf)
 
 hTools2.dialogs.folder.ufo2otf.UFOsToOTFsDialog()
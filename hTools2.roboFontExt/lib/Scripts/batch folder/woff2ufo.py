@@ -1,7 +1,7 @@
 # [h] convert woffs to ufos
 
 import hTools2.dialogs.folder.woff2ufo
-import importlib
-importlib.reload(hTools2.dialogs.folder.woff2ufo)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.folder.woff2ufo)
 
 hTools2.dialogs.folder.woff2ufo.WOFFsToUFOsDialog()
@@ -1,7 +1,7 @@
 # [h] batch rename glyphs
 
 import hTools2.dialogs.font.glyphs_rename
-import importlib
-importlib.reload(hTools2.dialogs.font.glyphs_rename)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.font.glyphs_rename)
 
 hTools2.dialogs.font.glyphs_rename.batchRenameGlyphs()
@@ -1,7 +1,7 @@
 # [h] create space glyphs
 
 import hTools2.dialogs.font.spaces_create
-import importlib
-importlib.reload(hTools2.dialogs.font.spaces_create)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.font.spaces_create)
 
 hTools2.dialogs.font.spaces_create.createSpaceGlyphsDialog()
@@ -1,8 +1,8 @@
 # [h] diacritics coverage dialog
 
 import hTools2.modules.languages
-import importlib
-importlib.reload(hTools2.modules.languages)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.modules.languages)
 
 # imports
 
@@ -1,7 +1,7 @@
 # [h] print groups in different formats
 
 import hTools2.dialogs.font.groups_print
-import importlib
-importlib.reload(hTools2.dialogs.font.groups_print)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.font.groups_print)
 
 hTools2.dialogs.font.groups_print.printGroupsDialog()
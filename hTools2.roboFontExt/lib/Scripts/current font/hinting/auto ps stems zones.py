@@ -1,6 +1,6 @@
 import hTools2.modules.pshinting
-import importlib
-importlib.reload(hTools2.modules.pshinting)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.modules.pshinting)
 
 from hTools2.modules.pshinting import set_stems, set_bluezones
 
@@ -1,7 +1,7 @@
 # [h] transfer info from one font to another
 
 import hTools2.dialogs.font.info_copy
-import importlib
-importlib.reload(hTools2.dialogs.font.info_copy)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.font.info_copy)
 
 hTools2.dialogs.font.info_copy.copyFontInfoDialog()
@@ -1,7 +1,7 @@
 # [h] print font info
 
 import hTools2.dialogs.font.info_print
-import importlib
-importlib.reload(hTools2.dialogs.font.info_print)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.font.info_print)
 
 hTools2.dialogs.font.info_print.clearFontInfoDialog()
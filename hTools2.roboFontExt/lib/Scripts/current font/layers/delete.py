@@ -1,7 +1,7 @@
 # [h] delete layer
 
 import hTools2.dialogs.font.layer_delete
-import importlib
-importlib.reload(hTools2.dialogs.font.layer_delete)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.font.layer_delete)
 
 hTools2.dialogs.font.layer_delete.deleteLayerDialog()
@@ -1,7 +1,7 @@
 # [h] adjust vertical metrics
 
 import hTools2.dialogs.font.vmetrics_adjust
-import importlib
-importlib.reload(hTools2.dialogs.font.vmetrics_adjust)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.font.vmetrics_adjust)
 
 hTools2.dialogs.font.vmetrics_adjust.adjustVerticalMetrics()
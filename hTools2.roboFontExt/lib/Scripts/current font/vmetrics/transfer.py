@@ -1,7 +1,7 @@
 # [h] transfer vmetrics
 
 import hTools2.dialogs.font.vmetrics_transfer
-import importlib
-importlib.reload(hTools2.dialogs.font.vmetrics_transfer)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.font.vmetrics_transfer)
 
 hTools2.dialogs.font.vmetrics_transfer.transferVMetricsDialog()
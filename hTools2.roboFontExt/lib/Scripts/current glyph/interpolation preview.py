@@ -1,8 +1,8 @@
 # [h] preview interpolation with another font
 
 import hTools2.dialogs.glyph.interpolation_preview
-import importlib
-importlib.reload(hTools2.dialogs.glyph.interpolation_preview)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyph.interpolation_preview)
 
 from hTools2.dialogs.glyph.interpolation_preview import interpolationPreviewDialog
 
@@ -1,8 +1,8 @@
 # [h] interpolated nudge selected points
 
 import hTools2.dialogs.glyph.nudge
-import importlib
-importlib.reload(hTools2.dialogs.glyph.nudge)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyph.nudge)
 
 from hTools2.dialogs.glyph.nudge import nudgePointsDialog
 
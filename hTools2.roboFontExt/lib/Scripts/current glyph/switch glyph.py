@@ -1,8 +1,8 @@
 # [h] switch glyph / layers / font
 
 import hTools2.dialogs.glyph.switch
-import importlib
-importlib.reload(hTools2.dialogs.glyph.switch)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyph.switch)
 
 from hTools2.dialogs.glyph.switch import switchGlyphDialog
 
@@ -1,7 +1,7 @@
 # [h] actions
 
 import hTools2.dialogs.glyphs.actions
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.actions)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.actions)
 
 hTools2.dialogs.glyphs.actions.glyphActionsDialog()
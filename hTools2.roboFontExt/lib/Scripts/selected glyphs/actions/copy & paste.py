@@ -1,7 +1,7 @@
 # [h] copy / paste
 
 import hTools2.dialogs.glyphs.copy_paste
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.copy_paste)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.copy_paste)
 
 hTools2.dialogs.glyphs.copy_paste.copyPasteGlyphDialog()
@@ -1,7 +1,7 @@
 # [h] create anchors
 
 import hTools2.dialogs.glyphs.anchors_create
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.anchors_create)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.anchors_create)
 
 hTools2.dialogs.glyphs.anchors_create.createAnchorsDialog()
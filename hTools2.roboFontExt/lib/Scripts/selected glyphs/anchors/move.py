@@ -1,7 +1,7 @@
 # [h] move anchors
 
 import hTools2.dialogs.glyphs.anchors_move
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.anchors_move)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.anchors_move)
 
 hTools2.dialogs.glyphs.anchors_move.moveAnchorsDialog()
@@ -1,7 +1,7 @@
 # [h] rename anchors
 
 import hTools2.dialogs.glyphs.anchors_rename
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.anchors_rename)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.anchors_rename)
 
 hTools2.dialogs.glyphs.anchors_rename.renameAnchorsDialog()
@@ -1,7 +1,7 @@
 # [h] transfer anchors dialog
 
 import hTools2.dialogs.glyphs.anchors_transfer
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.anchors_transfer)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.anchors_transfer)
 
 hTools2.dialogs.glyphs.anchors_transfer.transferAnchorsDialog()
@@ -1,7 +1,7 @@
 # [h] paint and select
 
 import hTools2.dialogs.glyphs.paint_select
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.paint_select)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.paint_select)
 
 hTools2.dialogs.glyphs.paint_select.paintGlyphsDialog()
@@ -3,8 +3,8 @@
 '''Remove components in selected glyphs.'''
 
 import hTools2.modules.glyphutils
-import importlib
-importlib.reload(hTools2.modules.glyphutils)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.modules.glyphutils)
 
 try:
     from mojo.roboFont import CurrentFont
@@ -3,8 +3,8 @@
 """Automatically set unicode values for selected glyphs."""
 
 import hTools2.modules.encoding
-import importlib
-importlib.reload(hTools2.modules.encoding)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.modules.encoding)
 
 # imports
 
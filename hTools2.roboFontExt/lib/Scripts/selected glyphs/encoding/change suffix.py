@@ -1,7 +1,7 @@
 # [h] change suffix in glyph names
 
 import hTools2.dialogs.glyphs.names_suffix
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.names_suffix)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.names_suffix)
 
 hTools2.dialogs.glyphs.names_suffix.changeSuffixDialog()
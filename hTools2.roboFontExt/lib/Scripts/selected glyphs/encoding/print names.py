@@ -1,7 +1,7 @@
 # [h] print selected glyphs
 
 import hTools2.dialogs.glyphs.names_print
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.names_print)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.names_print)
 
 hTools2.dialogs.glyphs.names_print.printGlyphsDialog()
@@ -1,7 +1,7 @@
 # [h] simple prepolate for selected glyphs
 
 import hTools2.dialogs.glyphs.interpolate_check
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.interpolate_check)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.interpolate_check)
 
 hTools2.dialogs.glyphs.interpolate_check.checkGlyphsCompatibilityDialog()
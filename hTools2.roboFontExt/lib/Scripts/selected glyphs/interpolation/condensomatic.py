@@ -1,7 +1,7 @@
 # [h] condensomatic
 
 import hTools2.dialogs.glyphs.interpolate_condense
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.interpolate_condense)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.interpolate_condense)
 
 hTools2.dialogs.glyphs.interpolate_condense.condenseGlyphsDialog()
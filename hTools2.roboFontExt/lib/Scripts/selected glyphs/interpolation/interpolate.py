@@ -1,7 +1,7 @@
 # [h] interpolate selected glyphs
 
 import hTools2.dialogs.glyphs.interpolate
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.interpolate)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.interpolate)
 
 hTools2.dialogs.glyphs.interpolate.interpolateGlyphsDialog()
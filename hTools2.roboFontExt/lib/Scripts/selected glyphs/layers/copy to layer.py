@@ -1,7 +1,7 @@
 # [h] copy to layer
 
 import hTools2.dialogs.glyphs.layers_copy
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.layers_copy)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.layers_copy)
 
 hTools2.dialogs.glyphs.layers_copy.copyToLayerDialog()
@@ -1,7 +1,7 @@
 # [h] copy to mask
 
 import hTools2.dialogs.glyphs.mask_copy
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.mask_copy)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.mask_copy)
 
 hTools2.dialogs.glyphs.mask_copy.copyToMaskDialog()
@@ -1,7 +1,7 @@
 # [h] copy glyphs to mask
 
 import hTools2.dialogs.glyphs.mask
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.mask)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.mask)
 
 hTools2.dialogs.glyphs.mask.maskDialog()
@@ -1,7 +1,7 @@
 # [h] copy side-bearings
 
 import hTools2.dialogs.glyphs.margins_copy
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.margins_copy)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.margins_copy)
 
 hTools2.dialogs.glyphs.margins_copy.copyMarginsDialog()
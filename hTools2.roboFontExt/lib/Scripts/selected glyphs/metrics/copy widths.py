@@ -1,7 +1,7 @@
 # [h] copy widths dialog
 
 import hTools2.dialogs.glyphs.width_copy
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.width_copy)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.width_copy)
 
 hTools2.dialogs.glyphs.width_copy.copyWidthsDialog()
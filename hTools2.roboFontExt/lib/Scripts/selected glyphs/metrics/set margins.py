@@ -1,7 +1,7 @@
 # [h] set margins dialog
 
 import hTools2.dialogs.glyphs.margins_set
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.margins_set)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.margins_set)
 
 hTools2.dialogs.glyphs.margins_set.setMarginsDialog()
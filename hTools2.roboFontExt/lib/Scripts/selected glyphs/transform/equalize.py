@@ -1,6 +1,6 @@
 import hTools2.extras.equalize
-import importlib
-importlib.reload(hTools2.extras.equalize)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.extras.equalize)
 
 from hTools2.extras.equalize import equalize_curves
 from hTools2.modules.fontutils import get_glyphs
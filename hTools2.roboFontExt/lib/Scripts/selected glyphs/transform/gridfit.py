@@ -1,7 +1,7 @@
 # [h] fit to grid dialog
 
 import hTools2.dialogs.glyphs.gridfit
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.gridfit)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.gridfit)
 
 hTools2.dialogs.glyphs.gridfit.roundToGridDialog()
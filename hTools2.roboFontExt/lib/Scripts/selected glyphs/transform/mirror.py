@@ -1,7 +1,7 @@
 # [h] move dialog
 
 import hTools2.dialogs.glyphs.mirror
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.mirror)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.mirror)
 
 hTools2.dialogs.glyphs.mirror.mirrorGlyphsDialog()
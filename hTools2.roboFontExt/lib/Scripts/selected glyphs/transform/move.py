@@ -1,7 +1,7 @@
 # [h] move glyphs dialog
 
 import hTools2.dialogs.glyphs.move
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.move)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.move)
 
 hTools2.dialogs.glyphs.move.moveGlyphsDialog(verbose=False)
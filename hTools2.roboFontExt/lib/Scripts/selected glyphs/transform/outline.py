@@ -1,7 +1,7 @@
 # [h] outline glyphs dialog
 
 import hTools2.dialogs.glyphs.outline
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.outline)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.outline)
 
 hTools2.dialogs.glyphs.outline.outlineGlyphsDialog()
\ No newline at end of file
@@ -1,7 +1,7 @@
 # [h] scale glyphs dialog
 
 import hTools2.dialogs.glyphs.scale
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.scale)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.scale)
 
 hTools2.dialogs.glyphs.scale.scaleGlyphsDialog()
@@ -1,7 +1,7 @@
 # [h] shift points
 
 import hTools2.dialogs.glyphs.points_shift
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.points_shift)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.points_shift)
 
 hTools2.dialogs.glyphs.points_shift.shiftPointsDialog()
@@ -1,7 +1,7 @@
 # [h] skew glyphs dialog
 
 import hTools2.dialogs.glyphs.skew
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.skew)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.skew)
 
 hTools2.dialogs.glyphs.skew.skewGlyphsDialog()
@@ -1,7 +1,7 @@
 # [h] slide glyphs
 
 import hTools2.dialogs.glyphs.slide
-import importlib
-importlib.reload(hTools2.dialogs.glyphs.slide)
+from hTools2.modules.sysutils import reload_module
+reload_module(hTools2.dialogs.glyphs.slide)
 
 hTools2.dialogs.glyphs.slide.slideGlyphsDialog()
@@ -2,14 +2,12 @@
 
 # imports
 
-from mojo.roboFont import RFont
 from vanilla import *
 from vanilla.dialogs import getFolder
 
 from hTools2 import hDialog
 from hTools2.modules.fileutils import walk
-from hTools2.modules.fontutils import get_full_name, decompose, auto_contour_order, auto_contour_direction, add_extremes
-from hTools2.modules.opentype import clear_features
+from hTools2.modules.batch import actions_order, batch_actions, robofont_actions
 from hTools2.modules.messages import no_font_in_folder
 
 # objects
@@ -33,6 +31,7 @@ class actionsFolderDialog(hDialog):
     remove_features = False
     save = False
     close = False
+    parallel = False
     ufos_folder = None
 
     # methods
@@ -40,7 +39,7 @@ class actionsFolderDialog(hDialog):
     def __init__(self):
         self.title = 'actions'
         self.width = 123
-        self.height = (self.text_height * 8) + (self.button_height * 2) + (self.padding_y * 5) + self.progress_bar
+        self.height = (self.text_height * 9) + (self.button_height * 2) + (self.padding_y * 5) + self.progress_bar
         self.w = FloatingWindow((self.width, self.height), self.title)
         # ufos folder
         x = self.padding_x
@@ -126,6 +125,15 @@ class actionsFolderDialog(hDialog):
                     callback=self.save_callback,
                     value=self.save,
                     sizeStyle=self.size_style)
+        y += self.text_height
+        self.w.parallel_checkBox = CheckBox(
+                    (x, y,
+                    -self.padding_x,
+                    self.text_height),
+                    "parallel",
+                    callback=self.parallel_callback,
+                    value=self.parallel,
+                    sizeStyle=self.size_style)
         # progress bar
         y += (self.text_height + self.padding_y) - 2
         self.w.bar = ProgressBar(
@@ -185,43 +193,23 @@ class actionsFolderDialog(hDialog):
     def mark_callback(self, sender):
         self.mark = sender.get()
 
+    def parallel_callback(self, sender):
+        self.parallel = sender.get()
+
     # apply callback
 
     def apply_callback(self, sender):
         ufo_paths = walk(self.ufos_folder, 'ufo')
         if len(ufo_paths) > 0:
-            print('transforming all fonts in folder...\n')
+            actions = [ action for action in actions_order if getattr(self, action) ]
+            # parallel mode uses one worker process per CPU
+            workers = None if self.parallel else 1
+            if workers != 1 and [ action for action in actions if action in robofont_actions ]:
+                print('some actions need RoboFont, processing fonts in the main process...\n')
+                workers = 1
             self.w.bar.start()
-            for ufo_path in ufo_paths:
-                font = RFont(ufo_path, showUI=False)
-                print('\ttransforming %s...' % get_full_name(font))
-                if self.round:
-                    print('\t\trounding points...')
-                    font.round()
-                if self.decompose:
-                    print('\t\tdecomposing...')
-                    decompose(font)
-                if self.overlaps:
-                    print('\t\tremoving overlaps...')
-                    font.removeOverlap()
-                if self.order:
-                    print('\t\tauto contour order...')
-                    auto_contour_order(font)
-                if self.direction:
-                    print('\t\tauto contour direction...')
-                    auto_contour_direction(font)
-                if self.extremes:
-                    print('\t\tadding extreme points...')
-                    add_extremes(font)
-                if self.remove_features:
-                    print('\t\tremoving all OpenType features...')
-                    clear_features(font)
-                if self.save:
-                    print('\t\tsaving font...')
-                    font.save()
-                print('\t...done.\n')
+            batch_actions(ufo_paths, actions, workers=workers)
             self.w.bar.stop()
-            print('...done.\n')
         # no font in folder
         else:
             print(no_font_in_folder)
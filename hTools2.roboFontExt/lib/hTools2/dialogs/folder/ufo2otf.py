@@ -2,14 +2,12 @@
 
 # imports
 
-import os
-
-from mojo.roboFont import RFont
 from vanilla import *
 from vanilla.dialogs import getFolder
 
 from hTools2 import hDialog
 from hTools2.modules.fileutils import walk
+from hTools2.modules.build import build_fonts
 from hTools2.modules.messages import no_font_in_folder
 
 # objects
@@ -35,7 +33,7 @@ class UFOsToOTFsDialog(hDialog):
     def __init__(self):
         # window
         self.title = "ufo2otf"
-        self.height = (self.button_height * 3) + (self.padding_y * 6) + (self.text_height * 4) + self.progress_bar
+        self.height = (self.button_height * 3) + (self.padding_y * 6) + (self.text_height * 5) + self.progress_bar
         self.w = FloatingWindow((self.width, self.height), self.title)
         x = self.padding_x
         y = self.padding_y
@@ -89,6 +87,14 @@ class UFOsToOTFsDialog(hDialog):
                     "release mode",
                     sizeStyle=self.size_style,
                     value=True)
+        y += self.text_height
+        self.w._parallel = CheckBox(
+                    (x, y,
+                    -self.padding_x,
+                    self.text_height),
+                    "parallel",
+                    sizeStyle=self.size_style,
+                    value=False)
         y += (self.text_height + self.padding_y)
         # progress bar
         self.w.bar = ProgressBar(
@@ -131,6 +137,7 @@ class UFOsToOTFsDialog(hDialog):
                 _overlaps = self.w._overlaps.get()
                 _autohint = self.w._autohint.get()
                 _release_mode = self.w._release_mode.get()
+                _parallel = self.w._parallel.get()
                 # print settings
                 boolstring = ("False", "True")
                 print('batch generating .otfs for all fonts in folder...\n')
@@ -140,27 +147,22 @@ class UFOsToOTFsDialog(hDialog):
                 print('\tremove overlaps: %s' % boolstring[_overlaps])
                 print('\tautohint: %s' % boolstring[_autohint])
                 print('\trelease mode: %s' % boolstring[_release_mode])
+                print('\tparallel: %s' % boolstring[_parallel])
                 print()
                 # batch generate
+                options = {
+                    'decompose' : _decompose,
+                    'autohint' : _autohint,
+                    'checkOutlines' : _overlaps,
+                    'releaseMode' : _release_mode,
+                }
                 self.w.bar.start()
-                for ufo_path in _ufo_paths:
-                    print('\tgenerating .otf for %s...' % os.path.split(ufo_path)[1])
-                    ufo = RFont(ufo_path, showUI=False)
-                    # generate otf
-                    otf_file = os.path.splitext(os.path.split(ufo_path)[1])[0] + '.otf'
-                    otf_path = os.path.join(self.otfs_folder, otf_file)
-                    ufo.generate(otf_path, 'otf',
-                                decompose=_decompose,
-                                autohint=_autohint,
-                                checkOutlines=_overlaps,
-                                releaseMode=_release_mode)
-                    # close
-                    ufo.close()
-                    print('\t\totf path: %s' % otf_path)
-                    print('\t\tgeneration sucessful? %s\n' % os.path.exists(otf_path))
-                # done
+                build_fonts(_ufo_paths, self.otfs_folder,
+                            formats=['otf'],
+                            options=options,
+                            workers=None if _parallel else 1,
+                            subfolders=False)
                 self.w.bar.stop()
-                print('...done.\n')
         # no font in folder
         else:
             print(no_font_in_folder)
@@ -1,12 +1,5 @@
 # [h] set element glyph in a font
 
-import hTools2.modules.rasterizer
-import importlib
-importlib.reload(hTools2.modules.rasterizer)
-
-import hTools2.dialogs.misc
-importlib.reload(hTools2.dialogs.misc)
-
 # imports
 
 from mojo.roboFont import CurrentFont
@@ -2,19 +2,6 @@
 
 """A collection of dialogs to do things to the current glyph."""
 
-from . import align
-import importlib
-importlib.reload(align)
-
-from . import nudge
-importlib.reload(nudge)
-
-from . import switch
-importlib.reload(switch)
-
-from . import interpolation_preview
-importlib.reload(interpolation_preview)
-
 # import
 
 from .align import alignPointsDialog
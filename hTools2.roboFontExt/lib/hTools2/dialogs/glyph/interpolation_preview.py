@@ -9,6 +9,7 @@ from mojo.events import addObserver, removeObserver
 from mojo.drawingTools import *
 from hTools2 import hDialog
 from hTools2.modules.fontutils import get_full_name
+from hTools2.modules.interpol import InterpolationPreview
 from hTools2.extras.grapefruit import Color
 
 # object
@@ -43,7 +44,7 @@ class interpolationPreviewDialog(hDialog, BaseWindowController):
     def __init__(self):
         # make window
         self.width *= 2
-        self.height = self.text_height + self.button_height*3 + self.padding*4
+        self.height = self.text_height*2 + self.button_height*3 + self.padding*4.5
         self.w = FloatingWindow((self.width, self.height), "interpol")
         # get colors
         x = y = p = self.padding
@@ -70,6 +71,17 @@ class interpolationPreviewDialog(hDialog, BaseWindowController):
                 sizeStyle='small',
                 callback=self.view_callback
             )
+        # frame time
+        y += self.button_height
+        self.w.frame_time = TextBox(
+                (x, y, -p, self.text_height),
+                "",
+                sizeStyle='small')
+        # preview engine
+        self.preview = InterpolationPreview(RGlyph, self.steps)
+        self.colors = None
+        self.colors_key = None
+        self.glyphs = []
         # turn visualization ON
         self.on()
         # add observers
@@ -84,6 +96,7 @@ class interpolationPreviewDialog(hDialog, BaseWindowController):
 
     def windowCloseCallback(self, sender):
         self.off()
+        self.observe_glyphs([])
         super(interpolationPreviewDialog, self).windowCloseCallback(sender)
         removeObserver(self, "newFontDidOpen")
         removeObserver(self, "fontDidOpen")
@@ -102,6 +115,10 @@ class interpolationPreviewDialog(hDialog, BaseWindowController):
         # print 'updating fonts'
         self.get_fonts()
         self.w.f2.setItems(sorted(self.all_fonts.keys()))
+        self.preview.invalidate()
+
+    def glyph_changed_callback(self, notification):
+        self.preview.invalidate(notification.object)
 
     # methods
 
@@ -112,6 +129,24 @@ class interpolationPreviewDialog(hDialog, BaseWindowController):
             for font in all_fonts:
                 self.all_fonts[(get_full_name(font))] = font
 
+    def observe_glyphs(self, glyphs):
+        """Watch the given glyphs for changes, so the cached preview steps are recalculated when they are edited."""
+        for glyph in self.glyphs:
+            glyph.removeObserver(self, "Glyph.Changed")
+        self.glyphs = [ glyph.naked() for glyph in glyphs ]
+        for glyph in self.glyphs:
+            glyph.addObserver(self, "glyph_changed_callback", "Glyph.Changed")
+
+    def get_colors(self, mark_color, mark_color_2):
+        """Get the gradient of step colors, recalculating it only when the colors change."""
+        key = mark_color, mark_color_2, self.steps
+        if key != self.colors_key:
+            c1 = Color.NewFromRgb(*mark_color)
+            c2 = Color.NewFromRgb(*mark_color_2)
+            self.colors = c1.Gradient(c2, self.steps)
+            self.colors_key = key
+        return self.colors
+
     def on(self):
         addObserver(self, "draw_background", "drawBackground")
         if self.verbose:
@@ -144,23 +179,20 @@ class interpolationPreviewDialog(hDialog, BaseWindowController):
         f1 = CurrentFont()
         i  = self.w.f2.get()
         f2 = self.all_fonts[sorted(self.all_fonts.keys())[i]]
-        r = 2
         # interpolate steps
         if f1 != f2:
             # check if f2 has this glyph
             if g1.name in f2:
+                self.preview.start_frame()
                 g2 = f2[g1.name]
-                # check if glyph in f2 is compatible
-                if g1.isCompatible(g2):
-                    # create colors
-                    c1 = Color.NewFromRgb(*_mark_color)
-                    c2 = Color.NewFromRgb(*_mark_color_2)
-                    colors = c1.Gradient(c2, self.steps)
-                    # create steps and draw
-                    for i in range(self.steps):
-                        factor = i * (1.0 / (self.steps-1))
-                        g3 = RGlyph()
-                        g3.interpolate(factor, g1, g2)
+                if [ g.naked() for g in (g1, g2) ] != self.glyphs:
+                    self.observe_glyphs([g1, g2])
+                # get cached steps (None if not compatible)
+                steps = self.preview.get_steps(g1, g2)
+                if steps is not None:
+                    colors = self.get_colors(_mark_color, _mark_color_2)
+                    # draw steps
+                    for i, (g3, markers) in enumerate(steps):
                         save()
                         fill(None)
                         stroke(*colors[i])
@@ -169,12 +201,10 @@ class interpolationPreviewDialog(hDialog, BaseWindowController):
                             diff = g3.width - g1.width
                             translate(-diff*0.5, 0)
                         drawGlyph(g3)
-                        for c in g3.contours:
-                            for pt in c.points:
-                                rect(pt.x-r, pt.y-r, r*2, r*2)
+                        drawGlyph(markers)
                         restore()
-                    # done
-                    # restore()
+                self.preview.end_frame()
+                self.w.frame_time.set('%.1f ms per frame' % self.preview.get_frame_time())
             else:
                 if self.verbose:
                     print('%s not in font 2' % g1.name)
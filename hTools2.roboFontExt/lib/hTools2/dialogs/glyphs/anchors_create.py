@@ -2,10 +2,6 @@
 
 """Create `top` and `bottom` anchors in selected glyphs."""
 
-import hTools2.modules.anchors
-import importlib
-importlib.reload(hTools2.modules.anchors)
-
 # import
 
 from mojo.roboFont import CurrentFont
@@ -1,14 +1,5 @@
 # [h] randomize elements in selected glyphs
 
-# debug
-
-import hTools2.modules.rasterizer
-import importlib
-importlib.reload(hTools2.modules.rasterizer)
-
-import hTools2.dialogs.misc
-importlib.reload(hTools2.dialogs.misc)
-
 # imports
 
 from vanilla import *
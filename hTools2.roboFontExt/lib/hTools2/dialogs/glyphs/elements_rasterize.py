@@ -1,9 +1,5 @@
 # [h] rasterize selected glyphs into elements
 
-import hTools2.modules.rasterizer
-import importlib
-importlib.reload(hTools2.modules.rasterizer)
-
 # imports
 
 from mojo.roboFont import CurrentFont
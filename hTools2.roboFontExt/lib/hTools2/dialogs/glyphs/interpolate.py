@@ -1,9 +1,5 @@
 # [h] interpolate glyphs
 
-import hTools2.dialogs.misc
-import importlib
-importlib.reload(hTools2.dialogs.misc)
-
 # imports
 
 import os
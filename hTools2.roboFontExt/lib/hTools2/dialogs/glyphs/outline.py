@@ -1,12 +1,5 @@
 # [h] glyph outliner
 
-import hTools2.modules.outline
-import importlib
-importlib.reload(hTools2.modules.outline)
-
-import hTools2.dialogs.misc
-importlib.reload(hTools2.dialogs.misc)
-
 # imports
 
 from mojo.roboFont import CurrentFont
@@ -1,9 +1,5 @@
 # [h] paint and select glyphs by color
 
-import hTools2.modules.color
-import importlib
-importlib.reload(hTools2.modules.color)
-
 from mojo.roboFont import CurrentFont, CurrentGlyph
 from vanilla import *
 from AppKit import NSColor
@@ -85,6 +85,40 @@ def pointOnACurve(xxx_todo_changeme7, xxx_todo_changeme8, xxx_todo_changeme9, xx
     my = ay*(value)**3 + by*(value)**2 + cy*(value) + dy
     return MathPoint(mx, my)
 
+def samePoint(p1, p2):
+    #### same as MathPoint.__eq__, for tuples
+    return roundFloat(p1[0]) == roundFloat(p2[0]) and roundFloat(p1[1]) == roundFloat(p2[1])
+
+def pointAngle(p1, p2, add=90):
+    #### same as MathPoint.angle, for tuples
+    b = p2[0] - p1[0]
+    a = p2[1] - p1[1]
+    c = sqrt(a**2 + b**2)
+    if c == 0:
+        return None
+    if add is None:
+        return b/c
+    cosAngle = degrees(acos(b/c))
+    sinAngle = degrees(asin(a/c))
+    if sinAngle < 0:
+        cosAngle = 360 - cosAngle
+    return radians(cosAngle + add)
+
+def pointDistance(p1, p2):
+    #### same as MathPoint.distance, for tuples
+    return sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
+
+def interSectTuples(seg1, seg2):
+    #### same as interSect, for tuples
+    (seg1sx, seg1sy), (seg1ex, seg1ey) = seg1
+    (seg2sx, seg2sy), (seg2ex, seg2ey) = seg2
+    denom = (seg2ey - seg2sy)*(seg1ex - seg1sx) - (seg2ex - seg2sx)*(seg1ey - seg1sy)
+    if roundFloat(denom) == 0:
+        return None
+    uanum = (seg2ex - seg2sx)*(seg1sy - seg2sy) - (seg2ey - seg2sy)*(seg1sx - seg2sx)
+    ua = uanum/denom
+    return (seg1sx + ua*(seg1ex - seg1sx), seg1sy + ua*(seg1ey - seg1sy))
+
 class MathPoint(object):
 
     def __init__(self, x, y=None):
@@ -595,3 +629,385 @@ class OutlinePen(BasePen):
         self.drawPoints(pointPen)
         return glyph
 
+
+class PointData(object):
+
+    __slots__ = ["x", "y", "segmentType", "smooth", "name", "identifier"]
+
+    def __init__(self, x, y, segmentType=None, smooth=False, name=None, identifier=None):
+        self.x = x
+        self.y = y
+        self.segmentType = segmentType
+        self.smooth = smooth
+        self.name = name
+        self.identifier = identifier
+
+class PointsContour(object):
+
+    """A lightweight contour with the parts of the defcon Contour API used by OutlinePen."""
+
+    def __init__(self):
+        self.points = []
+
+    def __getitem__(self, index):
+        return self.points[index]
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        (x, y) = pt
+        self.points.append(PointData(x, y, segmentType, smooth, name, identifier))
+
+    def reverse(self):
+        #### same as defcon, which also uses the fontTools pen
+        from fontTools.pens.pointPen import ReverseContourPointPen as FontToolsReverseContourPointPen
+        otherGlyph = PointsGlyph()
+        self.drawPoints(FontToolsReverseContourPointPen(otherGlyph))
+        self.points = otherGlyph[0].points
+
+    def drawPoints(self, pointPen):
+        pointPen.beginPath()
+        for point in self.points:
+            pointPen.addPoint((point.x, point.y), segmentType=point.segmentType, smooth=point.smooth, name=point.name, identifier=point.identifier)
+        pointPen.endPath()
+
+class PointsGlyph(AbstractPointPen):
+
+    """A lightweight glyph with the parts of the defcon Glyph API used by OutlinePen. Components are ignored."""
+
+    def __init__(self):
+        self.contours = []
+
+    def __getitem__(self, index):
+        return self.contours[index]
+
+    def __len__(self):
+        return len(self.contours)
+
+    def getPen(self):
+        from fontTools.pens.pointPen import SegmentToPointPen
+        return SegmentToPointPen(self)
+
+    def getPointPen(self):
+        return self
+
+    def removeContour(self, contour):
+        self.contours.remove(contour)
+
+    def drawPoints(self, pointPen):
+        for contour in self.contours:
+            contour.drawPoints(pointPen)
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.contours.append(PointsContour())
+
+    def endPath(self):
+        pass
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self.contours[-1].addPoint(pt, segmentType, smooth, name, identifier)
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        pass
+
+class FastOutlinePen(OutlinePen):
+
+    """
+    An OutlinePen which works with plain (x, y) tuples instead of MathPoint objects, and collects the outlines in PointsGlyph objects instead of defcon glyphs.
+
+    The normal of each segment is computed once, and all arithmetic is done in the same order as in OutlinePen, so the results are identical.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        OutlinePen.__init__(self, *args, **kwargs)
+
+        self.originalGlyph = PointsGlyph()
+        self.originalPen = self.originalGlyph.getPen()
+
+        self.outerGlyph = PointsGlyph()
+        self.outerPen = self.outerGlyph.getPen()
+
+        self.innerGlyph = PointsGlyph()
+        self.innerPen = self.innerGlyph.getPen()
+
+    def _moveTo(self, pt):
+        x, y = pt
+        if self.offset == 0:
+            self.outerPen.moveTo((x, y))
+            self.innerPen.moveTo((x, y))
+            return
+        self.originalPen.moveTo((x, y))
+
+        self.prevPoint = (x, y)
+        self.firstPoint = (x, y)
+        self.shouldHandleMove = True
+
+    def _lineTo(self, pt):
+        x, y = pt
+        if self.offset == 0:
+            self.outerPen.lineTo((x, y))
+            self.innerPen.lineTo((x, y))
+            return
+        self.originalPen.lineTo((x, y))
+
+        prevX, prevY = prevPoint = self.prevPoint
+        if samePoint((x, y), prevPoint):
+            return
+
+        offset = self.offset
+        self.currentAngle = pointAngle(prevPoint, (x, y))
+        normalX = cos(self.currentAngle) * offset
+        normalY = sin(self.currentAngle) * offset
+
+        self.innerCurrentPoint = (prevX - normalX, prevY - normalY)
+        self.outerCurrentPoint = (prevX + normalX, prevY + normalY)
+
+        if self.shouldHandleMove:
+            self.shouldHandleMove = False
+
+            self.innerPen.moveTo(self.innerCurrentPoint)
+            self.innerFirstPoint = self.innerCurrentPoint
+
+            self.outerPen.moveTo(self.outerCurrentPoint)
+            self.outerFirstPoint = self.outerCurrentPoint
+
+            self.firstAngle = self.currentAngle
+        else:
+            self.buildConnection()
+
+        self.innerCurrentPoint = (x - normalX, y - normalY)
+        self.innerPen.lineTo(self.innerCurrentPoint)
+        self.innerPrevPoint = self.innerCurrentPoint
+
+        self.outerCurrentPoint = (x + normalX, y + normalY)
+        self.outerPen.lineTo(self.outerCurrentPoint)
+        self.outerPrevPoint = self.outerCurrentPoint
+
+        self.prevPoint = (x, y)
+        self.prevAngle = self.currentAngle
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        if self.offset == 0:
+            self.outerPen.curveTo(pt1, pt2, pt3)
+            self.innerPen.curveTo(pt1, pt2, pt3)
+            return
+        self.originalPen.curveTo(pt1, pt2, pt3)
+
+        prevPoint = self.prevPoint
+        p1 = tuple(pt1)
+        p2 = tuple(pt2)
+        p3 = tuple(pt3)
+
+        if samePoint(p1, prevPoint):
+            p1 = tuple(pointOnACurve(prevPoint, p1, p2, p3, 0.01))
+        if samePoint(p2, p3):
+            p2 = tuple(pointOnACurve(prevPoint, p1, p2, p3, 0.99))
+
+        a1 = pointAngle(prevPoint, p1)
+        a2 = pointAngle(p2, p3)
+
+        self.currentAngle = a1
+
+        a1bis = pointAngle(prevPoint, p1, 0)
+        a2bis = pointAngle(p3, p2, 0)
+
+        cos1, sin1 = cos(a1), sin(a1)
+        cos2, sin2 = cos(a2), sin(a2)
+        cos1bis, sin1bis = cos(a1bis), sin(a1bis)
+        cos2bis, sin2bis = cos(a2bis), sin(a2bis)
+        offset = self.offset
+
+        intersectPoint = interSectTuples((prevPoint, (prevPoint[0] + cos1 * 100, prevPoint[1] + sin1 * 100)),
+                                         (p3, (p3[0] + cos2 * 100, p3[1] + sin2 * 100)))
+
+        normal1X, normal1Y = cos1 * offset, sin1 * offset
+        normal2X, normal2Y = cos2 * offset, sin2 * offset
+        normal1bisX, normal1bisY = cos1bis * offset, sin1bis * offset
+        normal2bisX, normal2bisY = cos2bis * offset, sin2bis * offset
+
+        self.innerCurrentPoint = (prevPoint[0] - normal1X, prevPoint[1] - normal1Y)
+        self.outerCurrentPoint = (prevPoint[0] + normal1X, prevPoint[1] + normal1Y)
+
+        if self.shouldHandleMove:
+            self.shouldHandleMove = False
+
+            self.innerPen.moveTo(self.innerCurrentPoint)
+            self.innerFirstPoint = self.innerCurrentPoint
+
+            self.outerPen.moveTo(self.outerCurrentPoint)
+            self.outerFirstPoint = self.outerCurrentPoint
+
+            self.firstAngle = a1
+        else:
+            self.buildConnection()
+
+        h1 = None
+        if intersectPoint is not None:
+            h1 = interSectTuples((self.innerCurrentPoint, (self.innerCurrentPoint[0] + normal1bisX, self.innerCurrentPoint[1] + normal1bisY)), (intersectPoint, p1))
+        if h1 is None:
+            h1 = (p1[0] - normal1X, p1[1] - normal1Y)
+
+        self.innerCurrentPoint = (p3[0] - normal2X, p3[1] - normal2Y)
+
+        h2 = None
+        if intersectPoint is not None:
+            h2 = interSectTuples((self.innerCurrentPoint, (self.innerCurrentPoint[0] + normal2bisX, self.innerCurrentPoint[1] + normal2bisY)), (intersectPoint, p2))
+        if h2 is None:
+            h2 = (p2[0] - normal1X, p2[1] - normal1Y)
+
+        self.innerPen.curveTo(h1, h2, self.innerCurrentPoint)
+        self.innerPrevPoint = self.innerCurrentPoint
+
+        ########
+        h1 = None
+        if intersectPoint is not None:
+            h1 = interSectTuples((self.outerCurrentPoint, (self.outerCurrentPoint[0] + normal1bisX, self.outerCurrentPoint[1] + normal1bisY)), (intersectPoint, p1))
+        if h1 is None:
+            h1 = (p1[0] + normal1X, p1[1] + normal1Y)
+
+        self.outerCurrentPoint = (p3[0] + normal2X, p3[1] + normal2Y)
+
+        h2 = None
+        if intersectPoint is not None:
+            h2 = interSectTuples((self.outerCurrentPoint, (self.outerCurrentPoint[0] + normal2bisX, self.outerCurrentPoint[1] + normal2bisY)), (intersectPoint, p2))
+        if h2 is None:
+            h2 = (p2[0] + normal1X, p2[1] + normal1Y)
+        self.outerPen.curveTo(h1, h2, self.outerCurrentPoint)
+        self.outerPrevPoint = self.outerCurrentPoint
+
+        self.prevPoint = p3
+        self.currentAngle = a2
+        self.prevAngle = a2
+
+    def _closePath(self):
+        if self.shouldHandleMove:
+            return
+        if self.offset == 0:
+            self.outerPen.closePath()
+            self.innerPen.closePath()
+            return
+
+        if not samePoint(self.prevPoint, self.firstPoint):
+            self._lineTo(self.firstPoint)
+
+        self.originalPen.closePath()
+
+        self.innerPrevPoint = self.innerCurrentPoint
+        self.innerCurrentPoint = self.innerFirstPoint
+
+        self.outerPrevPoint = self.outerCurrentPoint
+        self.outerCurrentPoint = self.outerFirstPoint
+
+        self.prevAngle = self.currentAngle
+        self.currentAngle = self.firstAngle
+
+        self.buildConnection(close=True)
+
+        self.innerPen.closePath()
+        self.outerPen.closePath()
+
+    ## connections
+
+    def connectionSquare(self, first, last, pen, close):
+        angle_1 = radians(degrees(self.prevAngle)+90)
+        angle_2 = radians(degrees(self.currentAngle)+90)
+
+        tempFirst = (first[0] - cos(angle_1) * self.miterLimit, first[1] - sin(angle_1) * self.miterLimit)
+        tempLast = (last[0] + cos(angle_2) * self.miterLimit, last[1] + sin(angle_2) * self.miterLimit)
+
+        newPoint = interSectTuples((first, tempFirst), (last, tempLast))
+        if newPoint is not None:
+
+            if self._inputmiterLimit is not None and roundFloat(pointDistance(newPoint, first)) > self._inputmiterLimit:
+                pen.lineTo(tempFirst)
+                pen.lineTo(tempLast)
+            else:
+                pen.lineTo(newPoint)
+
+        if not close:
+            pen.lineTo(last)
+
+    def connectionRound(self, first, last, pen, close):
+        angle_1 = radians(degrees(self.prevAngle)+90)
+        angle_2 = radians(degrees(self.currentAngle)+90)
+        cos1, sin1 = cos(angle_1), sin(angle_1)
+        cos2, sin2 = cos(angle_2), sin(angle_2)
+
+        tempFirst = (first[0] - cos1 * self.miterLimit, first[1] - sin1 * self.miterLimit)
+        tempLast = (last[0] + cos2 * self.miterLimit, last[1] + sin2 * self.miterLimit)
+
+        newPoint = interSectTuples((first, tempFirst), (last, tempLast))
+        if newPoint is None:
+            pen.lineTo(last)
+            return
+        distance = pointDistance(newPoint, first)
+
+        if roundFloat(distance) > self.miterLimit:
+            distance = self.miterLimit + pointDistance(tempFirst, tempLast) * .7
+
+        distance *= self.magicCurve
+
+        bcp1 = (first[0] - cos1 * distance, first[1] - sin1 * distance)
+        bcp2 = (last[0] + cos2 * distance, last[1] + sin2 * distance)
+        pen.curveTo(bcp1, bcp2, last)
+
+    ## caps
+
+    def buildCap(self, firstContour, lastContour):
+        first = firstContour[-1]
+        last = lastContour[0]
+
+        self.capCallback(firstContour, lastContour, (first.x, first.y), (last.x, last.y), self.prevAngle)
+
+        first = lastContour[-1]
+        last = firstContour[0]
+
+        angle = radians(degrees(self.firstAngle)+180)
+        self.capCallback(lastContour, firstContour, (first.x, first.y), (last.x, last.y), angle)
+
+    def capRound(self, firstContour, lastContour, first, last, angle):
+        hookedAngle = radians(degrees(angle)+90)
+        hookedX, hookedY = cos(hookedAngle) * self.offset, sin(hookedAngle) * self.offset
+        angleX, angleY = cos(angle) * self.offset, sin(angle) * self.offset
+
+        p1 = (first[0] - hookedX, first[1] - hookedY)
+
+        p2 = (last[0] - hookedX, last[1] - hookedY)
+
+        oncurve = (p1[0] + (p2[0] - p1[0]) * .5, p1[1] + (p2[1] - p1[1]) * .5)
+
+        roundness = .54
+
+        h1 = (first[0] - hookedX * roundness, first[1] - hookedY * roundness)
+        h2 = (oncurve[0] + angleX * roundness, oncurve[1] + angleY * roundness)
+
+        firstContour[-1].smooth = True
+
+        firstContour.addPoint(h1)
+        firstContour.addPoint(h2)
+        firstContour.addPoint(oncurve, smooth=True, segmentType="curve")
+
+        h1 = (oncurve[0] - angleX * roundness, oncurve[1] - angleY * roundness)
+        h2 = (last[0] - hookedX * roundness, last[1] - hookedY * roundness)
+
+        firstContour.addPoint(h1)
+        firstContour.addPoint(h2)
+
+        lastContour[0].segmentType = "curve"
+        lastContour[0].smooth = True
+
+    def capSquare(self, firstContour, lastContour, first, last, angle):
+        angle = radians(degrees(angle)+90)
+        normalX, normalY = cos(angle) * self.offset, sin(angle) * self.offset
+
+        firstContour[-1].smooth = True
+        lastContour[0].smooth = True
+
+        firstContour.addPoint((first[0] - normalX, first[1] - normalY), smooth=False, segmentType="line")
+
+        firstContour.addPoint((last[0] - normalX, last[1] - normalY), smooth=False, segmentType="line")
@@ -0,0 +1,181 @@
+# [h] hTools2.modules.batch
+
+"""
+Apply a set of actions to all fonts in a folder, optionally using several processes.
+
+Worker processes do not run inside RoboFont: they open fonts with ``fontParts.world``, whose ``removeOverlap`` is not the same as RoboFont's, and actions which need RoboFont (see ``robofont_actions``) are not available in them. Output is identical to the serial path when both run outside RoboFont.
+
+"""
+
+# imports
+
+import time
+import traceback
+
+from functools import partial
+
+try:
+    from mojo.roboFont import OpenFont
+except:
+    from fontParts.world import OpenFont
+
+from hTools2.modules.fileutils import walk
+from hTools2.modules.fontutils import get_full_name, decompose, remove_overlap, auto_contour_order, auto_contour_direction, add_extremes
+from hTools2.modules.opentype import clear_features
+from hTools2.modules.sysutils import map_parallel
+
+#: All available actions, in the order in which they are applied.
+actions_order = [
+    'round',
+    'decompose',
+    'overlaps',
+    'order',
+    'direction',
+    'extremes',
+    'remove_features',
+    'save',
+]
+
+#: Actions which only work with RoboFont fonts, and cannot run in worker processes.
+robofont_actions = ['extremes']
+
+#: Console messages for each action.
+actions_messages = {
+    'round' : 'rounding points...',
+    'decompose' : 'decomposing...',
+    'overlaps' : 'removing overlaps...',
+    'order' : 'auto contour order...',
+    'direction' : 'auto contour direction...',
+    'extremes' : 'adding extreme points...',
+    'remove_features' : 'removing all OpenType features...',
+    'save' : 'saving font...',
+}
+
+# functions
+
+def open_font(ufo_path):
+    """Open a font without UI, in RoboFont or with ``fontParts.world``."""
+    try:
+        return OpenFont(ufo_path, showUI=False)
+    except TypeError:
+        return OpenFont(ufo_path)
+
+def apply_actions(font, actions, verbose=False):
+    """
+    Apply the given actions to an open font.
+
+    Actions are always applied in the order of ``actions_order``, no matter in which order they are given.
+
+    :param RFont font: The font to transform.
+    :param list actions: Names of the actions to apply.
+    :returns: A list with the names of the applied actions.
+
+    """
+    applied = []
+    for action in actions_order:
+        if action not in actions:
+            continue
+        if verbose:
+            print('\t\t%s' % actions_messages[action])
+        if action == 'round':
+            font.round()
+        elif action == 'decompose':
+            decompose(font)
+        elif action == 'overlaps':
+            remove_overlap(font)
+        elif action == 'order':
+            auto_contour_order(font)
+        elif action == 'direction':
+            auto_contour_direction(font)
+        elif action == 'extremes':
+            add_extremes(font)
+        elif action == 'remove_features':
+            clear_features(font)
+        elif action == 'save':
+            font.save()
+        applied.append(action)
+    return applied
+
+def process_ufo(ufo_path, actions, verbose=False):
+    """
+    Open the font at ``ufo_path``, apply the actions to it, and close it.
+
+    Errors are caught and stored in the result, so a single broken font does not stop a batch.
+
+    :returns: A result dict with the keys ``path``, ``name``, ``actions``, ``time`` and ``error``.
+
+    """
+    result = {
+        'path' : ufo_path,
+        'name' : None,
+        'actions' : [],
+        'time' : 0,
+        'error' : None,
+    }
+    start = time.time()
+    try:
+        font = open_font(ufo_path)
+        result['name'] = get_full_name(font)
+        if verbose:
+            print('\ttransforming %s...' % result['name'])
+        result['actions'] = apply_actions(font, actions, verbose)
+        font.close()
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['time'] = time.time() - start
+    return result
+
+def batch_actions(ufo_paths, actions, workers=1, verbose=True):
+    """
+    Apply a set of actions to all fonts in a list of ``.ufo`` paths.
+
+    With ``workers=1`` fonts are processed one after the other in the current process; otherwise they are distributed over a pool of worker processes (``workers=None`` uses all CPUs), which use ``fontParts.world`` even when called from RoboFont. Results are always returned in the order of ``ufo_paths``.
+
+    Raises a ``ValueError`` if actions from ``robofont_actions`` are requested with more than one worker.
+
+    :param list ufo_paths: A list of paths to ``.ufo`` fonts, or a folder containing them.
+    :param list actions: Names of the actions to apply, see ``actions_order``.
+    :param int workers: The number of worker processes.
+    :returns: A list of result dicts, one per font.
+
+    """
+    if workers != 1:
+        unavailable = [ action for action in actions if action in robofont_actions ]
+        if unavailable:
+            raise ValueError('actions not available in worker processes: %s' % ' '.join(unavailable))
+    if isinstance(ufo_paths, str):
+        ufo_paths = walk(ufo_paths, 'ufo')
+    ufo_paths = sorted(ufo_paths)
+    if verbose:
+        print('transforming all fonts in folder...\n')
+    if workers == 1:
+        results = [ process_ufo(ufo_path, actions, verbose) for ufo_path in ufo_paths ]
+    else:
+        results = map_parallel(partial(process_ufo, actions=actions), ufo_paths, workers)
+    if verbose:
+        print_results(results)
+        print('...done.\n')
+    return results
+
+def print_results(results):
+    """Print the results of a batch job, with timing for each font."""
+    total = 0
+    for result in results:
+        total += result['time']
+        name = result['name'] or result['path']
+        if result['error'] is None:
+            print('\t%s: %s (%.2f s)' % (name, ' '.join(result['actions']), result['time']))
+        else:
+            print('\t### %s failed:\n%s' % (name, result['error']))
+    print('\n\ttotal time: %.2f s\n' % total)
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Apply actions to all fonts in a folder.')
+    parser.add_argument('folder', help='a folder containing .ufo fonts')
+    parser.add_argument('actions', nargs='+', choices=actions_order)
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: all CPUs)')
+    args = parser.parse_args()
+    batch_actions(args.folder, args.actions, workers=args.workers)
@@ -0,0 +1,408 @@
+# [h] hTools2.modules.build
+
+'''
+A small build system to generate fonts in several formats from ``.ufo`` sources.
+
+Each output format is a task which depends on the output of another task (for example, ``.woff`` is made from ``.otf``). Tasks are collected into a dependency graph for all fonts, and independent tasks run in parallel worker processes. Tasks which need RoboFont (see ``main_process_tasks``) run in the main process. Tasks whose inputs have not changed since the last build are skipped.
+
+'''
+
+# imports
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+import traceback
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from hTools2.modules.fileutils import walk
+from hTools2.modules.sysutils import get_workers
+
+#: All build tasks, in dependency order, with the task they depend on.
+tasks_dependencies = OrderedDict([
+    ('otf', None),
+    ('strip_names', 'otf'),
+    ('ttf', 'otf'),
+    ('autohint', 'ttf'),
+    ('woff', 'otf'),
+    ('woff2', 'otf'),
+    ('eot', 'autohint'),
+    ('css', 'woff'),
+])
+
+#: File extension and output subfolder for each task.
+tasks_outputs = {
+    'otf' : ('otf', 'otf'),
+    'strip_names' : ('otf', 'otf-stripped'),
+    'ttf' : ('ttf', 'ttf'),
+    'autohint' : ('ttf', 'ttf-autohint'),
+    'woff' : ('woff', 'woff'),
+    'woff2' : ('woff2', 'woff2'),
+    'eot' : ('eot', 'eot'),
+    'css' : ('css', 'css'),
+}
+
+#: Tasks which are made from the output of ``strip_names`` instead of ``otf``, if ``strip_names`` is one of the formats.
+stripped_tasks = ['woff', 'woff2']
+
+#: Tasks which need RoboFont (``generate`` and ``curveConverter``), and always run in the main process.
+main_process_tasks = ['otf', 'ttf']
+
+#: Default options for ``.otf`` generation.
+otf_options = {
+    'decompose' : True,
+    'autohint' : True,
+    'checkOutlines' : True,
+    'releaseMode' : True,
+}
+
+#: Name of the file which stores the input signatures of the last build.
+manifest_file = '.hTools2-build.json'
+
+#-------
+# tasks
+#-------
+
+def build_otf(src_path, dst_path, options):
+    '''Generate an .otf font from an .ufo source.'''
+    from hTools2.modules.batch import open_font
+    ufo = open_font(src_path)
+    ufo.generate(dst_path, 'otf', **options)
+    ufo.close()
+
+def build_strip_names(src_path, dst_path, options):
+    '''Clear the nameIDs which make a font installable on desktop OSs (webfont obfuscation).'''
+    from hTools2.modules.ttx import strip_names_otf
+    strip_names_otf(src_path, dst_path)
+
+def build_ttf(src_path, dst_path, options):
+    from hTools2.modules.webfonts import otf2ttf
+    otf2ttf(src_path, dst_path)
+
+def build_autohint(src_path, dst_path, options):
+    '''Autohint a .ttf font. Requires ``ttfautohint`` installed on your system.'''
+    subprocess.check_call(['ttfautohint', src_path, dst_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def compress_font(src_path, dst_path, flavor):
+    '''Save an .otf or .ttf font as .woff or .woff2 with fontTools (.woff2 requires the ``brotli`` module).'''
+    from fontTools.ttLib import TTFont
+    tt_font = TTFont(src_path)
+    tt_font.flavor = flavor
+    tt_font.save(dst_path)
+    tt_font.close()
+
+def build_woff(src_path, dst_path, options):
+    compress_font(src_path, dst_path, 'woff')
+
+def build_woff2(src_path, dst_path, options):
+    compress_font(src_path, dst_path, 'woff2')
+
+def build_eot(src_path, dst_path, options):
+    '''Make an .eot font from a .ttf font. Requires ``ttf2eot`` installed on your system.'''
+    with open(src_path, 'rb') as ttf_file, open(dst_path, 'wb') as eot_file:
+        subprocess.check_call(['ttf2eot'], stdin=ttf_file, stdout=eot_file)
+
+def build_css(src_path, dst_path, options):
+    '''Write a CSS ``@font-face`` declaration with the base64-encoded .woff font.'''
+    from hTools2.modules.webfonts import encode_base64, make_base64_fontface_woff
+    font_name = os.path.splitext(os.path.basename(src_path))[0]
+    font_base64 = encode_base64(src_path).decode('ascii')
+    css_file = open(dst_path, 'w')
+    css_file.write(make_base64_fontface_woff(font_name, font_base64))
+    css_file.close()
+
+tasks_functions = {
+    'otf' : build_otf,
+    'strip_names' : build_strip_names,
+    'ttf' : build_ttf,
+    'autohint' : build_autohint,
+    'woff' : build_woff,
+    'woff2' : build_woff2,
+    'eot' : build_eot,
+    'css' : build_css,
+}
+
+#-----------
+# functions
+#-----------
+
+def get_output_path(dest_folder, file_name, task_name, subfolders=True):
+    '''Get the path of the file generated by a task.'''
+    extension, subfolder = tasks_outputs[task_name]
+    if subfolders:
+        return os.path.join(dest_folder, subfolder, '%s.%s' % (file_name, extension))
+    if task_name == 'autohint':
+        file_name = '%s_autohint' % file_name
+    elif task_name == 'strip_names':
+        file_name = '%s_stripped' % file_name
+    return os.path.join(dest_folder, '%s.%s' % (file_name, extension))
+
+def get_signature(src_path, options=None):
+    '''
+    Get a signature for the input of a task, from file sizes and modification times.
+
+    Works with single files and with folders (``.ufo`` fonts).
+
+    '''
+    if os.path.isdir(src_path):
+        paths = []
+        for root, dirs, files in os.walk(src_path):
+            dirs.sort()
+            for file_ in sorted(files):
+                paths.append(os.path.join(root, file_))
+    else:
+        paths = [src_path]
+    _hash = hashlib.md5()
+    for path in paths:
+        stat = os.stat(path)
+        _hash.update(('%s %s %s\n' % (os.path.relpath(path, src_path), stat.st_size, stat.st_mtime)).encode('utf-8'))
+    _hash.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    return _hash.hexdigest()
+
+def get_files_names(ufo_paths):
+    '''Get the names of the generated files for a list of ``.ufo`` paths. Fonts with the same name in different folders get the name of their folder as a prefix.'''
+    names = [ os.path.splitext(os.path.basename(ufo_path))[0] for ufo_path in ufo_paths ]
+    files_names = {}
+    for ufo_path, name in zip(ufo_paths, names):
+        if names.count(name) > 1:
+            name = '%s_%s' % (os.path.basename(os.path.dirname(os.path.abspath(ufo_path))), name)
+        files_names[ufo_path] = name
+    return files_names
+
+def make_tasks(ufo_path, dest_folder, formats, options=None, subfolders=True, file_name=None):
+    '''
+    Make a list of build tasks for one font, including all tasks needed by the given formats.
+
+    Tasks are identified by the full path of the ``.ufo`` source and the task name. Tasks are returned in dependency order.
+
+    :param str file_name: The name of the generated files, without extension. Defaults to the name of the ``.ufo`` font.
+
+    '''
+    if options is None:
+        options = otf_options
+    ufo_path = os.path.abspath(ufo_path)
+    if file_name is None:
+        file_name = os.path.splitext(os.path.basename(ufo_path))[0]
+    # collect formats and their dependencies
+    task_names = set()
+    for task_name in formats:
+        while task_name is not None:
+            task_names.add(task_name)
+            task_name = tasks_dependencies[task_name]
+    if 'strip_names' in formats:
+        for task_name in stripped_tasks:
+            if task_name in task_names:
+                task_names.add('strip_names')
+    # build tasks
+    tasks = []
+    for task_name, dependency in tasks_dependencies.items():
+        if task_name not in task_names:
+            continue
+        if task_name in stripped_tasks and 'strip_names' in task_names:
+            dependency = 'strip_names'
+        if dependency is None:
+            src_path = ufo_path
+            deps = []
+        else:
+            src_path = get_output_path(dest_folder, file_name, dependency, subfolders)
+            deps = ['%s:%s' % (ufo_path, dependency)]
+        task = {
+            'id' : '%s:%s' % (ufo_path, task_name),
+            'name' : task_name,
+            'font' : file_name,
+            'src' : src_path,
+            'dst' : get_output_path(dest_folder, file_name, task_name, subfolders),
+            'options' : options if task_name == 'otf' else None,
+            'deps' : deps,
+        }
+        tasks.append(task)
+    return tasks
+
+def make_result(task, status, error=None, start=0, end=0):
+    return {
+        'id' : task['id'],
+        'status' : status,
+        'time' : end - start,
+        'start' : start,
+        'end' : end,
+        'error' : error,
+    }
+
+def run_task(task):
+    '''Run a single build task, and return its result.'''
+    start = time.time()
+    try:
+        dst_folder = os.path.dirname(task['dst'])
+        if dst_folder and not os.path.exists(dst_folder):
+            os.makedirs(dst_folder, exist_ok=True)
+        tasks_functions[task['name']](task['src'], task['dst'], task['options'])
+        if os.path.exists(task['dst']):
+            status, error = 'done', None
+        else:
+            status, error = 'failed', 'output file was not created'
+    except Exception:
+        status, error = 'failed', traceback.format_exc()
+    return make_result(task, status, error, start, time.time())
+
+def run_tasks(tasks, workers=None, manifest=None, force=False):
+    '''
+    Run a list of build tasks, starting each task as soon as its dependencies are finished.
+
+    :param list tasks: The build tasks, in dependency order.
+    :param int workers: The number of worker processes. With ``workers=1`` all tasks run in the current process.
+    :param dict manifest: Input signatures from the previous build, by task id. Tasks whose signature has not changed are skipped. Updated in place.
+    :param bool force: Run all tasks, even if their inputs have not changed.
+    :returns: A dict of results by task id.
+
+    '''
+    if manifest is None:
+        manifest = {}
+    pending = OrderedDict([ (task['id'], task) for task in tasks ])
+    results = OrderedDict()
+    running = {}
+    workers = get_workers(workers)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while pending or running:
+            # start all tasks whose dependencies are finished
+            started = True
+            while started:
+                started = False
+                for task_id in list(pending.keys()):
+                    task = pending[task_id]
+                    if not all(dep in results for dep in task['deps']):
+                        continue
+                    del pending[task_id]
+                    started = True
+                    failed = [ dep for dep in task['deps'] if results[dep]['status'] == 'failed' ]
+                    if failed:
+                        results[task_id] = make_result(task, 'failed', 'dependency failed: %s' % ' '.join(failed))
+                        continue
+                    if not os.path.exists(task['src']):
+                        results[task_id] = make_result(task, 'failed', 'input file does not exist: %s' % task['src'])
+                        continue
+                    task['signature'] = get_signature(task['src'], task['options'])
+                    if not force and manifest.get(task_id) == task['signature'] and os.path.exists(task['dst']):
+                        results[task_id] = make_result(task, 'skipped')
+                        continue
+                    if executor is None or task['name'] in main_process_tasks:
+                        results[task_id] = run_task(task)
+                    else:
+                        running[executor.submit(run_task, task)] = task_id
+            # wait for the next running task to finish
+            if running:
+                finished, not_finished = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task_id = running.pop(future)
+                    results[task_id] = future.result()
+            # tasks with dependencies which are not in the graph
+            elif pending:
+                for task_id, task in pending.items():
+                    results[task_id] = make_result(task, 'failed', 'missing dependency')
+                pending.clear()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    # update manifest
+    for task in tasks:
+        result = results[task['id']]
+        if result['status'] == 'done':
+            manifest[task['id']] = task['signature']
+        elif result['status'] == 'failed':
+            manifest.pop(task['id'], None)
+    return results
+
+def get_critical_path(tasks, results):
+    '''
+    Get the chain of dependent tasks with the longest total running time.
+
+    :returns: A list of task ids, and the total time of the chain.
+
+    '''
+    finish = {}
+    previous = {}
+    for task in tasks:
+        dep = None
+        for _dep in task['deps']:
+            if dep is None or finish[_dep] > finish[dep]:
+                dep = _dep
+        finish[task['id']] = results[task['id']]['time'] + (finish[dep] if dep is not None else 0)
+        previous[task['id']] = dep
+    if not finish:
+        return [], 0
+    task_id = max(finish, key=finish.get)
+    total = finish[task_id]
+    path = []
+    while task_id is not None:
+        path.insert(0, task_id)
+        task_id = previous[task_id]
+    return path, total
+
+def print_build_report(tasks, results, build_time):
+    '''Print the status and timing of all tasks, marking the critical path with ``*``.'''
+    critical_path, critical_time = get_critical_path(tasks, results)
+    tasks_time = 0
+    for task in tasks:
+        result = results[task['id']]
+        tasks_time += result['time']
+        marker = '*' if task['id'] in critical_path else ' '
+        print('\t%s %-40s %-8s %8.2f s' % (marker, '%s:%s' % (task['font'], task['name']), result['status'], result['time']))
+        if result['error'] is not None:
+            print('\t\t%s' % result['error'])
+    print()
+    print('\tbuild time: %.2f s' % build_time)
+    print('\ttotal task time: %.2f s' % tasks_time)
+    tasks_names = dict([ (task['id'], '%s:%s' % (task['font'], task['name'])) for task in tasks ])
+    print('\tcritical path: %.2f s (%s)' % (critical_time, ' > '.join([ tasks_names[task_id] for task_id in critical_path ])))
+    print()
+
+def read_manifest(dest_folder):
+    manifest_path = os.path.join(dest_folder, manifest_file)
+    if os.path.exists(manifest_path):
+        try:
+            return json.load(open(manifest_path, 'r'))
+        except ValueError:
+            pass
+    return {}
+
+def write_manifest(dest_folder, manifest):
+    manifest_path = os.path.join(dest_folder, manifest_file)
+    json.dump(manifest, open(manifest_path, 'w'), indent=1, sort_keys=True)
+
+def build_fonts(ufo_paths, dest_folder, formats=['otf'], options=None, workers=None, force=False, subfolders=True, verbose=True):
+    '''
+    Generate fonts in the given formats for a list of ``.ufo`` sources.
+
+    :param list ufo_paths: A list of paths to ``.ufo`` fonts, or a folder containing them.
+    :param str dest_folder: The folder in which generated fonts are saved.
+    :param list formats: The formats to generate: ``otf``, ``strip_names``, ``ttf``, ``autohint``, ``woff``, ``woff2``, ``eot`` and/or ``css``. With ``strip_names``, ``.woff`` and ``.woff2`` fonts are made from the stripped ``.otf`` fonts.
+    :param dict options: Options for ``.otf`` generation, see ``otf_options``.
+    :param int workers: The number of worker processes (``None`` uses all CPUs).
+    :param bool force: Rebuild everything, even if inputs have not changed.
+    :param bool subfolders: Save each format in its own subfolder.
+    :returns: A dict of results by task id.
+
+    '''
+    if isinstance(ufo_paths, str):
+        ufo_paths = walk(ufo_paths, 'ufo')
+    if not os.path.exists(dest_folder):
+        os.makedirs(dest_folder)
+    ufo_paths = sorted(ufo_paths)
+    files_names = get_files_names(ufo_paths)
+    tasks = []
+    for ufo_path in ufo_paths:
+        tasks += make_tasks(ufo_path, dest_folder, formats, options, subfolders, files_names[ufo_path])
+    if verbose:
+        print('building %s for %s fonts...\n' % (' '.join(formats), len(ufo_paths)))
+    manifest = read_manifest(dest_folder)
+    start = time.time()
+    results = run_tasks(tasks, workers, manifest, force)
+    write_manifest(dest_folder, manifest)
+    if verbose:
+        print_build_report(tasks, results, time.time() - start)
+        print('...done.\n')
+    return results
@@ -0,0 +1,241 @@
+# [h] hTools2.modules.components
+
+'''
+A reverse index of components in a font: which glyphs use a given glyph as a component, directly or through other composites.
+
+The index is built once per font with a single pass over all glyphs. When the font is a defcon font (in RoboFont, or with fontParts), the index observes the font and updates only the glyphs which change; otherwise, it is rebuilt each time it is requested with ``get_index``.
+
+'''
+
+# imports
+
+import time
+import weakref
+
+from collections import deque
+
+#: Indexes of open fonts (see ``get_index``). Fonts are referenced weakly, so indexes and their observers are removed when their font is closed.
+indexes = weakref.WeakKeyDictionary()
+
+# functions
+
+def get_index(font):
+    '''
+    Get the component index for a font, creating it if necessary.
+
+    Indexes which cannot observe their font are rebuilt on each call, so they are always up to date.
+
+    '''
+    naked = get_naked(font)
+    if naked not in indexes:
+        indexes[naked] = ComponentIndex(font)
+    index = indexes[naked]
+    index.font = font
+    if not index.observing:
+        index.build()
+    return index
+
+def get_naked(font):
+    '''Get the font object wrapped by a fontParts font. Wrappers can change between calls, the wrapped font stays the same.'''
+    return font.naked() if hasattr(font, 'naked') else font
+
+def scan_users(font, glyph_name):
+    '''Find the glyphs which use a glyph as a component by scanning the whole font (for comparison with the index).'''
+    return set([ glyph.name for glyph in font if glyph_name in [ component.baseGlyph for component in glyph.components ] ])
+
+def decompose_users(font, glyph_name, transitive=True):
+    '''
+    Decompose all glyphs which use a glyph as a component, for example before deleting or redrawing it.
+
+    Returns the names of the decomposed glyphs.
+
+    '''
+    index = get_index(font)
+    if transitive:
+        glyph_names = index.get_all_users(glyph_name)
+    else:
+        glyph_names = index.get_users(glyph_name)
+    for user_name in glyph_names:
+        font[user_name].decompose()
+    return sorted(glyph_names)
+
+def benchmark_index(font, glyph_names=None, verbose=True):
+    '''
+    Compare the time needed to find the users of some glyphs by scanning the font and by querying the index.
+
+    :param list glyph_names: The glyphs to look up. Defaults to all glyphs which are used as components.
+    :returns: A dict with the times (in seconds) to ``build`` the index, to ``scan`` the font and to ``query`` the index.
+
+    '''
+    start = time.time()
+    index = ComponentIndex(font, observe=False)
+    build_time = time.time() - start
+    if glyph_names is None:
+        glyph_names = sorted(index.users.keys())
+    start = time.time()
+    scanned = [ scan_users(font, glyph_name) for glyph_name in glyph_names ]
+    scan_time = time.time() - start
+    start = time.time()
+    queried = [ index.get_users(glyph_name) for glyph_name in glyph_names ]
+    query_time = time.time() - start
+    assert scanned == queried
+    results = { 'glyphs' : len(font), 'queries' : len(glyph_names), 'build' : build_time, 'scan' : scan_time, 'query' : query_time }
+    if verbose:
+        print('component index (%s glyphs, %s queries):\n' % (results['glyphs'], results['queries']))
+        print('\tbuild: %.4f s' % build_time)
+        print('\tscan font: %.4f s' % scan_time)
+        print('\tquery index: %.4f s' % query_time)
+        print()
+    return results
+
+# objects
+
+class ComponentIndex(object):
+
+    '''
+    An index of the components in a font.
+
+    ``components`` maps each composed glyph to a tuple with the names of its base glyphs, and ``users`` maps each base glyph to the set of glyphs which use it. The font is referenced weakly.
+
+    '''
+
+    def __init__(self, font, observe=True):
+        self.font = font
+        self.components = {}
+        self.users = {}
+        self.observing = False
+        self._all_users = {}
+        self.build()
+        if observe:
+            self.start_observing()
+
+    # font
+
+    def _get_font(self):
+        font = self._font_ref()
+        if font is None:
+            # the wrapper is gone, wrap the font again
+            naked = self._naked_ref()
+            if naked is None:
+                return None
+            font = self._font_class(naked, showInterface=False)
+            self._font_ref = weakref.ref(font)
+        return font
+
+    def _set_font(self, font):
+        self._font_ref = weakref.ref(font)
+        self._naked_ref = weakref.ref(get_naked(font))
+        self._font_class = font.__class__
+
+    font = property(_get_font, _set_font)
+
+    def build(self):
+        '''Build the index from scratch.'''
+        self.components = {}
+        self.users = {}
+        self._all_users = {}
+        for glyph in self.font:
+            self.add_glyph(glyph.name, [ component.baseGlyph for component in glyph.components ])
+
+    def add_glyph(self, glyph_name, base_glyphs):
+        if not base_glyphs:
+            return
+        self.components[glyph_name] = tuple(base_glyphs)
+        for base_glyph in base_glyphs:
+            self.users.setdefault(base_glyph, set()).add(glyph_name)
+
+    def remove_glyph(self, glyph_name):
+        for base_glyph in self.components.pop(glyph_name, ()):
+            users = self.users.get(base_glyph)
+            if users is not None:
+                users.discard(glyph_name)
+                if not users:
+                    del self.users[base_glyph]
+
+    def update_glyph(self, glyph_name):
+        '''Read the components of one glyph again.'''
+        self.remove_glyph(glyph_name)
+        if glyph_name in self.font:
+            self.add_glyph(glyph_name, [ component.baseGlyph for component in self.font[glyph_name].components ])
+        self._all_users = {}
+
+    def rename_glyph(self, old_name, new_name):
+        '''Update the index after a glyph has been renamed. Composites which use the old name are not changed.'''
+        self.remove_glyph(old_name)
+        self.update_glyph(new_name)
+
+    # queries
+
+    def get_components(self, glyph_name):
+        '''Get the names of the base glyphs used in a glyph.'''
+        return self.components.get(glyph_name, ())
+
+    def get_users(self, glyph_name):
+        '''Get the names of the glyphs which use a glyph as a component.'''
+        return set(self.users.get(glyph_name, ()))
+
+    def get_all_users(self, glyph_name):
+        '''Get the names of all glyphs which use a glyph as a component, directly or through other composites.'''
+        if glyph_name not in self._all_users:
+            all_users = set()
+            queue = deque([glyph_name])
+            while queue:
+                for user_name in self.users.get(queue.popleft(), ()):
+                    if user_name not in all_users:
+                        all_users.add(user_name)
+                        queue.append(user_name)
+            all_users.discard(glyph_name)
+            self._all_users[glyph_name] = all_users
+        return set(self._all_users[glyph_name])
+
+    def get_composed_glyphs(self):
+        '''Get the names of all glyphs with components.'''
+        return list(self.components.keys())
+
+    # observers
+
+    def start_observing(self):
+        '''Update the index when glyphs are added, deleted, renamed, or their components change. Only possible with defcon fonts.'''
+        layer = self._get_layer()
+        if layer is None or not hasattr(layer, 'addObserver'):
+            return
+        layer.addObserver(self, 'glyph_added_callback', 'Layer.GlyphAdded')
+        layer.addObserver(self, 'glyph_deleted_callback', 'Layer.GlyphDeleted')
+        layer.addObserver(self, 'glyph_name_changed_callback', 'Layer.GlyphNameChanged')
+        for glyph in layer:
+            glyph.addObserver(self, 'components_changed_callback', 'Glyph.ComponentsChanged')
+        self.observing = True
+
+    def stop_observing(self):
+        if not self.observing:
+            return
+        self.observing = False
+        layer = self._get_layer()
+        if layer is None:
+            return
+        layer.removeObserver(self, 'Layer.GlyphAdded')
+        layer.removeObserver(self, 'Layer.GlyphDeleted')
+        layer.removeObserver(self, 'Layer.GlyphNameChanged')
+        for glyph in layer:
+            glyph.removeObserver(self, 'Glyph.ComponentsChanged')
+
+    def _get_layer(self):
+        naked = self._naked_ref()
+        if naked is None or not hasattr(naked, 'layers'):
+            return None
+        return naked.layers.defaultLayer
+
+    def glyph_added_callback(self, notification):
+        glyph_name = notification.data['name']
+        self._get_layer()[glyph_name].addObserver(self, 'components_changed_callback', 'Glyph.ComponentsChanged')
+        self.update_glyph(glyph_name)
+
+    def glyph_deleted_callback(self, notification):
+        self.remove_glyph(notification.data['name'])
+        self._all_users = {}
+
+    def glyph_name_changed_callback(self, notification):
+        self.rename_glyph(notification.data['oldValue'], notification.data['newValue'])
+
+    def components_changed_callback(self, notification):
+        self.update_glyph(notification.object.name)
@@ -0,0 +1,203 @@
+# [h] hTools2.modules.coverage
+
+'''
+Check the coverage of languages, character sets and Unicode blocks in many fonts at once.
+
+Each target is converted into a list of glyph names or a range of codepoints once, and then checked against the sets of glyph names and codepoints of each font. Fonts can be open fonts or ``.ufo`` paths; ``.ufo`` fonts are read from the ``.glif`` files directly, without loading any outlines.
+
+'''
+
+# imports
+
+import csv
+import json
+import os
+import plistlib
+import re
+
+from collections import OrderedDict
+
+from hTools2.modules.fileutils import walk
+from hTools2.modules.sysutils import map_parallel
+from hTools2.modules.unidata import get_block, get_blocks, get_charset_codepoints, get_charsets_names, get_languages_glyphnames, get_underware_languages
+
+#: All types of targets.
+targets_types = ['language', 'underware', 'charset', 'block']
+
+_unicode_hex = re.compile(b'<unicode\\s+hex="([0-9A-Fa-f]+)"')
+
+#---------
+# targets
+#---------
+
+def get_targets(types=None):
+    '''
+    Get coverage targets from the compiled data store.
+
+    Language and character set targets are lists of glyph names (``glyphs``), and a dict with the codepoint of each encoded glyph (``codepoints``). Block targets are ranges of codepoints.
+
+    :param list types: The types of targets to include (see ``targets_types``). Defaults to all types.
+    :returns: An ordered dict of targets by name, for example ``language:czech``, ``charset:adobe-latin-1`` or ``block:Basic Latin``.
+
+    '''
+    if types is None:
+        types = targets_types
+    targets = OrderedDict()
+    if 'language' in types:
+        for language, (lc, uc) in sorted(get_languages_glyphnames().items()):
+            targets['language:%s' % language] = { 'type' : 'language', 'glyphs' : lc + uc, 'codepoints' : {} }
+    if 'underware' in types:
+        for language, language_data in sorted(get_underware_languages().items()):
+            targets['underware:%s' % language] = { 'type' : 'underware', 'glyphs' : language_data['glyphs'], 'codepoints' : {} }
+    if 'charset' in types:
+        for charset_name in get_charsets_names():
+            glyphs = []
+            codepoints = {}
+            for charset_codepoints, glyph_name in get_charset_codepoints(charset_name):
+                glyphs.append(glyph_name)
+                if len(charset_codepoints) == 1:
+                    codepoints[glyph_name] = charset_codepoints[0]
+            targets['charset:%s' % charset_name] = { 'type' : 'charset', 'glyphs' : glyphs, 'codepoints' : codepoints }
+    if 'block' in types:
+        for start, end, block_name in get_blocks():
+            targets['block:%s' % block_name] = { 'type' : 'block', 'name' : block_name, 'range' : (start, end) }
+    return targets
+
+#-------
+# fonts
+#-------
+
+def get_font_data(font):
+    '''Get the name, glyph names and codepoints of an open font.'''
+    codepoints = set()
+    for glyph in font:
+        codepoints.update(glyph.unicodes)
+    name = '%s %s' % (font.info.familyName, font.info.styleName)
+    return { 'name' : name, 'glyphs' : set(font.keys()), 'codepoints' : codepoints }
+
+def read_ufo_data(ufo_path):
+    '''Get the name, glyph names and codepoints of a ``.ufo`` font, reading only ``fontinfo.plist``, ``contents.plist`` and the ``<unicode>`` elements of each ``.glif`` file.'''
+    glyphs_dir = os.path.join(ufo_path, 'glyphs')
+    with open(os.path.join(glyphs_dir, 'contents.plist'), 'rb') as contents_file:
+        contents = plistlib.load(contents_file)
+    codepoints = set()
+    for glif_file_name in contents.values():
+        with open(os.path.join(glyphs_dir, glif_file_name), 'rb') as glif_file:
+            glif = glif_file.read()
+        codepoints.update([ int(value, 16) for value in _unicode_hex.findall(glif) ])
+    name = os.path.splitext(os.path.basename(ufo_path))[0]
+    info_path = os.path.join(ufo_path, 'fontinfo.plist')
+    if os.path.exists(info_path):
+        with open(info_path, 'rb') as info_file:
+            info = plistlib.load(info_file)
+        if 'familyName' in info and 'styleName' in info:
+            name = '%s %s' % (info['familyName'], info['styleName'])
+    return { 'name' : name, 'glyphs' : set(contents.keys()), 'codepoints' : codepoints }
+
+#----------
+# coverage
+#----------
+
+def count_blocks(codepoints):
+    '''Count the codepoints in each Unicode block.'''
+    blocks = {}
+    for codepoint in codepoints:
+        block_name = get_block(codepoint)
+        if block_name is not None:
+            blocks[block_name] = blocks.get(block_name, 0) + 1
+    return blocks
+
+def check_target(target, font_data):
+    '''
+    Check the coverage of one target in one font.
+
+    A glyph counts as supported if the font contains a glyph with the same name, or a glyph with the same codepoint.
+
+    :returns: A dict with the number of ``supported`` glyphs (or codepoints), the ``total``, and a list of ``missing`` glyph names (for block targets, the number of missing codepoints).
+
+    '''
+    if target['type'] == 'block':
+        start, end = target['range']
+        supported = font_data['blocks'].get(target['name'], 0)
+        total = end - start + 1
+        return { 'supported' : supported, 'total' : total, 'missing' : total - supported }
+    missing = []
+    for glyph_name in target['glyphs']:
+        if glyph_name in font_data['glyphs']:
+            continue
+        if target['codepoints'].get(glyph_name) in font_data['codepoints']:
+            continue
+        missing.append(glyph_name)
+    total = len(target['glyphs'])
+    return { 'supported' : total - len(missing), 'total' : total, 'missing' : missing }
+
+def check_coverage(fonts, types=None, workers=1, skip_empty_blocks=True):
+    '''
+    Check the coverage of all targets in a list of fonts.
+
+    :param list fonts: A list of open fonts or ``.ufo`` paths, or a folder containing ``.ufo`` fonts. ``.ufo`` fonts are read in parallel when ``workers`` is not ``1``.
+    :param list types: The types of targets to check (see ``targets_types``).
+    :param bool skip_empty_blocks: Leave out Unicode blocks which are not used in any of the fonts.
+    :returns: A report dict with a list of ``fonts`` and a dict with the results for each target, one per font.
+
+    '''
+    if isinstance(fonts, str):
+        fonts = sorted(walk(fonts, 'ufo'))
+    if all([ isinstance(font, str) for font in fonts ]):
+        fonts_data = map_parallel(read_ufo_data, fonts, workers)
+    else:
+        fonts_data = [ read_ufo_data(font) if isinstance(font, str) else get_font_data(font) for font in fonts ]
+    for font_data in fonts_data:
+        font_data['blocks'] = count_blocks(font_data['codepoints'])
+    targets = get_targets(types)
+    report = { 'fonts' : [ font_data['name'] for font_data in fonts_data ], 'targets' : OrderedDict() }
+    for target_name, target in targets.items():
+        results = [ check_target(target, font_data) for font_data in fonts_data ]
+        if target['type'] == 'block' and skip_empty_blocks and not any([ result['supported'] for result in results ]):
+            continue
+        report['targets'][target_name] = { 'type' : target['type'], 'results' : results }
+    return report
+
+#---------
+# reports
+#---------
+
+def print_coverage_report(report, complete=False):
+    '''Print a coverage report: the percentage of each target supported by each font, and the missing glyphs. Fully supported targets are left out unless ``complete=True``.'''
+    print('checking coverage in %s fonts...\n' % len(report['fonts']))
+    for target_name, target in report['targets'].items():
+        results = target['results']
+        if not complete and all([ result['supported'] == result['total'] for result in results ]):
+            continue
+        print('\t%s' % target_name)
+        for font_name, result in zip(report['fonts'], results):
+            percent = 100.0 * result['supported'] / result['total'] if result['total'] else 100.0
+            print('\t\t%s: %.1f%%' % (font_name, percent), end=' ')
+            if target['type'] != 'block' and result['missing']:
+                print('(missing: %s)' % ' '.join(result['missing']), end='')
+            print()
+    print('\n...done.\n')
+
+def save_coverage_report(report, file_path):
+    '''
+    Save a coverage report as JSON or CSV, depending on the extension of ``file_path``.
+
+    In CSV files, language and character set targets have one row per glyph, with ``1`` or ``0`` for each font. Block targets have one row with the number of supported codepoints in each font.
+
+    '''
+    if os.path.splitext(file_path)[1].lower() != '.csv':
+        with open(file_path, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+        return
+    targets = get_targets(list(set([ target['type'] for target in report['targets'].values() ])))
+    with open(file_path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['target', 'type', 'glyph'] + report['fonts'])
+        for target_name, target in report['targets'].items():
+            results = target['results']
+            if target['type'] == 'block':
+                writer.writerow([target_name, target['type'], ''] + [ '%s/%s' % (result['supported'], result['total']) for result in results ])
+                continue
+            missing = [ set(result['missing']) for result in results ]
+            for glyph_name in targets[target_name]['glyphs']:
+                writer.writerow([target_name, target['type'], glyph_name] + [ int(glyph_name not in font_missing) for font_missing in missing ])
@@ -2,19 +2,68 @@
 
 '''Tools to work with encoding files, character sets etc.'''
 
-import hTools2.modules.str
-import importlib
-importlib.reload(hTools2.modules.str)
-
 import os
+import time
+import traceback
+
+from copy import deepcopy
+from functools import partial
 
 try:
     from mojo.roboFont import CurrentFont, OpenFont
 except ImportError:
     from fontParts.world import CurrentFont, OpenFont
 
-from hTools2.modules.str import *
+from hTools2.modules.unicode import *
 from hTools2.modules.color import clear_colors, hls_to_rgb
+from hTools2.modules.fileutils import walk
+from hTools2.modules.sysutils import map_parallel
+from hTools2.modules.unidata import get_name, get_codepoint, get_blocks, get_OS2_ranges
+
+#: Parsed encoding files, by path and parser.
+encodings_cache = {}
+
+def read_encoding_file(enc_path, parse_function):
+    '''
+    Read and parse an encoding file, reusing the result of earlier calls until the file is modified.
+
+    Returns a copy of the parsed data, so it can be changed safely.
+
+    '''
+    stat = os.stat(enc_path)
+    key = os.path.abspath(enc_path), parse_function.__name__
+    signature = stat.st_mtime, stat.st_size
+    if key not in encodings_cache or encodings_cache[key][0] != signature:
+        with open(enc_path, 'r') as enc_file:
+            lines = enc_file.readlines()
+        encodings_cache[key] = signature, parse_function(lines)
+    return deepcopy(encodings_cache[key][1])
+
+def parse_encoding(lines):
+    '''Get a list of glyph names from the lines of an encoding file.'''
+    glyph_names = []
+    for line in lines:
+        if not line[:1] == '%':
+            glyph_names.append(line.strip())
+    return glyph_names
+
+def parse_groups_encoding(lines):
+    '''Get an OrderedDict of groups and glyph names from the lines of a structured encoding file.'''
+    groups = OrderedDict()
+    count = 0
+    for line in lines:
+        if count == 0:
+            pass
+        elif line[:1] == '%':
+            if line[1:2] != '_':
+                group_name = line[18:-1]
+                if len(group_name) > 0:
+                    groups[group_name] = []
+        else:
+            glyph_name = line[:-1]
+            groups[group_name].append(glyph_name)
+        count = count + 1
+    return groups
 
 def import_encoding(file_path):
     '''
@@ -26,12 +75,7 @@ def import_encoding(file_path):
 
     '''
     if os.path.exists(file_path):
-        lines = open(file_path, 'r').readlines()
-        glyph_names = []
-        for line in lines:
-            if not line[:1] == '%':
-                glyph_names.append(line.strip())
-        return glyph_names
+        return read_encoding_file(file_path, parse_encoding)
     else:
         print('Error, this file does not exist.')
 
@@ -98,22 +142,7 @@ def import_groups_from_encoding(enc_path):
 
     '''
     if os.path.exists(enc_path):
-        lines = open(enc_path, 'r').readlines()
-        groups = OrderedDict()
-        count = 0
-        for line in lines:
-            if count == 0:
-                pass
-            elif line[:1] == '%':
-                if line[1:2] != '_':
-                    group_name = line[18:-1]
-                    if len(group_name) > 0:
-                        groups[group_name] = []
-            else:
-                glyph_name = line[:-1]
-                groups[group_name].append(glyph_name)
-            count = count + 1
-        return groups
+        return read_encoding_file(enc_path, parse_groups_encoding)
 
 # def set_glyph_order_OLD(font, encoding_path, verbose=False):
 #     glyph_names = import_encoding(encoding_path)
@@ -127,18 +156,37 @@ def import_groups_from_encoding(enc_path):
 #     font.glyphOrder = glyph_order
 #     font.update()
 
-def set_glyph_order(font, enc_path, verbose=False, create_templates=True, create_glyphs=False):
-    if verbose:
-        print('setting glyph order...')
-    glyph_names = import_encoding(enc_path)
+def new_glyphs(font, glyph_names):
+    '''Create several new glyphs in a font. In RoboFont, font notifications are held until all glyphs have been created.'''
+    naked = font.naked() if hasattr(font, 'naked') else None
+    hold = hasattr(naked, 'holdNotifications')
+    if hold:
+        naked.holdNotifications()
+    for glyph_name in glyph_names:
+        font.newGlyph(glyph_name)
+    if hold:
+        naked.releaseHeldNotifications()
+
+def apply_glyph_order(font, glyph_names, verbose=False, create_templates=True, create_glyphs=False):
+    '''
+    Set the glyph order of a font from a list of glyph names.
+
+    Glyphs which are not in the font are created (``create_glyphs``), added to the glyph order as template glyphs (``create_templates``), or left out.
+
+    :returns: A tuple with the lists of ``new`` glyph names and ``missing`` glyph names (not created and not in the glyph order).
+
+    '''
+    font_glyphs = set(font.keys())
     glyph_order = []
+    new = []
+    missing = []
     for glyph_name in glyph_names:
-        if glyph_name in list(font.keys()):
+        if glyph_name in font_glyphs:
             glyph_order.append(glyph_name)
         else:
             # add new glyph
             if create_glyphs:
-                font.newGlyph(glyph_name)
+                new.append(glyph_name)
                 glyph_order.append(glyph_name)
                 if verbose:
                     print('\tcreating new glyph %s...' % glyph_name)
@@ -149,13 +197,68 @@ def set_glyph_order(font, enc_path, verbose=False, create_templates=True, create
                     print('\tcreating new template glyph %s...' % glyph_name)
             # glyph not in font
             else:
+                missing.append(glyph_name)
                 if verbose:
                     print('\t%s not in font' % glyph_name)
+    new_glyphs(font, new)
     font.glyphOrder = glyph_order
     font.update()
+    return new, missing
+
+def set_glyph_order(font, enc_path, verbose=False, create_templates=True, create_glyphs=False):
+    if verbose:
+        print('setting glyph order...')
+    glyph_names = import_encoding(enc_path)
+    apply_glyph_order(font, glyph_names, verbose, create_templates, create_glyphs)
     if verbose:
         print('...done.\n')
 
+def set_glyph_order_ufo(ufo_path, glyph_names, create_templates=True, create_glyphs=False):
+    '''
+    Open a ``.ufo`` font, set its glyph order, save and close it.
+
+    :returns: A result dict with the keys ``path``, ``new``, ``missing``, ``time`` and ``error``.
+
+    '''
+    from hTools2.modules.batch import open_font
+    result = { 'path' : ufo_path, 'new' : [], 'missing' : [], 'time' : 0, 'error' : None }
+    start = time.time()
+    try:
+        font = open_font(ufo_path)
+        result['new'], result['missing'] = apply_glyph_order(font, glyph_names, False, create_templates, create_glyphs)
+        font.save()
+        font.close()
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['time'] = time.time() - start
+    return result
+
+def set_glyph_order_folder(ufo_paths, enc_path, workers=None, create_templates=True, create_glyphs=False, verbose=True):
+    '''
+    Apply one encoding file to all fonts in a list of ``.ufo`` paths (or in a folder), using several processes.
+
+    The encoding is read only once. Each font is opened, changed, saved and closed in a worker process; ``workers=1`` processes all fonts in the current process.
+
+    :returns: A list of result dicts, one per font (see ``set_glyph_order_ufo``).
+
+    '''
+    if isinstance(ufo_paths, str):
+        ufo_paths = walk(ufo_paths, 'ufo')
+    ufo_paths = sorted(ufo_paths)
+    glyph_names = import_encoding(enc_path)
+    if verbose:
+        print('setting glyph order in %s fonts...\n' % len(ufo_paths))
+    function = partial(set_glyph_order_ufo, glyph_names=glyph_names, create_templates=create_templates, create_glyphs=create_glyphs)
+    results = map_parallel(function, ufo_paths, workers)
+    if verbose:
+        for result in results:
+            if result['error'] is None:
+                print('\t%s: %s new, %s missing (%.2f s)' % (os.path.basename(result['path']), len(result['new']), len(result['missing']), result['time']))
+            else:
+                print('\t### %s failed:\n%s' % (os.path.basename(result['path']), result['error']))
+        print('\n...done.\n')
+    return results
+
 def paint_groups(font, crop=False, order=None):
     '''
     Paint glyphs in the font according to their groups.
@@ -196,6 +299,7 @@ def paint_groups(font, crop=False, order=None):
 
 def crop_glyphset(font, glyph_names):
     '''Reduce the font's character set, keeping only glyphs with names in the given list.'''
+    glyph_names = set(glyph_names)
     for glyph in font:
         if glyph.name not in glyph_names:
             if glyph.name is not None:
@@ -217,11 +321,7 @@ def char2psname(char):
     Get the PostScript glyph name for a given unicode character.
 
     '''
-    try:
-        glyphname = unicode2psnames[ord(char)]
-    except:
-        glyphname = None
-    return glyphname
+    return get_name(ord(char))
 
 def chars2psnames(char_list):
     '''
@@ -240,24 +340,13 @@ def psname2char(glyph_name):
     Get the unicode character for a given glyph name.
 
     '''
-    if glyph_name in psnames2unicodes:
-        uni = psnames2unicodes[glyph_name]
-
-    elif glyph_name in unicodes_extra:
-        uni = unicodes_extra[glyph_name]
+    uni = get_codepoint(glyph_name)
 
-    elif glyph_name.startswith('uni'):
-        uni = glyph_name[3:]
-
-    else:
-        uni = None
+    if uni is None and glyph_name.startswith('uni'):
+        uni = unicode_hexstr_to_int(glyph_name[3:])
 
     if uni:
-        try:
-            char = chr(uni)
-        except:
-            uni_int = unicode_hexstr_to_int(str(uni))
-            char = chr(uni_int)
+        char = chr(uni)
     else:
         char = None
 
@@ -379,12 +468,12 @@ def set_OS2_unicode_ranges(ufo, blocks, OS2_ranges):
     ufo.info.openTypeOS2UnicodeRanges = unicode_ranges
 
 def auto_OS2_unicode_ranges(ufo):
-    modules_dir = os.path.dirname(__file__)
-    base_dir = os.path.dirname(modules_dir)
-    extras_dir = os.path.join(base_dir, 'extras')
-    blocks_file_path = os.path.join(extras_dir, 'unicode-blocks.txt')
-    OS2_unicode_ranges_file_path = os.path.join(extras_dir, 'unicode-ranges.txt')
-    blocks = get_unicode_blocks_from_file(blocks_file_path)
-    ranges = get_OS2_unicode_ranges_from_file(OS2_unicode_ranges_file_path)
+    # get blocks and ranges from the compiled data store
+    blocks = OrderedDict()
+    for start, end, block_name in get_blocks():
+        blocks[block_name] = (unicode_int_to_hexstr(start), unicode_int_to_hexstr(end))
+    ranges = OrderedDict()
+    for bit, range_name, start, end in get_OS2_ranges():
+        ranges[range_name] = [bit, (unicode_int_to_hexstr(start), unicode_int_to_hexstr(end))]
     set_OS2_unicode_ranges(ufo, blocks, ranges)
 
@@ -4,7 +4,9 @@
 
 # imports
 
+import difflib
 import os
+import re
 
 from random import randint
 
@@ -15,7 +17,8 @@ try:
 except:
     from fontParts.world import CurrentGlyph, CurrentFont, NewFont
 
-from hTools2.modules.glyphutils import round_points, round_width
+from hTools2.modules.components import get_index
+from hTools2.modules.transforms import scale_font, move_font, gridfit_font
 from hTools2.modules.color import *
 
 #--------
@@ -115,10 +118,10 @@ def mark_composed_glyphs(font, color='Orange', alpha=.35):
     R, G, B = x11_colors[color]
     mark_color = convert_to_1(R, G, B)
     mark_color += (alpha,)
-    for glyph in font:
-        if len(glyph.components) > 0:
-            glyph.mark = mark_color
-            glyph.update()
+    for glyph_name in get_index(font).get_composed_glyphs():
+        glyph = font[glyph_name]
+        glyph.mark = mark_color
+        glyph.update()
     font.update()
 
 #-----------------
@@ -181,74 +184,250 @@ def rename_glyphs_from_list(font, names_list, overwrite=True, mark=True, verbose
         print()
         print('...done.\n')
 
-def rename_glyphs_in_font(ufo, names_list, glyphs=True, features=True, components=True):
+def get_rename_map(names_list):
+    """
+    Convert a list of ``(old_name, new_name)`` pairs into a dict.
+
+    All names are renamed at once, so pairs can be chained or swapped (for example ``a`` to ``b`` and ``b`` to ``a``). Unchanged names are left out.
+
+    """
+    return dict([ (old_name, new_name) for old_name, new_name in names_list if old_name != new_name ])
+
+#: Tokens in feature code: comments, strings, glyph names, escaped glyph names and class names.
+_fea_token = re.compile(r'#[^\n]*|"[^"]*"|[@\\]?[A-Za-z0-9_.][A-Za-z0-9_.\-]*')
+
+def rename_token(token, rename_map, glyph_names=None):
+    """
+    Rename one token from feature code. Comments, strings and class names are not renamed.
+
+    Names with a hyphen are glyph names, unless ``glyph_names`` is given and the name is not one of them: then the token is a glyph range (``a-z``), and is renamed at both ends. Ranges with spaces around the hyphen are separate tokens.
+
+    """
+    if token[:1] in ('@', '#', '"'):
+        return token
+    if token[:1] == '\\':
+        return '\\' + rename_map.get(token[1:], token[1:])
+    if token in rename_map:
+        return rename_map[token]
+    if '-' in token and glyph_names is not None and token not in glyph_names:
+        parts = token.split('-')
+        if len(parts) == 2 and all([ part in glyph_names for part in parts ]):
+            return '-'.join([ rename_map.get(part, part) for part in parts ])
+    return token
+
+def rename_features_text(fea_text, rename_map, glyph_names=None):
+    """
+    Rename glyph names in feature code, in a single pass over all tokens.
+
+    Only whole names are replaced, so renaming ``a`` does not change ``aacute``. Names in comments and strings are not changed. Glyph ranges without spaces (``a-z``) are renamed only if ``glyph_names`` (the glyphs in the font) is given; see ``rename_token``.
+
+    :returns: A tuple with the new feature code and the number of renamed tokens.
+
+    """
+    count = [0]
+    def replace(match):
+        token = match.group(0)
+        new_token = rename_token(token, rename_map, glyph_names)
+        if new_token != token:
+            count[0] += 1
+        return new_token
+    return _fea_token.sub(replace, fea_text), count[0]
+
+def rename_encoding_lines(lines, rename_map):
+    """Rename glyph names in the lines of an encoding file. Comment lines are kept, and duplicate glyph names are removed."""
+    new_lines = []
+    glyph_names = set()
+    for line in lines:
+        if line[:1] != '%':
+            glyph_name = line.strip()
+            glyph_name = rename_map.get(glyph_name, glyph_name)
+            if glyph_name in glyph_names:
+                continue
+            glyph_names.add(glyph_name)
+            line = '%s\n' % glyph_name
+        new_lines.append(line)
+    return new_lines
+
+def get_rename_changes(font, names_list, glyphs=True, components=True, groups=True, kerning=True, features=True, glyph_order=True):
+    """
+    Collect all changes needed to rename glyphs in a font, without changing the font.
+
+    Glyphs are not renamed if the new name is already used by a glyph which is not renamed itself. These pairs are listed as ``skipped``, and are not renamed anywhere else in the font either.
+
+    :returns: A dict with the lists of changes for each part of the font (see ``rename_font``).
+
+    """
+    rename_map = get_rename_map(names_list)
+    font_names = set(font.keys())
+    changes = { 'glyphs' : [], 'skipped' : [], 'components' : [], 'groups' : [], 'kerning' : [], 'features' : [], 'glyphOrder' : [] }
     if glyphs:
-        rename_glyphs(f, names_list)
-    if features:
-        rename_features(f, names_list)
+        moved = set([ old_name for old_name in rename_map if old_name in font_names ])
+        for old_name, new_name in sorted(rename_map.items()):
+            if old_name not in font_names:
+                continue
+            if new_name in font_names and new_name not in moved:
+                changes['skipped'].append((old_name, new_name))
+            else:
+                changes['glyphs'].append((old_name, new_name))
+        for old_name, new_name in changes['skipped']:
+            del rename_map[old_name]
+    changes['map'] = rename_map
     if components:
-        rename_components(f, names_list)
+        index = get_index(font)
+        for old_name in sorted(rename_map):
+            for glyph_name in sorted(index.get_users(old_name)):
+                for i, base_glyph in enumerate(index.get_components(glyph_name)):
+                    if base_glyph == old_name:
+                        changes['components'].append((glyph_name, i, old_name, rename_map[old_name]))
+    if groups:
+        for group_name, group_glyphs in font.groups.items():
+            new_glyphs = [ rename_map.get(glyph_name, glyph_name) for glyph_name in group_glyphs ]
+            if new_glyphs != list(group_glyphs):
+                changes['groups'].append((group_name, list(group_glyphs), new_glyphs))
+    if kerning:
+        for (first, second), value in font.kerning.items():
+            new_pair = rename_map.get(first, first), rename_map.get(second, second)
+            if new_pair != (first, second):
+                changes['kerning'].append(((first, second), new_pair, value))
+    if features and font.features.text:
+        fea_text, count = rename_features_text(font.features.text, rename_map, font_names)
+        if count:
+            changes['features'] = list(difflib.unified_diff(font.features.text.splitlines(), fea_text.splitlines(), 'features.fea', 'features.fea', lineterm=''))
+            changes['features_text'] = fea_text
+    if glyph_order:
+        for old_name in font.glyphOrder:
+            if old_name in rename_map:
+                changes['glyphOrder'].append((old_name, rename_map[old_name]))
+    return changes
+
+def apply_rename_changes(font, changes, mark=True):
+    """Apply changes collected with ``get_rename_changes`` to a font, holding font notifications until all changes are done."""
+    rename_map = changes['map']
+    naked = font.naked() if hasattr(font, 'naked') else None
+    hold = hasattr(naked, 'holdNotifications')
+    if hold:
+        naked.holdNotifications()
+    glyph_order = list(font.glyphOrder)
+    # rename glyphs in two steps, so names can be swapped
+    if changes['glyphs']:
+        renamed = []
+        for i, (old_name, new_name) in enumerate(changes['glyphs']):
+            glyph = font[old_name]
+            glyph.name = '_rename_%s_%s' % (i, old_name)
+            renamed.append((glyph, new_name))
+        for glyph, new_name in renamed:
+            glyph.name = new_name
+            if mark:
+                glyph.mark = named_colors['green']
+    for glyph_name, i, old_name, new_name in changes['components']:
+        glyph_name = rename_map.get(glyph_name, glyph_name) if changes['glyphs'] else glyph_name
+        glyph = font[glyph_name]
+        glyph.components[i].baseGlyph = new_name
+        if mark:
+            glyph.mark = 0, 1, 1, 0.4
+    for group_name, old_glyphs, new_glyphs in changes['groups']:
+        font.groups[group_name] = new_glyphs
+    if changes['kerning']:
+        kerning = dict(font.kerning.items())
+        for old_pair, new_pair, value in changes['kerning']:
+            del kerning[old_pair]
+        for old_pair, new_pair, value in changes['kerning']:
+            kerning[new_pair] = value
+        font.kerning.clear()
+        font.kerning.update(kerning)
+    if changes['features']:
+        font.features.text = changes['features_text']
+    if changes['glyphOrder']:
+        font.glyphOrder = [ rename_map.get(glyph_name, glyph_name) for glyph_name in glyph_order ]
+    if hold:
+        naked.releaseHeldNotifications()
+    font.update()
+
+def print_rename_changes(changes):
+    """Print a list of rename changes as a diff."""
+    for old_name, new_name in changes['skipped']:
+        print('\tskipping "%s", "%s" already exists in font.' % (old_name, new_name))
+    for old_name, new_name in changes['glyphs']:
+        print('\tglyph: %s -> %s' % (old_name, new_name))
+    for glyph_name, i, old_name, new_name in changes['components']:
+        print('\tcomponent: %s[%s] %s -> %s' % (glyph_name, i, old_name, new_name))
+    for group_name, old_glyphs, new_glyphs in changes['groups']:
+        print('\tgroup: %s' % group_name)
+        print('\t\t- %s' % ' '.join(old_glyphs))
+        print('\t\t+ %s' % ' '.join(new_glyphs))
+    for old_pair, new_pair, value in changes['kerning']:
+        print('\tkerning: %s %s -> %s %s (%s)' % (old_pair + new_pair + (value,)))
+    if changes['glyphOrder']:
+        print('\tglyph order: %s names' % len(changes['glyphOrder']))
+    for line in changes['features']:
+        print('\t%s' % line)
+
+def rename_font(font, names_list, glyphs=True, components=True, groups=True, kerning=True, features=True, glyph_order=True, mark=True, dry_run=False, verbose=True):
+    """
+    Rename glyphs everywhere in a font: glyphs, components, groups, kerning pairs, OpenType features and glyph order.
+
+    All changes are collected first, and then applied in one go. With ``dry_run=True`` the font is not changed, and the changes are only printed.
+
+    :param list names_list: A list of ``(old_name, new_name)`` pairs.
+    :returns: A dict with the lists of changes for each part of the font.
+
+    """
+    changes = get_rename_changes(font, names_list, glyphs, components, groups, kerning, features, glyph_order)
+    if verbose:
+        print('renaming glyphs%s...\n' % (' (dry run)' if dry_run else ''))
+        print_rename_changes(changes)
+        print()
+    if not dry_run:
+        apply_rename_changes(font, changes, mark)
+    if verbose:
+        print('...done.\n')
+    return changes
+
+def rename_glyphs_in_font(ufo, names_list, glyphs=True, features=True, components=True):
+    rename_font(ufo, names_list, glyphs=glyphs, components=components, groups=glyphs, kerning=glyphs, features=features, glyph_order=glyphs)
 
 def rename_glyphs(font, names_list):
     rename_glyphs_from_list(font, names_list, overwrite=False, mark=True, verbose=True)
 
 def rename_features(font, names_list):
-    features_old = font.features.text.split('\n')
-    features_new = ''
     print('renaming glyph names in OpenType features...\n')
-    for line in features_old:
-        for old_name, new_name in names_list:
-            if old_name in line:
-                print('\trenaming "%s" to "%s"...' % (old_name, new_name))
-                line = line.replace(old_name, new_name)
-        features_new += '%s\n' % line
-    font.features.text = features_new
+    font.features.text, count = rename_features_text(font.features.text, get_rename_map(names_list), set(font.keys()))
+    print('\t%s names renamed.' % count)
     print()
     print('...done.\n')
 
 def rename_components(font, names_list, mark=True):
-    for glyph_name in list(font.keys()):
-        if len(font[glyph_name].components):
-            for component in font[glyph_name].components:
-                for old_name, new_name in names_list:
-                    if component.baseGlyph == old_name:
-                        component.baseGlyph = new_name
-                        if mark:
-                            font[glyph_name].mark = 0, 1, 1, 0.4
+    rename_map = get_rename_map(names_list)
+    index = get_index(font)
+    users = set()
+    for old_name in rename_map:
+        users.update(index.get_users(old_name))
+    for glyph_name in users:
+        glyph = font[glyph_name]
+        for component in glyph.components:
+            if component.baseGlyph in rename_map:
+                component.baseGlyph = rename_map[component.baseGlyph]
+        if mark:
+            glyph.mark = 0, 1, 1, 0.4
 
 def rename_features_file(fea_path, names_list):
-    features_old = open(fea_path, 'r').readlines()
-    features_new = []
+    with open(fea_path, 'r') as fea_file:
+        fea_text = fea_file.read()
     print('renaming glyph names in features file...\n')
-    for line in features_old:
-        for old_name, new_name in names_list:
-            if old_name in line:
-                print('\trenaming "%s" to "%s"...' % (old_name, new_name))
-                line = line.replace(old_name, new_name)
-        features_new += line
-    fea_txt = ''.join(features_new)
-    fea_dest = open(fea_path, 'w')
-    fea_dest.write(fea_txt)
-    fea_dest.close()
+    fea_text, count = rename_features_text(fea_text, get_rename_map(names_list))
+    print('\t%s names renamed.' % count)
+    with open(fea_path, 'w') as fea_dest:
+        fea_dest.write(fea_text)
     print()
     print('...done.\n')
 
 def rename_encoding(enc_path, names_list):
-    enc_src = open(enc_path, 'r').readlines()
-    lines = []
+    with open(enc_path, 'r') as enc_src:
+        lines = enc_src.readlines()
     print('renaming glyph names in encoding file...\n')
-    for line in enc_src:
-        for old_name, new_name in names_list:
-            if old_name in line:
-                print('\trenaming "%s" to "%s"...' % (old_name, new_name))
-                line = line.replace(old_name, new_name)
-        # check to avoid duplicates
-        if not line in lines:
-            lines.append(line)
-    enc = ''.join(lines)
-    enc_dest = open(enc_path, 'w')
-    enc_dest.write(enc)
-    enc_dest.close()
+    lines = rename_encoding_lines(lines, get_rename_map(names_list))
+    with open(enc_path, 'w') as enc_dest:
+        enc_dest.write(''.join(lines))
     print()
     print('...done.\n')
 
@@ -496,8 +675,8 @@ def decompose(font):
     Decompose all composed glyph in the font.
 
     """
-    for glyph in font:
-        glyph.decompose()
+    for glyph_name in get_index(font).get_composed_glyphs():
+        font[glyph_name].decompose()
 
 def auto_contour_order(font):
     """
@@ -531,7 +710,7 @@ def auto_point_start(font):
 
 def add_extremes(font):
     """
-    Add extreme points to all glyphs in the font, if they are missing.
+    Add extreme points to all glyphs in the font, if they are missing. Needs RoboFont glyphs (``glyph.extremePoints``).
 
     """
     for glyph in font:
@@ -544,29 +723,19 @@ def remove_overlap(font):
 
 def align_to_grid(font, xxx_todo_changeme):
     """
-    Align all points of all glyphs in the font to a grid with size ``(sizeX,sizeY)``.
+    Align all points of all glyphs in the font to a grid with size ``(sizeX,sizeY)``. Component offsets and anchors are aligned too.
 
     """
     (sizeX, sizeY) = xxx_todo_changeme
-    for glyph in font:
-        round_points(glyph, (sizeX, sizeY))
-        glyph.update()
-    font.update()
+    gridfit_font(font, (sizeX, sizeY), width=False)
 
 def scale_glyphs(f, xxx_todo_changeme1):
     """
-    Scale all glyphs in the font by the given ``(x,y)`` factor.
+    Scale all glyphs in the font by the given ``(x,y)`` factor. Composites are scaled by adjusting their component offsets, without decomposing.
 
     """
     (factor_x, factor_y) = xxx_todo_changeme1
-    for g in f:
-        if len(g.components) == 0:
-            leftMargin, rightMargin = g.leftMargin, g.rightMargin
-            g.scale((factor_x, factor_y))
-            g.leftMargin = leftMargin * factor_x
-            g.rightMargin = rightMargin * factor_x
-            g.update()
-    f.update()
+    scale_font(f, (factor_x, factor_y))
 
 def move_glyphs(f, xxx_todo_changeme2):
     """
@@ -574,18 +743,10 @@ def move_glyphs(f, xxx_todo_changeme2):
 
     """
     (delta_x, delta_y) = xxx_todo_changeme2
-    for g in f:
-        g.move((delta_x, delta_y))
-        g.update()
-    f.update()
+    move_font(f, (delta_x, delta_y))
 
 def round_to_grid(font, gridsize, glyphs=None):
-    if glyphs is None:
-        glyphs = list(font.keys())
-    for glyph_name in glyphs:
-        round_points(font[glyph_name], (gridsize, gridsize))
-        round_width(font[glyph_name], gridsize)
-    font.update()
+    gridfit_font(font, (gridsize, gridsize), glyphs)
 
 #------
 # misc
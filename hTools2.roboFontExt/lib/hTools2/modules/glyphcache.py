@@ -0,0 +1,474 @@
+# [h] hTools2.modules.glyphcache
+
+'''
+A cache of glyph geometry: bounds, point structure, components, anchors, area and margins.
+
+Entries are keyed by a hash of each glyph's ``.glif`` data (including the hashes of its component base glyphs), and stored in an SQLite file next to the ``.ufo`` (or in ``cache_folder``), so they are reused in later sessions. A changed glyph gets a new hash, so only changed glyphs are measured again.
+
+Open defcon fonts are observed, so only glyphs which have changed are hashed again; caches of fonts without a path are kept in memory, and their entries are keyed by glyph name and a change counter.
+
+'''
+
+# imports
+
+import hashlib
+import json
+import os
+import plistlib
+import re
+import sqlite3
+import weakref
+
+from fontTools.pens.areaPen import AreaPen
+from fontTools.pens.boundsPen import BoundsPen
+from fontTools.pens.pointPen import PointToSegmentPen
+from fontTools.ufoLib.glifLib import readGlyphFromString
+
+try:
+    from fontPens.marginPen import MarginPen
+except ImportError:
+    from robofab.pens.marginPen import MarginPen
+
+#: Extension of cache files.
+cache_extension = '.geometry.db'
+
+#: Save caches of fonts with a path to disk, so they are reused in later sessions.
+save_caches = True
+
+#: Folder in which cache files are saved. If ``None``, cache files are saved next to the ``.ufo`` files.
+cache_folder = None
+
+#: Caches of open fonts (see ``get_cache``). Fonts are referenced weakly, so caches are removed when their font is closed.
+caches = weakref.WeakKeyDictionary()
+
+_component_base = re.compile(b'<component[^>]*\\sbase="([^"]+)"')
+
+# functions
+
+def get_naked(font):
+    '''Get the font object wrapped by a fontParts font.'''
+    return font.naked() if hasattr(font, 'naked') else font
+
+def get_cache_path(ufo_path):
+    '''Get the path of the cache file for a ``.ufo`` font, next to the font or in ``cache_folder``.'''
+    if cache_folder is None:
+        return '%s%s' % (os.path.splitext(ufo_path)[0], cache_extension)
+    ufo_path = os.path.abspath(ufo_path)
+    file_name = '%s-%s%s' % (os.path.splitext(os.path.basename(ufo_path))[0], hashlib.sha1(ufo_path.encode('utf-8')).hexdigest()[:12], cache_extension)
+    return os.path.join(cache_folder, file_name)
+
+def get_cache(font):
+    '''
+    Get the geometry cache for an open font, creating it if necessary.
+
+    Caches are reused, so all modules working on the same font share one cache. Caches which cannot observe their font forget all glyph hashes on each call.
+
+    '''
+    naked = get_naked(font)
+    if naked not in caches:
+        caches[naked] = GeometryCache(font)
+    cache = caches[naked]
+    cache.font = font
+    if not cache.observing:
+        cache.refresh()
+    return cache
+
+def close_db(db):
+    '''Commit and close a cache database, when its cache is closed or garbage-collected.'''
+    try:
+        db.commit()
+        db.close()
+    except sqlite3.Error:
+        pass
+
+def get_structure(glyph):
+    '''
+    Get a string describing the point structure of a glyph's contours.
+
+    Each contour is described by a ``c`` (closed) or ``o`` (open) followed by one letter for each point type, contours are separated by ``|``.
+
+    '''
+    contours = []
+    for contour in glyph.contours:
+        types = ''.join([ point.type[0] for point in contour.points ])
+        contours.append(('o' if contour.open else 'c') + types)
+    return '|'.join(contours)
+
+def measure_glyph(glyph):
+    '''Measure all cached values for a glyph.'''
+    pen = AreaPen()
+    for contour in glyph.contours:
+        contour.draw(pen)
+    box = glyph.box
+    return {
+        'bounds' : list(box) if box is not None else None,
+        'width' : glyph.width,
+        'contours' : len(glyph.contours),
+        'structure' : get_structure(glyph),
+        'components' : [ component.baseGlyph for component in glyph.components ],
+        'anchors' : [ anchor.name for anchor in glyph.anchors ],
+        'area' : pen.value,
+        'margins' : {},
+    }
+
+def measure_margins(glyph, value, horizontal=True):
+    '''
+    Get the first and last intersections of a glyph with a horizontal or vertical line.
+
+    Returns a list ``[min, max]``, or ``None`` if the line does not cross the glyph.
+
+    '''
+    pen = MarginPen(glyph.getParent(), value, isHorizontal=horizontal)
+    glyph.draw(pen)
+    margins = pen.getMargins()
+    if not margins:
+        return None
+    return list(margins)
+
+def measure_glif(data):
+    '''
+    Measure the contours of a glyph directly from its ``.glif`` data, without loading the font.
+
+    Returns a dict with the ``bounds`` of the contours only (or ``None``), and the ``components`` as a list of ``[base_glyph, transformation]`` lists.
+
+    '''
+    bounds_pen = BoundsPen(None)
+    components = draw_glif_contours(data, bounds_pen)
+    bounds = bounds_pen.bounds
+    return { 'bounds' : list(bounds) if bounds is not None else None, 'components' : components }
+
+def draw_glif_contours(data, pen):
+    '''
+    Draw the contours of a glyph from its ``.glif`` data into a segment pen, without loading the font.
+
+    Returns the components as a list of ``[base_glyph, transformation]`` lists.
+
+    '''
+    point_pen = _GlifContoursPointPen(pen)
+    readGlyphFromString(data, _GlifGlyph(), point_pen)
+    return point_pen.components
+
+# objects
+
+class _GlifGlyph(object):
+
+    '''A minimal glyph object for reading ``.glif`` data.'''
+
+    width = 0
+    height = 0
+
+class _GlifContoursPointPen(object):
+
+    '''A point pen which draws contours into a segment pen and collects components.'''
+
+    def __init__(self, pen):
+        self.contour_pen = PointToSegmentPen(pen)
+        self.components = []
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.contour_pen.beginPath()
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self.contour_pen.addPoint(pt, segmentType, smooth, name)
+
+    def endPath(self):
+        self.contour_pen.endPath()
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        self.components.append([baseGlyphName, list(transformation)])
+
+class GeometryCache(object):
+
+    '''
+    A cache of glyph geometry for one font.
+
+    The cache can work with an open font, or with a ``.ufo`` path only, hashing the ``.glif`` files on disk and loading the font only when a glyph needs to be measured. The open font is referenced weakly.
+
+    :param str cache_path: An SQLite file to store entries in. Defaults to the file from ``get_cache_path`` for fonts with a path (if ``save_caches`` is on), and to memory otherwise. If the file cannot be written, for example because another cache is writing to it, entries are kept in memory only.
+
+    '''
+
+    def __init__(self, font=None, ufo_path=None, cache_path=None):
+        if ufo_path is None and font is not None:
+            ufo_path = font.path
+        self._font_ref = None
+        self._naked_ref = None
+        self._loaded_font = None
+        self.font = font
+        self.ufo_path = ufo_path
+        #: Hash ``.glif`` files on disk instead of the glyphs in an open font.
+        self.from_files = font is None
+        if cache_path is None and save_caches and ufo_path:
+            cache_path = get_cache_path(ufo_path)
+        #: Entries are saved to disk, so keys must not depend on this session.
+        self.persistent = cache_path is not None
+        try:
+            self.db = sqlite3.connect(cache_path or ':memory:', timeout=0)
+            self.db.execute('CREATE TABLE IF NOT EXISTS geometry (hash TEXT PRIMARY KEY, data TEXT)')
+        except sqlite3.Error:
+            self.persistent = False
+            self.db = sqlite3.connect(':memory:')
+            self.db.execute('CREATE TABLE IF NOT EXISTS geometry (hash TEXT PRIMARY KEY, data TEXT)')
+        self._close_db = weakref.finalize(self, close_db, self.db)
+        self.entries = {}
+        self.contents = None
+        self.versions = {}
+        self.glif_hashes = {}
+        self.counter = 0
+        self.observing = False
+        self.refresh()
+        if not self.from_files:
+            self.start_observing()
+
+    # font
+
+    def _get_font(self):
+        if self._loaded_font is not None:
+            return self._loaded_font
+        if self._font_ref is None:
+            return None
+        font = self._font_ref()
+        if font is None:
+            # the wrapper is gone, wrap the font again
+            naked = self._naked_ref()
+            if naked is None:
+                return None
+            font = self._font_class(naked, showInterface=False)
+            self._font_ref = weakref.ref(font)
+        return font
+
+    def _set_font(self, font):
+        if font is None:
+            self._font_ref = self._naked_ref = None
+            return
+        self._font_ref = weakref.ref(font)
+        self._naked_ref = weakref.ref(get_naked(font))
+        self._font_class = font.__class__
+
+    font = property(_get_font, _set_font)
+
+    def get_font(self):
+        if self.font is None:
+            from hTools2.modules.batch import open_font
+            self._loaded_font = open_font(self.ufo_path)
+        return self.font
+
+    # hashes
+
+    def refresh(self):
+        '''Forget all glyph hashes, so changed glyphs are detected on the next query.'''
+        self.hashes = {}
+        self.contents = None
+
+    def glyph_names(self):
+        if self.from_files:
+            return list(self.get_contents().keys())
+        if self.observing:
+            return list(self._get_layer().keys())
+        return list(self.font.keys())
+
+    def has_glyph(self, glyph_name):
+        if self.from_files:
+            return glyph_name in self.get_contents()
+        if self.observing:
+            return glyph_name in self._get_layer()
+        return glyph_name in self.font
+
+    def get_contents(self):
+        if self.contents is None:
+            contents_path = os.path.join(self.ufo_path, 'glyphs', 'contents.plist')
+            with open(contents_path, 'rb') as contents_file:
+                self.contents = plistlib.load(contents_file)
+        return self.contents
+
+    def get_glif_data(self, glyph_name):
+        if self.from_files:
+            glif_path = os.path.join(self.ufo_path, 'glyphs', self.get_contents()[glyph_name])
+            with open(glif_path, 'rb') as glif_file:
+                return glif_file.read()
+        return self.font[glyph_name].dumpToGLIF().encode('utf-8')
+
+    def get_glif_hash(self, data):
+        '''Get the hash of a glyph's own ``.glif`` data, without its components.'''
+        return hashlib.sha1(data).hexdigest()
+
+    def get_glif_key(self, glyph_name):
+        '''
+        Get a key for a glyph's own data, without its components. Entries which depend only on this data are stored with keys ending in ``:<key>``.
+
+        The key is the hash of the ``.glif`` data. In observed open fonts, the hash is only calculated again when the glyph has changed; if the cache is not saved to disk, the glyph name and its change counter are used instead.
+
+        '''
+        if not self.observing:
+            return self.get_glif_hash(self.get_glif_data(glyph_name))
+        version = self.versions.get(glyph_name, 0)
+        if not self.persistent:
+            return '%s#%s' % (glyph_name, version)
+        if self.glif_hashes.get(glyph_name, (None,))[0] != version:
+            self.glif_hashes[glyph_name] = version, self.get_glif_hash(self.get_glif_data(glyph_name))
+        return self.glif_hashes[glyph_name][1]
+
+    def get_hash(self, glyph_name, _parents=()):
+        '''Get the hash of a glyph's data, including the hashes of its component base glyphs.'''
+        if glyph_name in self.hashes:
+            return self.hashes[glyph_name]
+        if self.observing:
+            _hash = hashlib.sha1(self.get_glif_key(glyph_name).encode('utf-8'))
+            bases = [ component.baseGlyph for component in self._get_layer()[glyph_name].components ]
+        else:
+            data = self.get_glif_data(glyph_name)
+            _hash = hashlib.sha1(data)
+            bases = [ base.decode('utf-8') for base in _component_base.findall(data) ]
+        for base in bases:
+            if base in _parents or not self.has_glyph(base):
+                continue
+            _hash.update(self.get_hash(base, _parents + (glyph_name,)).encode('ascii'))
+        self.hashes[glyph_name] = _hash.hexdigest()
+        return self.hashes[glyph_name]
+
+    # observers
+
+    def _get_layer(self):
+        naked = self._naked_ref() if self._naked_ref is not None else None
+        if naked is None or not hasattr(naked, 'layers'):
+            return None
+        return naked.layers.defaultLayer
+
+    def start_observing(self):
+        '''Count changes to each glyph, so hashes of changed glyphs (and the glyphs which use them) are updated. Only possible with defcon fonts.'''
+        layer = self._get_layer()
+        if layer is None or not hasattr(layer, 'addObserver'):
+            return
+        layer.addObserver(self, 'glyph_added_callback', 'Layer.GlyphAdded')
+        layer.addObserver(self, 'glyph_changed_callback', 'Layer.GlyphDeleted')
+        layer.addObserver(self, 'glyph_name_changed_callback', 'Layer.GlyphNameChanged')
+        for glyph in layer:
+            glyph.addObserver(self, 'glyph_changed_callback', 'Glyph.Changed')
+        self.observing = True
+
+    def count_change(self, glyph_name):
+        self.counter += 1
+        self.versions[glyph_name] = self.counter
+        self.hashes = {}
+
+    def glyph_added_callback(self, notification):
+        glyph_name = notification.data['name']
+        self._get_layer()[glyph_name].addObserver(self, 'glyph_changed_callback', 'Glyph.Changed')
+        self.count_change(glyph_name)
+
+    def glyph_changed_callback(self, notification):
+        if notification.name == 'Layer.GlyphDeleted':
+            self.count_change(notification.data['name'])
+        else:
+            self.count_change(notification.object.name)
+
+    def glyph_name_changed_callback(self, notification):
+        self.count_change(notification.data['oldValue'])
+        self.count_change(notification.data['newValue'])
+
+    # queries
+
+    def get(self, glyph_name):
+        '''Get the cached geometry of a glyph as a dict, measuring the glyph if necessary.'''
+        glyph_hash = self.get_hash(glyph_name)
+        if glyph_hash in self.entries:
+            return self.entries[glyph_hash]
+        row = self.db.execute('SELECT data FROM geometry WHERE hash=?', (glyph_hash,)).fetchone()
+        if row is not None:
+            entry = json.loads(row[0])
+        else:
+            entry = measure_glyph(self.get_font()[glyph_name])
+            self.store(glyph_hash, entry)
+        self.entries[glyph_hash] = entry
+        return entry
+
+    def store(self, glyph_hash, entry):
+        try:
+            self.db.execute('INSERT OR REPLACE INTO geometry (hash, data) VALUES (?, ?)', (glyph_hash, json.dumps(entry)))
+        except sqlite3.OperationalError:
+            # the file is locked by another cache, keep the entry in memory only
+            pass
+
+    def contour_bounds(self, glyph_name):
+        '''
+        Get the bounds of a glyph's contours (without components) and its components with their transformations (see ``measure_glif``).
+
+        These values depend only on the glyph's own ``.glif`` data, so they are cached by its hash, and measured without loading the font.
+
+        '''
+        glif_hash = 'glif:%s' % self.get_glif_key(glyph_name)
+        if glif_hash in self.entries:
+            return self.entries[glif_hash]
+        row = self.db.execute('SELECT data FROM geometry WHERE hash=?', (glif_hash,)).fetchone()
+        if row is not None:
+            entry = json.loads(row[0])
+        else:
+            entry = measure_glif(self.get_glif_data(glyph_name))
+            self.store(glif_hash, entry)
+        self.entries[glif_hash] = entry
+        return entry
+
+    def bounds(self, glyph_name):
+        '''Get the bounding box of a glyph, including components, or ``None`` for empty glyphs.'''
+        return self.get(glyph_name)['bounds']
+
+    def structure(self, glyph_name):
+        '''Get a signature of the glyph's structure: contour points, component base glyphs and anchor names.'''
+        entry = self.get(glyph_name)
+        return entry['structure'], tuple(entry['components']), tuple(entry['anchors'])
+
+    def area(self, glyph_name):
+        return self.get(glyph_name)['area']
+
+    def margins(self, glyph_name, value, horizontal=True):
+        '''
+        Get the first and last intersections of a glyph with a horizontal line at ``y=value`` (or a vertical line at ``x=value``).
+
+        Returns a list ``[min, max]``, or ``None``.
+
+        '''
+        entry = self.get(glyph_name)
+        key = '%s%s' % ('y' if horizontal else 'x', value)
+        if key not in entry['margins']:
+            glyph = self.get_font()[glyph_name]
+            entry['margins'][key] = measure_margins(glyph, value, horizontal)
+            self.store(self.get_hash(glyph_name), entry)
+        return entry['margins'][key]
+
+    # maintenance
+
+    def save(self):
+        '''Write all new entries to disk.'''
+        try:
+            self.db.commit()
+        except sqlite3.OperationalError:
+            pass
+
+    def prune(self):
+        '''Delete entries for glyph versions which are no longer in the font.'''
+        current = set([ self.get_hash(glyph_name) for glyph_name in self.glyph_names() ])
+        glif_hashes = set([ self.get_glif_key(glyph_name) for glyph_name in self.glyph_names() ])
+        stored = [ row[0] for row in self.db.execute('SELECT hash FROM geometry') ]
+        old = [ (glyph_hash,) for glyph_hash in stored if glyph_hash not in current and glyph_hash.split(':')[-1] not in glif_hashes ]
+        self.db.executemany('DELETE FROM geometry WHERE hash=?', old)
+        self.db.commit()
+        for glyph_hash, in old:
+            self.entries.pop(glyph_hash, None)
+        return len(old)
+
+    def stop_observing(self):
+        if not self.observing:
+            return
+        self.observing = False
+        layer = self._get_layer()
+        if layer is None:
+            return
+        for notification in ['Layer.GlyphAdded', 'Layer.GlyphDeleted', 'Layer.GlyphNameChanged']:
+            layer.removeObserver(self, notification)
+        for glyph in layer:
+            if glyph.hasObserver(self, 'Glyph.Changed'):
+                glyph.removeObserver(self, 'Glyph.Changed')
+
+    def close(self):
+        self.stop_observing()
+        self._close_db()
@@ -1,25 +1,107 @@
 # [h] hTools2.modules.gstring
 
+# imports
+
+import re
+
+from hTools2.modules.unidata import get_data
+
+_uni_name = re.compile('^uni([0-9A-F]{4})$')
+_u_name = re.compile('^u([0-9A-F]{4,6})$')
+
+_index = None
+
+# objects
+
+class NamesIndex(object):
+
+    """
+    A two-way index between glyph names and Unicode codepoints.
+
+    Merges the names in ``unicode2psnames`` and ``unicodes_extra`` (from the compiled data store), the character mapping of a font (if given, it takes precedence), and ``uniXXXX`` / ``uXXXXX`` names.
+
+    """
+
+    def __init__(self, font=None):
+        data = get_data()
+        self.name2codepoint = dict(data['name2codepoint'])
+        self.codepoint2name = dict(data['codepoint2name'])
+        if font is not None:
+            for codepoint, glyph_names in get_character_mapping(font).items():
+                for glyph_name in glyph_names:
+                    self.name2codepoint[glyph_name] = codepoint
+                self.codepoint2name[codepoint] = glyph_names[0]
+
+    def get_codepoint(self, glyph_name):
+        """Get the codepoint for a glyph name, or ``None`` if the glyph is not encoded."""
+        codepoint = self.name2codepoint.get(glyph_name)
+        if codepoint is None:
+            codepoint = parse_unicode_name(glyph_name)
+        return codepoint
+
+    def get_glyph_name(self, codepoint):
+        """Get the glyph name for a codepoint, using a ``uniXXXX`` / ``uXXXXX`` name if there is no other name."""
+        glyph_name = self.codepoint2name.get(codepoint)
+        if glyph_name is None:
+            glyph_name = 'uni%04X' % codepoint if codepoint <= 0xFFFF else 'u%05X' % codepoint
+        return glyph_name
+
 # functions
 
-def make_string(names_list, spacer=None):
+def parse_unicode_name(glyph_name):
+    """Get the codepoint from a ``uniXXXX`` or ``uXXXXX`` glyph name, or ``None``."""
+    match = _uni_name.match(glyph_name) or _u_name.match(glyph_name)
+    if match is None:
+        return None
+    codepoint = int(match.group(1), 16)
+    if codepoint > 0x10FFFF:
+        return None
+    return codepoint
+
+def get_character_mapping(font):
+    """Get a dict of glyph names by codepoint for a font."""
+    if hasattr(font, 'getCharacterMapping'):
+        return dict([ (codepoint, list(glyph_names)) for codepoint, glyph_names in font.getCharacterMapping().items() ])
+    mapping = {}
+    for glyph in font:
+        for codepoint in glyph.unicodes:
+            mapping.setdefault(codepoint, []).append(glyph.name)
+    return mapping
+
+def get_names_index(font=None):
+    """Get a names index for a font, or the shared default index if ``font`` is ``None``."""
+    global _index
+    if font is not None:
+        return NamesIndex(font)
+    if _index is None:
+        _index = NamesIndex()
+    return _index
+
+def make_string(names_list, spacer=None, font=None, fallback=None):
     """
     Makes a string of text from a list of `glyph_names`. Optionally, uses a `spacer` glyph between the glyphs.
 
+    Glyph names are converted to characters with a ``NamesIndex``, which includes the encoding of `font` if given. Glyphs without a codepoint are skipped, unless a `fallback` is given: ``'names'`` inserts them as ``/glyphname`` (as used in the Space Center), any other string is used in their place.
+
     """
+    index = get_names_index(font)
     if spacer is not None:
         _spacer = spacer
     else:
         _spacer = ''
-    _string = _spacer
+    _string = [_spacer]
     for glyph_name in names_list:
-        for k in list(unicode2psnames.keys()):
-            if unicode2psnames[k] == glyph_name:
-                char = chr(k)
-                _string = _string + char + _spacer
-            else:
-                continue
-    return _string
+        codepoint = index.get_codepoint(glyph_name)
+        if codepoint is not None:
+            _string.append(chr(codepoint))
+        elif fallback == 'names':
+            _string.append('/%s ' % glyph_name)
+        elif fallback is not None:
+            _string.append(fallback)
+        else:
+            continue
+        _string.append(_spacer)
+    return ''.join(_string)
 
 def make_string_names(names_list, spacer=None):
     """
@@ -30,10 +112,8 @@ def make_string_names(names_list, spacer=None):
         _spacer = '/' + spacer
     else:
         _spacer = ''
-    _glyph_names = ''
-    for glyph_name in names_list:
-        _glyph_names = _glyph_names + '/' + glyph_name + _spacer
-    return _glyph_names
+    _glyph_names = [ '/%s%s' % (glyph_name, _spacer) for glyph_name in names_list ]
+    return ''.join(_glyph_names)
 
 # def all_glyphs(groups, spacer=None):
 #     """
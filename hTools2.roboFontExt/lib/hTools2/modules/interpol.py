@@ -4,8 +4,21 @@
 
 # imports
 
+import json
+import os
+import time
+import weakref
+
+from collections import OrderedDict, deque
+from functools import partial
+
 from hTools2.modules.fontutils import get_full_name
 from hTools2.modules.color import clear_color, clear_colors, named_colors
+from hTools2.modules.glyphcache import get_cache, GeometryCache
+from hTools2.modules.kernmatrix import KerningMatrix
+from hTools2.modules.sysutils import lazy_import, map_parallel
+
+numpy = lazy_import('numpy')
 
 # functions
 
@@ -15,25 +28,39 @@ def interpolate_glyph(gName, f1, f2, f3, factor, clear=True):
 
     The optional parameter ``clear`` controls if existing glyphs in ``f3`` should be overwritten.
 
+    Compatible glyphs are interpolated with ``get_interpolation_data`` and drawn with ``set_glyph_data``; other glyphs with ``glyph.interpolate``.
+
     """
     if gName in f2:
         if clear:
             g = f3.newGlyph(gName, clear=True)
         else:
             g = f3[gName]
-        g.interpolate(factor, f1[gName], f2[gName])
+        data = get_interpolation_data(f1, f2, [gName], verbose=False)
+        if gName in data:
+            glyph_data = data[gName]
+            values = interpolate_values(glyph_data['a'], glyph_data['delta'], glyph_data['axes'], [factor])[0]
+            set_glyph_data(g, glyph_data['structure'], values)
+        else:
+            g.interpolate(factor, f1[gName], f2[gName])
         g.update()
         f3.update()
     else:
         print('glyph %s not contained in font 2' % gName)
 
 def interpolate_kerning(f1, f2, f3, factor):
-    k1 = f1.kerning
-    k2 = f2.kerning
-    k3 = f3.kerning
-    k3.interpolate(k1, k2, factor, True)
+    """Interpolate the kerning of masters ``f1`` and ``f2`` into ``f3``. To interpolate several instances at once, see ``interpolate_instances``."""
+    interpolate_kerning_instances(f1, f2, [(f3, factor)])
     f3.update()
 
+def interpolate_kerning_instances(f1, f2, instances, round_values=True):
+    """Interpolate the kerning of masters ``f1`` and ``f2`` into several instances at once with a ``KerningMatrix``, or one instance at a time with ``kerning.interpolate`` if NumPy is not available."""
+    if numpy is None:
+        for font, factor in instances:
+            font.kerning.interpolate(factor, f1.kerning, f2.kerning, round=round_values)
+    else:
+        KerningMatrix([f1, f2]).interpolate_fonts(0, 1, instances, round_values)
+
 def check_compatibility(f1, f2, names=None, report=True):
     """
     Checks if glyphs in ``f1`` and ``f2`` are compatible for interpolation.
@@ -44,7 +71,11 @@ def check_compatibility(f1, f2, names=None, report=True):
 
     If ``report=True``, the check results will be printed to the output window.
 
+    Glyphs with identical structure signatures in the fonts' geometry caches are compatible without further checking; only the remaining ones are compared with ``isCompatible``.
+
     """
+    cache1 = get_cache(f1)
+    cache2 = get_cache(f2)
     # glyph names
     if names != None:
         gNames = names
@@ -62,7 +93,13 @@ def check_compatibility(f1, f2, names=None, report=True):
         if name in f2:
             clear_color(f2[name])
             # if not compatible
-            if f1[name].isCompatible(f2[name], False) is not True:
+            if cache1.structure(name) == cache2.structure(name):
+                compatible = True
+            else:
+                compatible = f1[name].isCompatible(f2[name])
+                if isinstance(compatible, tuple):
+                    compatible = compatible[0]
+            if compatible is not True:
                 f2[name].mark = red
                 if report == True:
                     print("\t### %s is not compatible" % name)
@@ -77,6 +114,8 @@ def check_compatibility(f1, f2, names=None, report=True):
             if report == True:
                 print("\t### %s is not in font 2" % name)
     # update fonts
+    cache1.save()
+    cache2.save()
     f2.update()
     f1.update()
     if report == True:
@@ -85,14 +124,443 @@ def check_compatibility(f1, f2, names=None, report=True):
 def condense_glyphs(f3, f1, f2, f1_stem, f2_stem, factor, glyph_names):
     """Generate condensed glyphs from a 'Regular' font ``f1`` and a 'Bold' font ``f2``."""
     scale_x = float(f1_stem) / ( f1_stem + factor * (f2_stem - f1_stem ) )
+    data = get_interpolation_data(f1, f2, glyph_names, verbose=False)
     for glyph_name in glyph_names:
         if glyph_name not in f3:
             f3.newGlyph(glyph_name)
         f3[glyph_name].prepareUndo('condensomatic')
-        f3[glyph_name].interpolate((factor, 0), f1[glyph_name], f2[glyph_name])
+        if glyph_name in data:
+            glyph_data = data[glyph_name]
+            values = interpolate_values(glyph_data['a'], glyph_data['delta'], glyph_data['axes'], [(factor, 0)])[0]
+            set_glyph_data(f3[glyph_name], glyph_data['structure'], values, round_values=False)
+        else:
+            f3[glyph_name].interpolate((factor, 0), f1[glyph_name], f2[glyph_name])
         f3[glyph_name].scale((scale_x, 1))
+        f3[glyph_name].round()
         f3[glyph_name].leftMargin = (f1[glyph_name].leftMargin + f2[glyph_name].leftMargin) * 0.5 * (1.0 - factor)
         f3[glyph_name].rightMargin = (f1[glyph_name].rightMargin + f2[glyph_name].rightMargin) * 0.5 * (1.0 - factor)
         f3[glyph_name].update()
         f3[glyph_name].performUndo()
     f3.update()
+
+#---------------------------
+# multi-master compatibility
+#---------------------------
+
+#: Parts of a glyph's structure signature, in the order in which they are stored.
+signature_parts = ['points', 'components', 'anchors']
+
+def get_signatures(font, names=None):
+    """
+    Get structural signatures for glyphs in ``font``, using the font's geometry cache.
+
+    A signature is a tuple ``(points, components, anchors)``: a string with the point types of each contour, the names of the component base glyphs, and the names of the anchors.
+
+    :returns: A dict of signatures by glyph name.
+
+    """
+    cache = get_cache(font)
+    if names is None:
+        names = list(font.keys())
+    signatures = dict([ (name, cache.structure(name)) for name in names if name in font ])
+    cache.save()
+    return signatures
+
+def get_ufo_signatures(ufo_path, names=None):
+    """Get structural signatures for glyphs in a closed ``.ufo`` font. Glyphs already in the geometry cache are not loaded."""
+    cache = GeometryCache(ufo_path=ufo_path)
+    if names is None:
+        names = cache.glyph_names()
+    signatures = dict([ (name, cache.structure(name)) for name in names if cache.has_glyph(name) ])
+    cache.close()
+    return signatures
+
+def get_signature_differences(signatures):
+    """Get the names of the signature parts (and ``contours`` for different contour counts) which are not the same in all given signatures."""
+    differences = []
+    contours = set([ len(signature[0].split('|')) if signature[0] else 0 for signature in signatures ])
+    if len(contours) > 1:
+        differences.append('contours')
+    for i, part in enumerate(signature_parts):
+        if len(set([ signature[i] for signature in signatures ])) > 1:
+            differences.append(part)
+    return differences
+
+def check_compatibility_masters(masters, names=None, workers=1):
+    """
+    Check the compatibility of glyphs across any number of masters in one pass.
+
+    One signature is computed for each glyph in each master. Glyphs are compatible if they exist in all masters and all signatures are equal; otherwise the masters are grouped by signature, so the report shows which masters disagree with each other.
+
+    :param list masters: A list of open fonts, or a list of paths to ``.ufo`` fonts.
+    :param list names: The glyphs to check. If ``None``, all glyphs in all masters are checked.
+    :param int workers: The number of worker processes used to compute signatures for ``.ufo`` paths (``None`` uses all CPUs).
+    :returns: A report dict with a list of ``masters`` and a dict of results by glyph name.
+
+    """
+    # get signatures per master
+    if all([ isinstance(master, str) for master in masters ]):
+        master_names = [ os.path.splitext(os.path.basename(master))[0] for master in masters ]
+        all_signatures = map_parallel(partial(get_ufo_signatures, names=names), masters, workers)
+    else:
+        master_names = [ get_full_name(master) for master in masters ]
+        all_signatures = [ get_signatures(master, names) for master in masters ]
+    # glyph names
+    if names is None:
+        names = OrderedDict()
+        for signatures in all_signatures:
+            for name in sorted(signatures.keys()):
+                names[name] = True
+        names = list(names.keys())
+    # group masters by signature
+    glyphs = OrderedDict()
+    for name in names:
+        groups = OrderedDict()
+        missing = []
+        for i, signatures in enumerate(all_signatures):
+            if name not in signatures:
+                missing.append(i)
+                continue
+            groups.setdefault(signatures[name], []).append(i)
+        glyphs[name] = {
+            'compatible' : len(groups) == 1 and not missing,
+            'groups' : list(groups.values()),
+            'missing' : missing,
+            'differences' : get_signature_differences(list(groups.keys())),
+        }
+    return { 'masters' : master_names, 'glyphs' : glyphs }
+
+def print_compatibility_report(report, all_glyphs=False):
+    """Print a multi-master compatibility report. Only incompatible glyphs are printed, unless ``all_glyphs=True``."""
+    masters = report['masters']
+    print('checking compatibility between %s masters...\n' % len(masters))
+    count = 0
+    for name, result in report['glyphs'].items():
+        if result['compatible']:
+            if all_glyphs:
+                print('\t%s is compatible' % name)
+            continue
+        count += 1
+        print('\t### %s is not compatible (%s)' % (name, ', '.join(result['differences'] + (['missing'] if result['missing'] else []))))
+        for group in result['groups']:
+            print('\t\t%s' % ', '.join([ masters[i] for i in group ]))
+        if result['missing']:
+            print('\t\tmissing in: %s' % ', '.join([ masters[i] for i in result['missing'] ]))
+    print('\n\t%s of %s glyphs not compatible' % (count, len(report['glyphs'])))
+    print('\n...done.\n')
+
+def save_compatibility_report(report, file_path):
+    """
+    Save a multi-master compatibility report as JSON or CSV, depending on the extension of ``file_path``.
+
+    In CSV files, each master column contains the number of the master's signature group for the glyph (masters with the same number are compatible), or ``-`` if the glyph is missing.
+
+    """
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        import csv
+        with open(file_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['glyph', 'compatible', 'differences'] + report['masters'])
+            for name, result in report['glyphs'].items():
+                columns = [ '-' ] * len(report['masters'])
+                for group_index, group in enumerate(result['groups']):
+                    for i in group:
+                        columns[i] = group_index + 1
+                writer.writerow([name, int(result['compatible']), ' '.join(result['differences'])] + columns)
+    else:
+        with open(file_path, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+
+#---------------------
+# batch interpolation
+#---------------------
+
+def get_glyph_data(glyph):
+    """
+    Extract the structure and all interpolatable values of a glyph.
+
+    Values are stored in one flat list: the advance width, the ``x, y`` of all contour points, the transformations of all components, and the ``x, y`` of all anchors. A parallel list of axes (``0`` for x, ``1`` for y) tells which interpolation factor applies to each value.
+
+    :returns: A tuple ``(structure, values, axes)``.
+
+    """
+    contours = []
+    values = [glyph.width]
+    axes = [0]
+    for contour in glyph.contours:
+        points = []
+        for point in contour.points:
+            segment_type = None if point.type == 'offcurve' else point.type
+            points.append((segment_type, point.smooth, point.name))
+            values += [point.x, point.y]
+            axes += [0, 1]
+        contours.append(points)
+    components = []
+    for component in glyph.components:
+        components.append(component.baseGlyph)
+        values += list(component.transformation)
+        axes += [0, 0, 1, 1, 0, 1]
+    anchors = []
+    for anchor in glyph.anchors:
+        anchors.append(anchor.name)
+        values += [anchor.x, anchor.y]
+        axes += [0, 1]
+    structure = {
+        'contours' : contours,
+        'components' : components,
+        'anchors' : anchors,
+    }
+    return structure, values, axes
+
+def is_compatible_data(structure1, values1, structure2, values2):
+    """Check if two glyphs have the same point types in all contours, the same component base glyphs and anchor names (in the same order), and the same number of values."""
+    types1 = [ [ point[0] for point in contour ] for contour in structure1['contours'] ]
+    types2 = [ [ point[0] for point in contour ] for contour in structure2['contours'] ]
+    if types1 != types2:
+        return False
+    if structure1['components'] != structure2['components'] or structure1['anchors'] != structure2['anchors']:
+        return False
+    return len(values1) == len(values2)
+
+def get_interpolation_data(f1, f2, names=None, verbose=True):
+    """
+    Extract the values of glyphs in masters ``f1`` and ``f2`` once, and precompute the differences between them.
+
+    Glyphs which are missing in ``f2`` or have a different structure are skipped.
+
+    :returns: A dict of interpolation data by glyph name, each with the keys ``structure``, ``a`` (values in ``f1``), ``delta`` (``f2 - f1``) and ``axes``.
+
+    """
+    if names is None:
+        names = list(f1.keys())
+    data = OrderedDict()
+    for name in names:
+        if name not in f2:
+            if verbose:
+                print('glyph %s not contained in font 2' % name)
+            continue
+        structure1, values1, axes = get_glyph_data(f1[name])
+        structure2, values2, axes2 = get_glyph_data(f2[name])
+        if not is_compatible_data(structure1, values1, structure2, values2):
+            if verbose:
+                print('glyph %s is not compatible' % name)
+            continue
+        if numpy is not None:
+            a = numpy.array(values1, dtype=float)
+            delta = numpy.array(values2, dtype=float) - a
+            axes = numpy.array(axes)
+        else:
+            a = values1
+            delta = [ v2 - v1 for v1, v2 in zip(values1, values2) ]
+        data[name] = {
+            'structure' : structure1,
+            'a' : a,
+            'delta' : delta,
+            'axes' : axes,
+        }
+    return data
+
+def get_factor(factor):
+    """Get an interpolation factor as a tuple ``(factor_x, factor_y)``."""
+    if isinstance(factor, (tuple, list)):
+        return tuple(factor)
+    return factor, factor
+
+def interpolate_values(a, delta, axes, factors):
+    """
+    Evaluate ``a + t * delta`` for a list of interpolation factors at once.
+
+    :returns: One list (or NumPy array) of values for each factor.
+
+    """
+    factors = [ get_factor(factor) for factor in factors ]
+    if numpy is not None:
+        fx = numpy.array([ f[0] for f in factors ], dtype=float)[:, numpy.newaxis]
+        fy = numpy.array([ f[1] for f in factors ], dtype=float)[:, numpy.newaxis]
+        t = numpy.where(axes[numpy.newaxis, :] == 0, fx, fy)
+        return a + t * delta
+    return [ [ v + (fx if axis == 0 else fy) * d for v, d, axis in zip(a, delta, axes) ] for fx, fy in factors ]
+
+def set_glyph_data(glyph, structure, values, round_values=True):
+    """
+    Replace the contents of a glyph with the given structure and values, drawing everything in one operation with a point pen.
+
+    If ``round_values=True``, all values except the scale factors of components are rounded to integers.
+
+    """
+    if round_values:
+        _round = lambda v: int(round(v))
+    else:
+        _round = float
+    values = list(values)
+    naked = glyph.naked() if hasattr(glyph, 'naked') else None
+    hold = hasattr(naked, 'holdNotifications')
+    if hold:
+        naked.holdNotifications()
+    glyph.clearContours()
+    glyph.clearComponents()
+    glyph.clearAnchors()
+    glyph.width = _round(values[0])
+    i = 1
+    pen = glyph.getPointPen()
+    for contour in structure['contours']:
+        pen.beginPath()
+        for segment_type, smooth, name in contour:
+            pen.addPoint((_round(values[i]), _round(values[i+1])), segment_type, smooth, name)
+            i += 2
+        pen.endPath()
+    for base_glyph in structure['components']:
+        transformation = [ float(v) for v in values[i:i+4] ] + [ _round(v) for v in values[i+4:i+6] ]
+        pen.addComponent(base_glyph, tuple(transformation))
+        i += 6
+    for anchor in structure['anchors']:
+        glyph.appendAnchor(anchor, (_round(values[i]), _round(values[i+1])))
+        i += 2
+    if hold:
+        naked.releaseHeldNotifications()
+
+def interpolate_instances(f1, f2, instances, names=None, kerning=True, round_values=True, verbose=True):
+    """
+    Interpolate any number of instances from masters ``f1`` and ``f2``.
+
+    The values of each glyph are read from both masters only once; all instances are then computed together as ``a + t * delta``, and the results are written into each instance font in bulk.
+
+    :param list instances: A list of ``(font, factor)`` tuples, where ``factor`` is a number or a tuple ``(factor_x, factor_y)``.
+    :param list names: The glyphs to interpolate. If ``None``, all glyphs in ``f1`` are interpolated.
+    :param bool kerning: Interpolate kerning too (using the x factors).
+    :param bool round_values: Round all coordinates and kerning values to integers.
+
+    """
+    start = time.time()
+    fonts = [ font for font, factor in instances ]
+    factors = [ factor for font, factor in instances ]
+    if verbose:
+        print('interpolating %s instances...\n' % len(instances))
+    data = get_interpolation_data(f1, f2, names, verbose)
+    for name, glyph_data in data.items():
+        results = interpolate_values(glyph_data['a'], glyph_data['delta'], glyph_data['axes'], factors)
+        for font, values in zip(fonts, results):
+            if name not in font:
+                font.newGlyph(name)
+            set_glyph_data(font[name], glyph_data['structure'], values, round_values)
+    if kerning:
+        interpolate_kerning_instances(f1, f2, instances, round_values)
+    for font in fonts:
+        font.update()
+    if verbose:
+        print('\t%s glyphs in %.2f s' % (len(data), time.time() - start))
+        print('\n...done.\n')
+
+#-----------------------
+# interpolation preview
+#-----------------------
+
+def _naked(glyph):
+    return glyph.naked() if hasattr(glyph, 'naked') else glyph
+
+class InterpolationPreview(object):
+
+    """
+    Interpolation steps between two glyphs, cached for fast redrawing.
+
+    The values of both glyphs are extracted once, and all steps are computed together in one pass. Steps are cached by glyph (referenced weakly) and a change counter, which is updated by calling ``invalidate`` when a glyph changes. Only the most recently used ``cache_size`` entries are kept.
+
+    """
+
+    #: The amount of interpolation steps.
+    steps = 7
+
+    #: The maximum amount of cached glyph pairs.
+    cache_size = 64
+
+    #: Half the size of the point markers, in units.
+    marker_size = 2
+
+    #: The number of frames used to calculate the average frame time.
+    frames = 30
+
+    def __init__(self, glyph_class, steps=None):
+        #: The class used to create step glyphs, for example ``RGlyph``.
+        self.glyph_class = glyph_class
+        if steps is not None:
+            self.steps = steps
+        self.cache = OrderedDict()
+        self.versions = weakref.WeakKeyDictionary()
+        self.counter = 0
+        self.frame_times = deque(maxlen=self.frames)
+        self.frame_start = None
+
+    def invalidate(self, glyph=None):
+        """Clear the cached steps for a glyph which has changed, or all cached steps if no glyph is given."""
+        if glyph is None:
+            self.cache = OrderedDict()
+            return
+        self.counter += 1
+        self.versions[_naked(glyph)] = self.counter
+
+    def get_key(self, glyph):
+        naked = _naked(glyph)
+        return weakref.ref(naked), self.versions.get(naked, 0)
+
+    def get_factors(self):
+        return [ i * (1.0 / (self.steps - 1)) for i in range(self.steps) ]
+
+    def get_steps(self, g1, g2):
+        """
+        Get the interpolation steps between glyphs ``g1`` and ``g2``.
+
+        :returns: A list of ``(glyph, markers)`` tuples, where ``markers`` is a glyph with a small square at each point; or ``None`` if the glyphs are not compatible.
+
+        """
+        key = self.get_key(g1), self.get_key(g2), self.steps
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        else:
+            self.cache[key] = self.make_steps(g1, g2)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return self.cache[key]
+
+    def make_steps(self, g1, g2):
+        structure1, values1, axes = get_glyph_data(g1)
+        structure2, values2, axes2 = get_glyph_data(g2)
+        if not is_compatible_data(structure1, values1, structure2, values2):
+            return None
+        if numpy is not None:
+            a = numpy.array(values1, dtype=float)
+            delta = numpy.array(values2, dtype=float) - a
+            axes = numpy.array(axes)
+        else:
+            a = values1
+            delta = [ v2 - v1 for v1, v2 in zip(values1, values2) ]
+        points_count = sum([ len(contour) for contour in structure1['contours'] ])
+        r = self.marker_size
+        steps = []
+        for values in interpolate_values(a, delta, axes, self.get_factors()):
+            glyph = self.glyph_class()
+            set_glyph_data(glyph, structure1, values, round_values=False)
+            markers = self.glyph_class()
+            pen = markers.getPen()
+            for i in range(points_count):
+                x, y = values[1+i*2], values[2+i*2]
+                pen.moveTo((x-r, y-r))
+                pen.lineTo((x+r, y-r))
+                pen.lineTo((x+r, y+r))
+                pen.lineTo((x-r, y+r))
+                pen.closePath()
+            steps.append((glyph, markers))
+        return steps
+
+    # frame time
+
+    def start_frame(self):
+        self.frame_start = time.time()
+
+    def end_frame(self):
+        self.frame_times.append(time.time() - self.frame_start)
+
+    def get_frame_time(self):
+        """Get the average time to draw a frame, in milliseconds."""
+        if not self.frame_times:
+            return 0
+        return sum(self.frame_times) / len(self.frame_times) * 1000
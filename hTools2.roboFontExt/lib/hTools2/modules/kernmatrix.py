@@ -0,0 +1,242 @@
+# [h] hTools2.modules.kernmatrix
+
+'''
+A compact representation of the kerning of several masters.
+
+First and second sides of all pairs (glyphs and groups) get integer ids. Pairs from all masters are merged into one list sorted by first and second id, stored as arrays in compressed sparse row (CSR) layout, with one row of values per master. All masters share the same pairs, so kerning can be interpolated, compared and flattened with array operations.
+
+A pair which is missing in one master gets the value it would have there through the groups of its glyphs, so exceptions interpolate against the class value they override.
+
+'''
+
+# imports
+
+from collections import OrderedDict
+
+from hTools2.modules.sysutils import lazy_import
+
+numpy = lazy_import('numpy')
+
+# functions
+
+def get_group_value(kerning, first, second, first_groups, second_groups):
+    '''Get the value of a pair from a kerning dict, falling back to the groups of its glyphs (glyph/glyph, glyph/group, group/glyph, group/group). Returns ``None`` if no pair is found.'''
+    firsts = [first] + ([first_groups[first]] if first in first_groups else [])
+    seconds = [second] + ([second_groups[second]] if second in second_groups else [])
+    for first_name in firsts:
+        for second_name in seconds:
+            if (first_name, second_name) in kerning:
+                return kerning[(first_name, second_name)]
+    return None
+
+# objects
+
+class KerningMatrix(object):
+
+    '''
+    The kerning of a list of masters, aligned by pair.
+
+    ``values`` is an array with one row per master and one column per pair; ``present`` marks which pairs are defined in each master. Missing pairs have the value of the first pair found through the groups of their glyphs (glyph/glyph, glyph/group, group/glyph, group/group), or ``0``. ``firsts`` and ``seconds`` hold the side ids of each pair, and ``indptr`` the position of the first pair of each first side.
+
+    '''
+
+    def __init__(self, masters):
+        self.masters = masters
+        #: Groups of each master, with the glyphs in each group.
+        self.groups = [ dict([ (name, list(glyphs)) for name, glyphs in font.groups.items() ]) for font in masters ]
+        kernings = [ dict(font.kerning.items()) for font in masters ]
+        firsts = set()
+        seconds = set()
+        for kerning in kernings:
+            for first, second in kerning.keys():
+                firsts.add(first)
+                seconds.add(second)
+        #: Names of the first and second sides, by id.
+        self.first_names = sorted(firsts)
+        self.second_names = sorted(seconds)
+        self.first_ids = dict([ (name, i) for i, name in enumerate(self.first_names) ])
+        self.second_ids = dict([ (name, i) for i, name in enumerate(self.second_names) ])
+        pairs = set()
+        for kerning in kernings:
+            pairs.update([ (self.first_ids[first], self.second_ids[second]) for first, second in kerning.keys() ])
+        pairs = sorted(pairs)
+        self.firsts = numpy.array([ first for first, second in pairs ], dtype=numpy.int32)
+        self.seconds = numpy.array([ second for first, second in pairs ], dtype=numpy.int32)
+        self.indptr = numpy.searchsorted(self.firsts, numpy.arange(len(self.first_names) + 1)).astype(numpy.int32)
+        pairs_index = dict([ (pair, i) for i, pair in enumerate(pairs) ])
+        self.values = numpy.zeros((len(masters), len(pairs)), dtype=float)
+        self.present = numpy.zeros((len(masters), len(pairs)), dtype=bool)
+        for m, kerning in enumerate(kernings):
+            columns = [ pairs_index[(self.first_ids[first], self.second_ids[second])] for first, second in kerning.keys() ]
+            self.values[m, columns] = list(kerning.values())
+            self.present[m, columns] = True
+        # missing pairs inherit the value of their groups
+        for m, kerning in enumerate(kernings):
+            first_groups = self.get_glyph_groups(m, self.first_names, 'public.kern1.')
+            second_groups = self.get_glyph_groups(m, self.second_names, 'public.kern2.')
+            for i in numpy.nonzero(~self.present[m])[0]:
+                first, second = self.get_pair(i)
+                value = get_group_value(kerning, first, second, first_groups, second_groups)
+                if value is not None:
+                    self.values[m, i] = value
+
+    def __len__(self):
+        return len(self.firsts)
+
+    def get_glyph_groups(self, master, side_names, prefix):
+        '''Get the kerning group of each glyph on one side of the pairs in a master: groups used on that side in any master, or with the UFO3 ``prefix`` for that side.'''
+        groups = self.groups[master]
+        side_names = set(side_names)
+        glyph_groups = {}
+        for group_name in sorted(groups.keys()):
+            if group_name in side_names or group_name.startswith(prefix):
+                for glyph_name in groups[group_name]:
+                    glyph_groups.setdefault(glyph_name, group_name)
+        return glyph_groups
+
+    # pairs
+
+    def get_pair(self, i):
+        '''Get the names of the pair in column ``i``.'''
+        return self.first_names[self.firsts[i]], self.second_names[self.seconds[i]]
+
+    def get_pairs(self, columns=None):
+        '''Get the names of all pairs, or of the pairs in the given columns.'''
+        if columns is None:
+            columns = range(len(self))
+        return [ self.get_pair(i) for i in columns ]
+
+    def get_column(self, first, second):
+        '''Get the column of a pair, or ``None`` if the pair is not kerned in any master.'''
+        if first not in self.first_ids or second not in self.second_ids:
+            return None
+        first_id = self.first_ids[first]
+        start, end = self.indptr[first_id], self.indptr[first_id + 1]
+        i = start + numpy.searchsorted(self.seconds[start:end], self.second_ids[second])
+        if i < end and self.seconds[i] == self.second_ids[second]:
+            return int(i)
+        return None
+
+    def get_value(self, master, first, second):
+        '''Get the value of a pair in a master (by index), or ``None`` if the pair is not defined there.'''
+        i = self.get_column(first, second)
+        if i is None or not self.present[master, i]:
+            return None
+        return float(self.values[master, i])
+
+    def get_kerning(self, values, present=None):
+        '''Convert a row of values into a kerning dict, leaving out pairs which are not ``present``.'''
+        columns = numpy.arange(len(self)) if present is None else numpy.nonzero(present)[0]
+        return dict(zip(self.get_pairs(columns), values[columns].tolist()))
+
+    # interpolation
+
+    def interpolate(self, master1, master2, factors, round_values=True):
+        '''
+        Interpolate the kerning between two masters (by index) for several factors at once. Pairs missing in one master use the value they inherit from its groups. Rounded values are rounded half up, like in fontMath.
+
+        :returns: An array with one row of values per factor.
+
+        '''
+        a = self.values[master1]
+        delta = self.values[master2] - a
+        factors = numpy.asarray(factors, dtype=float)[:, numpy.newaxis]
+        values = a + factors * delta
+        if round_values:
+            values = numpy.floor(values + 0.5).astype(int)
+        return values
+
+    def interpolate_fonts(self, master1, master2, instances, round_values=True):
+        '''Interpolate the kerning of several instances, given as a list of ``(font, factor)`` tuples, and write it into each font.'''
+        factors = [ factor[0] if isinstance(factor, (tuple, list)) else factor for font, factor in instances ]
+        results = self.interpolate(master1, master2, factors, round_values)
+        present = self.present[master1] | self.present[master2]
+        for (font, factor), values in zip(instances, results):
+            font.kerning.clear()
+            font.kerning.update(self.get_kerning(values, present))
+
+    # comparison
+
+    def diff(self, master1, master2):
+        '''
+        Compare the kerning of two masters (by index).
+
+        :returns: A dict with the pairs defined ``only1`` in the first master, ``only2`` in the second, and the pairs defined in both with ``different`` values.
+
+        '''
+        present1 = self.present[master1]
+        present2 = self.present[master2]
+        both = present1 & present2
+        different = both & (self.values[master1] != self.values[master2])
+        return {
+            'only1' : self.get_pairs(numpy.nonzero(present1 & ~present2)[0]),
+            'only2' : self.get_pairs(numpy.nonzero(present2 & ~present1)[0]),
+            'different' : self.get_pairs(numpy.nonzero(different)[0]),
+        }
+
+    def check_masters(self):
+        '''
+        Check the kerning of all masters.
+
+        :returns: A list with a dict of problems for each master: pairs with sides which are neither a glyph nor a group (``missing``), and glyphs in more than one group of the same side (``conflicts``).
+
+        '''
+        reports = []
+        for m, font in enumerate(self.masters):
+            glyph_names = set(font.keys())
+            groups = self.groups[m]
+            missing = []
+            for i in numpy.nonzero(self.present[m])[0]:
+                first, second = self.get_pair(i)
+                if (first not in groups and first not in glyph_names) or (second not in groups and second not in glyph_names):
+                    missing.append((first, second))
+            conflicts = OrderedDict()
+            for side, names in ((1, self.first_names), (2, self.second_names)):
+                owners = {}
+                for name in names:
+                    for glyph_name in groups.get(name, []):
+                        owners.setdefault(glyph_name, []).append(name)
+                for glyph_name, group_names in sorted(owners.items()):
+                    if len(group_names) > 1:
+                        conflicts[(side, glyph_name)] = group_names
+            reports.append({ 'missing' : missing, 'conflicts' : conflicts })
+        return reports
+
+    # flattening
+
+    def flatten(self, master, values=None, skip_zero=True):
+        '''
+        Expand class kerning into glyph pairs, for example for a legacy ``kern`` table.
+
+        Pairs are expanded from the least to the most specific (class/class, class/glyph, glyph/class, glyph/glyph), so exceptions override class values.
+
+        :param list values: A row of values to flatten (for example an interpolated instance). Defaults to the values of ``master``, whose groups are used to expand classes.
+        :returns: A dict of glyph pairs.
+
+        '''
+        groups = self.groups[master]
+        if values is None:
+            values = self.values[master]
+            present = self.present[master]
+        else:
+            present = numpy.ones(len(self), dtype=bool)
+        first_is_class = numpy.array([ name in groups for name in self.first_names ], dtype=bool)
+        second_is_class = numpy.array([ name in groups for name in self.second_names ], dtype=bool)
+        if not len(self):
+            return {}
+        first_class = first_is_class[self.firsts]
+        second_class = second_is_class[self.seconds]
+        # lower numbers are less specific
+        precedence = (~first_class) * 2 + (~second_class) * 1
+        values = numpy.asarray(values).tolist()
+        flat = {}
+        for level in range(4):
+            for i in numpy.nonzero(present & (precedence == level))[0]:
+                first, second = self.get_pair(i)
+                value = values[i]
+                for first_glyph in groups.get(first, [first]) if first_class[i] else [first]:
+                    for second_glyph in groups.get(second, [second]) if second_class[i] else [second]:
+                        flat[(first_glyph, second_glyph)] = value
+        if skip_zero:
+            flat = dict([ (pair, value) for pair, value in flat.items() if value != 0 ])
+        return flat
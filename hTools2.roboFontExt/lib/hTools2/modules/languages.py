@@ -3,11 +3,9 @@
 
 # imports
 
-from . import encoding
-import importlib
-importlib.reload(encoding)
 
 from .encoding import chars2psnames
+from .unidata import get_languages_glyphnames
 
 # diacritics per language
 # source: Diacritics Project
@@ -159,8 +157,12 @@ def convert_chars_to_glyphnames(chars_dict):
         glyphnames[lang].append(uc_glyph_names)
     return glyphnames
 
+def get_diacritics_glyphnames():
+    """Get the glyph names of the diacritics for each language, from the compiled data store (see ``unidata``)."""
+    return get_languages_glyphnames()
+
 def check_language_coverage(language, glyph_names):
-    lc, uc = diacritics_glyphnames[language]
+    lc, uc = get_diacritics_glyphnames()[language]
     lang_names = lc + uc
     # check matching glyphs
     not_in_font = []
@@ -172,9 +174,10 @@ def check_language_coverage(language, glyph_names):
 
 def check_languages_coverage(glyph_names, n=50):
     # check language support
+    glyph_names = set(glyph_names)
     supported_langs = []
     not_supported_langs = {}
-    for lang in list(diacritics_glyphnames.keys()):
+    for lang in list(get_diacritics_glyphnames().keys()):
         missing_glyphs = check_language_coverage(lang, glyph_names)
         if len(missing_glyphs) == 0:
             supported_langs.append(lang)
@@ -196,4 +199,8 @@ def check_languages_coverage(glyph_names, n=50):
 
 # constants
 
-diacritics_glyphnames = convert_chars_to_glyphnames(diacritics_chars)
+def __getattr__(name):
+    # diacritics_glyphnames is built on first access
+    if name == 'diacritics_glyphnames':
+        return get_diacritics_glyphnames()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
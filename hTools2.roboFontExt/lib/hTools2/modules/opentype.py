@@ -2,12 +2,15 @@
 
 """basic functions to import, export and delete OpenType features in fonts"""
 
-import hTools2.modules.sysutils
-import importlib
-importlib.reload(hTools2.modules.sysutils)
-
+import io
 import os
-from hTools2.modules.sysutils import rel_path
+import re
+import time
+
+from collections import OrderedDict
+from functools import partial
+
+from hTools2.modules.sysutils import map_parallel, rel_path
 
 def clear_features(font):
     """
@@ -18,18 +21,14 @@ def clear_features(font):
 
 def import_features(font, fea_path, relative=None):
     """
-    Imports the content of the .fea file in ``fea_path`` into ``font.features``.
+    Imports the content of the .fea file in ``fea_path`` into ``font.features``. Included files are inlined (see ``get_features``).
 
     """
     features_text = ''
     if os.path.exists(fea_path):
         # make features file
         if relative is None:
-            fea = open(fea_path,'r')
-            fea_text = fea.readlines()
-            for line in fea_text:
-                features_text += line
-            fea.close()
+            features_text += get_features(fea_path)
         # link to features file
         else:
             rel_fea_path = rel_path(relative, fea_path)
@@ -40,13 +39,9 @@ def import_features(font, fea_path, relative=None):
 def import_kern_feature(font, fea_path, relative=None):
     features_text = '\n'
     if os.path.exists(fea_path):
-        fea = open(fea_path,'r')
         # make features file
         if relative is None:
-            fea_text = fea.readlines()
-            for line in fea_text:
-                features_text += line
-            fea.close()
+            features_text += get_features(fea_path)
         # link to features file
         else:
             rel_fea_path = rel_path(relative, fea_path)
@@ -64,15 +59,265 @@ def export_features(font, fea_path):
         fea.write(font.features.text)
         fea.close()
 
+#-------------------
+# feature assembler
+#-------------------
+
+#: Flattened feature files, by path (see ``get_features``).
+features_cache = {}
+
+_include = re.compile(r'\binclude\s*\(\s*([^)]+?)\s*\)\s*;?')
+
+def get_file_signature(file_path):
+    stat = os.stat(file_path)
+    return stat.st_mtime, stat.st_size
+
+def flatten_features(fea_path, include_dir=None, _parents=()):
+    """
+    Read a .fea file, replacing all ``include`` statements with the contents of the included files.
+
+    Relative paths are resolved from ``include_dir``, which defaults to the folder of the top-level file (as in feaLib). Missing and circular includes are reported and left as they are.
+
+    :returns: A tuple with the flattened text and a list of all files read.
+
+    """
+    fea_path = os.path.abspath(fea_path)
+    if include_dir is None:
+        include_dir = os.path.dirname(fea_path)
+    with open(fea_path, 'r') as fea_file:
+        lines = fea_file.readlines()
+    files = [fea_path]
+    parents = _parents + (fea_path,)
+    text = []
+    for line in lines:
+        code = line.split('#')[0]
+        match = _include.search(code)
+        if match is None:
+            text.append(line)
+            continue
+        include_path = match.group(1)
+        if not os.path.isabs(include_path):
+            include_path = os.path.join(include_dir, include_path)
+        include_path = os.path.abspath(include_path)
+        if include_path in parents:
+            print('circular include: %s' % include_path)
+            text.append(line)
+        elif not os.path.exists(include_path):
+            print('included file does not exist: %s' % include_path)
+            text.append(line)
+        else:
+            include_text, include_files = flatten_features(include_path, include_dir, parents)
+            files += include_files
+            text.append(line[:match.start()])
+            text.append(include_text)
+            if not include_text.endswith('\n'):
+                text.append('\n')
+            text.append(line[match.end():].lstrip(' \t'))
+    return ''.join(text), files
+
+def get_features(fea_path, include_dir=None):
+    """
+    Get the flattened text of a .fea file and all its included files.
+
+    Results are cached, and shared by all fonts which import the same file. The file is read again only if it (or one of its included files) has been modified since.
+
+    """
+    key = os.path.abspath(fea_path), include_dir
+    if key in features_cache:
+        signatures, text = features_cache[key]
+        try:
+            if all([ get_file_signature(file_path) == signature for file_path, signature in signatures ]):
+                return text
+        except OSError:
+            pass
+    text, files = flatten_features(fea_path, include_dir)
+    signatures = [ (file_path, get_file_signature(file_path)) for file_path in files ]
+    features_cache[key] = signatures, text
+    return text
+
+def validate_features(glyph_names, features_text):
+    """
+    Parse feature code with feaLib, checking syntax and glyph names.
+
+    Returns ``None`` if the code is valid, or the error message.
+
+    """
+    from fontTools.feaLib.parser import Parser
+    from fontTools.feaLib.error import FeatureLibError
+    try:
+        Parser(io.StringIO(features_text), glyphNames=glyph_names, followIncludes=False).parse()
+    except FeatureLibError as e:
+        return str(e)
+    return None
+
+def import_features_fonts(fonts, fea_path, validate=True, workers=None, verbose=True):
+    """
+    Import the same .fea file into many fonts.
+
+    The file and its includes are flattened only once. If ``validate=True``, the result is parsed with feaLib against the glyph set of each font, in parallel (fonts with the same glyph set are checked only once), and fonts with errors are left unchanged.
+
+    :returns: A list with the error message for each font (``None`` if the features were imported).
+
+    """
+    features_text = get_features(fea_path)
+    errors = [ None for font in fonts ]
+    if validate:
+        glyph_sets = [ tuple(sorted(font.keys())) for font in fonts ]
+        unique_sets = sorted(set(glyph_sets))
+        results = map_parallel(partial(validate_features, features_text=features_text), unique_sets, workers)
+        results = dict(zip(unique_sets, results))
+        errors = [ results[glyph_set] for glyph_set in glyph_sets ]
+    if verbose:
+        print('importing features into %s fonts...\n' % len(fonts))
+    for font, error in zip(fonts, errors):
+        if error is None:
+            font.features.text = features_text
+        if verbose:
+            print('\t%s %s: %s' % (font.info.familyName, font.info.styleName, 'ok' if error is None else error))
+    if verbose:
+        print('\n...done.\n')
+    return errors
+
+#--------------
+# kern feature
+#--------------
+
+#: Maximum estimated size of a class kerning subtable, in bytes. Subtable offsets are 16-bit, so subtables must stay below 64 KB.
+max_subtable_size = 0xFFFF
+
+def get_class_name(group_name, class_names):
+    """
+    Make a valid and unique feature class name for a group.
+
+    ``public.kern1.`` and ``public.kern2.`` prefixes become ``kern1_`` and ``kern2_``, and characters which are not allowed in class names are replaced with ``_``.
+
+    """
+    name = group_name.replace('public.kern1.', 'kern1_').replace('public.kern2.', 'kern2_')
+    name = re.sub(r'[^A-Za-z0-9._]', '_', name).lstrip('.')[:60]
+    class_name = '@%s' % name
+    count = 1
+    while class_name in class_names:
+        class_name = '@%s_%s' % (name[:55], count)
+        count += 1
+    return class_name
+
+def get_kern_classes(font, glyph_names=None):
+    """
+    Get feature classes for all groups used in the font's kerning.
+
+    Glyphs which are not in the font are left out, and empty classes are skipped.
+
+    :returns: An ordered dict of ``(class_name, glyphs)`` tuples, by group name.
+
+    """
+    if glyph_names is None:
+        glyph_names = set(font.keys())
+    groups_names = set()
+    for first, second in font.kerning.keys():
+        for name in (first, second):
+            if name in font.groups:
+                groups_names.add(name)
+    classes = OrderedDict()
+    class_names = set()
+    for group_name in sorted(groups_names):
+        glyphs = [ glyph_name for glyph_name in font.groups[group_name] if glyph_name in glyph_names ]
+        if not glyphs:
+            continue
+        class_name = get_class_name(group_name, class_names)
+        class_names.add(class_name)
+        classes[group_name] = class_name, glyphs
+    return classes
+
+def write_kern_feature(font, fea_file, verbose=False):
+    """
+    Write the font's kerning to a stream as an OpenType ``kern`` feature.
+
+    The feature is written in three steps: class definitions for all kerning groups, glyph pairs and exceptions (glyph-to-class pairs, as ``enum pos``), and class pairs. Class pairs are split into subtables when their estimated size reaches ``max_subtable_size``; all pairs with the same left class stay in the same subtable. Pairs with glyphs or groups which are not in the font are skipped.
+
+    :param file fea_file: An open file, or any object with a ``write`` method.
+    :returns: A dict with the number of ``classes``, ``pairs``, ``skipped`` pairs, ``subtables``, and the ``time`` in seconds.
+
+    """
+    start = time.time()
+    glyph_names = set(font.keys())
+    classes = get_kern_classes(font, glyph_names)
+    stats = { 'classes' : len(classes), 'pairs' : 0, 'skipped' : 0, 'subtables' : 1, 'time' : 0 }
+    # step 1: class definitions
+    for group_name, (class_name, glyphs) in classes.items():
+        fea_file.write('%s = [%s];\n' % (class_name, ' '.join(glyphs)))
+    if classes:
+        fea_file.write('\n')
+    # sort pairs into glyph pairs, exceptions and class pairs
+    glyph_pairs, exceptions, class_pairs = [], [], []
+    for (first, second), value in sorted(font.kerning.items()):
+        first_class = first in classes
+        second_class = second in classes
+        if (not first_class and first not in glyph_names) or (not second_class and second not in glyph_names):
+            stats['skipped'] += 1
+        elif first_class and second_class:
+            class_pairs.append((first, second, value))
+        elif first_class or second_class:
+            exceptions.append((first, second, value))
+        else:
+            glyph_pairs.append((first, second, value))
+    fea_file.write('feature kern {\n')
+    # step 2: glyph pairs and exceptions
+    for first, second, value in glyph_pairs:
+        fea_file.write('\tpos %s %s %s;\n' % (first, second, value))
+    for first, second, value in exceptions:
+        first = classes[first][0] if first in classes else first
+        second = classes[second][0] if second in classes else second
+        fea_file.write('\tenum pos %s %s %s;\n' % (first, second, value))
+    # step 3: class pairs, in subtables
+    # subtables are split only between left classes: glyphs of a left class which is covered by one subtable never reach the next one
+    left_pairs = OrderedDict()
+    for first, second, value in class_pairs:
+        left_pairs.setdefault(first, []).append((second, value))
+    left_classes, right_classes = set(), set()
+    class_glyphs = 0
+    for first, pairs in left_pairs.items():
+        new_rights = set([ second for second, value in pairs if second not in right_classes ])
+        added_glyphs = len(classes[first][1]) + sum([ len(classes[second][1]) for second in new_rights ])
+        # one 2-byte value record per class pair (including class 0), plus 2 bytes per glyph in class definitions
+        size = (len(left_classes) + 2) * (len(right_classes) + len(new_rights) + 1) * 2
+        size += (class_glyphs + added_glyphs) * 2
+        if size > max_subtable_size and left_classes:
+            fea_file.write('\tsubtable;\n')
+            stats['subtables'] += 1
+            left_classes, right_classes = set(), set()
+            class_glyphs = 0
+            new_rights = set([ second for second, value in pairs ])
+            added_glyphs = len(classes[first][1]) + sum([ len(classes[second][1]) for second in new_rights ])
+        left_classes.add(first)
+        right_classes.update(new_rights)
+        class_glyphs += added_glyphs
+        for second, value in pairs:
+            fea_file.write('\tpos %s %s %s;\n' % (classes[first][0], classes[second][0], value))
+    fea_file.write('} kern;\n')
+    stats['pairs'] = len(glyph_pairs) + len(exceptions) + len(class_pairs)
+    stats['time'] = time.time() - start
+    if verbose:
+        print('exporting kern feature...\n')
+        print('\tclasses: %s' % stats['classes'])
+        print('\tpairs: %s (%s skipped)' % (stats['pairs'], stats['skipped']))
+        print('\tsubtables: %s' % stats['subtables'])
+        print('\ttime: %.3f s' % stats['time'])
+        print('\n...done.\n')
+    return stats
+
+def save_kern_feature(font, fea_path, verbose=True):
+    """
+    Save the font's kerning as an OpenType ``kern`` feature in the .fea file in ``fea_path``. Lines are written to the file as they are generated.
+
+    """
+    with open(fea_path, 'w') as fea_file:
+        return write_kern_feature(font, fea_file, verbose)
+
 def export_kern_feature(font):
     """
-    Export the font's kerning dict to OpenType ``kern`` feature.
+    Export the font's kerning dict to OpenType ``kern`` feature, including class definitions for kerning groups.
 
     """
-    kern_feature = 'feature kern {\n'
-    for pair in sorted(font.kerning.keys()):
-        value = font.kerning[pair]
-        if pair[0] in list(font.keys()) and pair[1] in list(font.keys()):
-            kern_feature += '\tpos %s %s %s;\n' % (pair[0], pair[1], value)
-    kern_feature += '} kern;\n'
-    return kern_feature
+    fea_file = io.StringIO()
+    write_kern_feature(font, fea_file)
+    return fea_file.getvalue()
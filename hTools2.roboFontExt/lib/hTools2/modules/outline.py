@@ -1,17 +1,49 @@
 # [h] hTools2.modules.outline
 
-'''A simple wrapper for Frederik Berlaen's outliner code.'''
+'''
+A simple wrapper for Frederik Berlaen's outliner code.
+
+Whole fonts are expanded with ``expand_fonts``: only glyphs with contours are expanded, once for each distance; composites keep their components, which point to the expanded base glyphs. Contours are sent to the worker processes in a plain serializable format, a list of contours with ``(x, y, segmentType, smooth)`` points.
+
+By default, outlines are calculated with ``FastOutlinePen``, which gives the same results as ``OutlinePen`` without creating a ``MathPoint`` object for each step (see ``benchmark_outline_pens``).
+
+'''
+
+# imports
+
+import os
+import time
+import traceback
+
+from collections import OrderedDict
+from functools import partial
 
 from hTools2.extras.outline import *
-from mojo.roboFont import NewFont
+from fontTools.pens.pointPen import AbstractPointPen, PointToSegmentPen
+from hTools2.modules.sysutils import map_parallel
+
+try:
+    from mojo.roboFont import NewFont
+
+except:
+    from fontParts.world import NewFont
+
+#: Join and cap styles, by index.
+outline_options = ['Square', 'Round', 'Butt']
+
+#: Font info attributes copied into expanded fonts.
+outline_info_attributes = ['familyName', 'unitsPerEm', 'ascender', 'descender', 'xHeight', 'capHeight', 'italicAngle']
 
 # functions
 
-def make_outline(glyph, distance, join, cap, inner=True, outer=True, miter=None):
+def get_outline_pen(fast=True):
+    '''Get the outline pen class: ``FastOutlinePen``, or the original ``OutlinePen`` if ``fast=False``.'''
+    return FastOutlinePen if fast else OutlinePen
+
+def make_outline(glyph, distance, join, cap, inner=True, outer=True, miter=None, fast=True):
     '''Calculate expanded outlines for a given glyph.'''
-    options = ['Square', 'Round', 'Butt']
-    pen = OutlinePen(glyph.getParent(),
-                distance, connection=options[join], cap=options[cap],
+    pen = get_outline_pen(fast)(glyph.getParent(),
+                distance, connection=outline_options[join], cap=outline_options[cap],
                 miterLimit=miter, closeOpenPaths=True)
     glyph.draw(pen)
     pen.drawSettings(drawOriginal=False, drawInner=inner, drawOuter=outer)
@@ -36,26 +68,226 @@ def expand_glyph(src_glyph, dst_glyph, distance, join=1, cap=1, inner=True, oute
 
 expand = expand_glyph
 
-def expand_font(src_font, distance, join=1, cap=1):
+#----------
+# contours
+#----------
+
+def get_contours(glyph):
+    '''Get the contours of a glyph (without components) as a list of lists of ``(x, y, segmentType, smooth)`` tuples.'''
+    pen = ContoursPointPen()
+    glyph.drawPoints(pen)
+    return pen.contours
+
+def draw_contours(contours, point_pen):
+    '''Draw contours in the format returned by ``get_contours`` into a point pen.'''
+    for contour in contours:
+        point_pen.beginPath()
+        for x, y, segment_type, smooth in contour:
+            point_pen.addPoint((x, y), segmentType=segment_type, smooth=smooth)
+        point_pen.endPath()
+
+def expand_contours(contours, distance, join=1, cap=1, inner=True, outer=True, miter=None, fast=True):
+    '''Expand contours in the format returned by ``get_contours``, and return the expanded contours in the same format.'''
+    pen = get_outline_pen(fast)(None,
+                distance, connection=outline_options[join], cap=outline_options[cap],
+                miterLimit=miter, closeOpenPaths=True)
+    draw_contours(contours, PointToSegmentPen(pen))
+    pen.drawSettings(drawOriginal=False, drawInner=inner, drawOuter=outer)
+    contours_pen = ContoursPointPen()
+    pen.drawPoints(contours_pen)
+    return contours_pen.contours
+
+def expand_glyphs_contours(glyphs_contours, distances, join=1, cap=1, miter=None, fast=True):
+    '''
+    Expand the contours of several glyphs for several distances (one task for a worker process).
+
+    :param list glyphs_contours: A list of ``(glyph_name, contours)`` tuples.
+    :returns: A list of result dicts with the glyph ``name``, the expanded ``contours`` for each distance, and the ``error`` (if any).
+
+    '''
+    results = []
+    for glyph_name, contours in glyphs_contours:
+        result = { 'name' : glyph_name, 'contours' : {}, 'error' : None }
+        try:
+            for distance in distances:
+                result['contours'][distance] = expand_contours(contours, distance, join, cap, miter=miter, fast=fast)
+        except Exception:
+            result['error'] = traceback.format_exc()
+        results.append(result)
+    return results
+
+#-------
+# fonts
+#-------
+
+def expand_font(src_font, distance, join=1, cap=1, miter=None, workers=1, fast=True):
     '''Expand outlines for all glyphs in font.'''
-    # create a new empty font
-    dst_font = NewFont(showUI=False)
-    # expand all glyph
-    for glyph_name in list(src_font.keys()):
-        # get source glyph
+    report = expand_fonts(src_font, [distance], join, cap, miter=miter, workers=workers, fast=fast, verbose=False)
+    return report['fonts'][distance]
+
+def expand_fonts(src_font, distances, join=1, cap=1, miter=None, workers=None, ufos_folder=None, chunk_size=50, fast=True, verbose=True):
+    '''
+    Expand the outlines of a font for several distances in one run.
+
+    Glyphs with contours are sent to a pool of worker processes in chunks of ``chunk_size`` glyphs, and each glyph is expanded once for every distance. Components are copied with their full transformation, so composites reuse the expanded base glyphs.
+
+    :param list distances: The expansion distances, one new font for each.
+    :param str ufos_folder: A folder to save the expanded fonts in, as ``<familyName>_<styleName>_<distance>.ufo``. Fonts are not saved if ``None``.
+    :returns: A report dict with the new ``fonts`` and saved ``paths`` by distance, the number of ``glyphs`` and ``expanded`` glyphs, a dict of glyph ``errors``, and the ``times`` (in seconds) for each step.
+
+    '''
+    times = OrderedDict()
+    start = time.time()
+    # read contours
+    glyphs_contours = []
+    for glyph_name in src_font.keys():
+        contours = get_contours(src_font[glyph_name])
+        if contours:
+            glyphs_contours.append((glyph_name, contours))
+    times['read'] = time.time() - start
+    if verbose:
+        print('expanding %s of %s glyphs for %s distances...\n' % (len(glyphs_contours), len(src_font), len(distances)))
+    # expand contours
+    step_start = time.time()
+    chunks = [ glyphs_contours[i:i+chunk_size] for i in range(0, len(glyphs_contours), chunk_size) ]
+    expand_function = partial(expand_glyphs_contours, distances=distances, join=join, cap=cap, miter=miter, fast=fast)
+    results = {}
+    for chunk_results in map_parallel(expand_function, chunks, workers):
+        for result in chunk_results:
+            results[result['name']] = result
+    times['expand'] = time.time() - step_start
+    # build new fonts
+    step_start = time.time()
+    fonts = OrderedDict()
+    for distance in distances:
+        fonts[distance] = make_expanded_font(src_font, distance, results)
+    times['build'] = time.time() - step_start
+    # save new fonts
+    paths = OrderedDict()
+    if ufos_folder is not None:
+        step_start = time.time()
+        for distance, dst_font in fonts.items():
+            file_name = '%s_%s_%s.ufo' % (src_font.info.familyName, src_font.info.styleName, distance)
+            paths[distance] = os.path.join(ufos_folder, file_name.replace(' ', ''))
+            dst_font.save(paths[distance])
+        times['save'] = time.time() - step_start
+    times['total'] = time.time() - start
+    report = {
+        'fonts' : fonts,
+        'paths' : paths,
+        'glyphs' : len(src_font),
+        'expanded' : len(glyphs_contours),
+        'errors' : dict([ (glyph_name, result['error']) for glyph_name, result in results.items() if result['error'] is not None ]),
+        'times' : times,
+    }
+    if verbose:
+        print_expand_report(report)
+    return report
+
+def make_expanded_font(src_font, distance, results):
+    '''Create a new font with the expanded contours of one distance, the components, widths and unicodes of the source glyphs, and the main font info.'''
+    dst_font = NewFont(showInterface=False)
+    for attr in outline_info_attributes:
+        setattr(dst_font.info, attr, getattr(src_font.info, attr))
+    dst_font.info.styleName = '%s %s' % (src_font.info.styleName, distance)
+    naked = dst_font.naked() if hasattr(dst_font, 'naked') else None
+    hold = hasattr(naked, 'holdNotifications')
+    if hold:
+        naked.holdNotifications()
+    for glyph_name in src_font.keys():
         src_glyph = src_font[glyph_name]
-        # get dest glyph
         dst_font.newGlyph(glyph_name)
         dst_glyph = dst_font[glyph_name]
-        # expand glyph into dest font
-        outline_pen = make_outline(src_glyph, distance, join, cap)
-        outline_pen.drawPoints(dst_glyph.getPointPen())
-        # copy width from source glyph
         dst_glyph.width = src_glyph.width
-        # copy components
-        if len(src_glyph.components):
-            for component in src_glyph.components:
-                dst_glyph.appendComponent(component.baseGlyph, component.offset, component.scale)
-    # done
+        dst_glyph.unicodes = src_glyph.unicodes
+        result = results.get(glyph_name)
+        if result is not None and result['error'] is None:
+            draw_contours(result['contours'][distance], dst_glyph.getPointPen())
+        for component in src_glyph.components:
+            dst_component = dst_glyph.appendComponent(component.baseGlyph)
+            dst_component.transformation = component.transformation
+    dst_font.glyphOrder = src_font.glyphOrder
+    if hold:
+        naked.releaseHeldNotifications()
     return dst_font
 
+def expand_ufo(ufo_path, distances, join=1, cap=1, miter=None, workers=None, ufos_folder=None, fast=True, verbose=True):
+    '''Expand a ``.ufo`` font for several distances, and save the expanded fonts next to it (or in ``ufos_folder``).'''
+    from hTools2.modules.batch import open_font
+    if ufos_folder is None:
+        ufos_folder = os.path.dirname(ufo_path)
+    src_font = open_font(ufo_path)
+    report = expand_fonts(src_font, distances, join, cap, miter=miter, workers=workers, ufos_folder=ufos_folder, fast=fast, verbose=verbose)
+    for dst_font in report['fonts'].values():
+        dst_font.close()
+    src_font.close()
+    return report
+
+def print_expand_report(report):
+    '''Print the timing report of ``expand_fonts``, and the glyphs which could not be expanded.'''
+    print('expanded %s of %s glyphs into %s fonts:\n' % (report['expanded'], report['glyphs'], len(report['fonts'])))
+    for step, step_time in report['times'].items():
+        print('\t%s: %.2f s' % (step, step_time))
+    for distance, path in report['paths'].items():
+        print('\t%s: %s' % (distance, path))
+    for glyph_name, error in sorted(report['errors'].items()):
+        print('\t### %s failed:\n%s' % (glyph_name, error))
+    print('\n...done.\n')
+
+#-----------
+# benchmark
+#-----------
+
+def benchmark_outline_pens(font, distances=[10, 40], glyph_names=None, miter=None, verbose=True):
+    '''
+    Compare the time needed to expand a reference set of glyphs with ``OutlinePen`` and with ``FastOutlinePen``, for all joins and caps, and check that both pens give the same results.
+
+    :param list glyph_names: The glyphs to expand. Defaults to all glyphs with contours.
+    :returns: A dict with the number of ``glyphs`` and ``runs``, the times (in seconds) for the ``original`` and the ``fast`` pen, and a list of ``different`` results as ``(glyph_name, distance, join, cap)`` tuples.
+
+    '''
+    if glyph_names is None:
+        glyph_names = list(font.keys())
+    glyphs_contours = [ (glyph_name, get_contours(font[glyph_name])) for glyph_name in glyph_names ]
+    glyphs_contours = [ (glyph_name, contours) for glyph_name, contours in glyphs_contours if contours ]
+    options = [ (distance, join, cap) for distance in distances for join in range(len(outline_options)) for cap in range(len(outline_options)) ]
+    results = {}
+    times = {}
+    for fast in [False, True]:
+        start = time.time()
+        results[fast] = [ expand_contours(contours, distance, join, cap, miter=miter, fast=fast) for glyph_name, contours in glyphs_contours for distance, join, cap in options ]
+        times[fast] = time.time() - start
+    runs = [ (glyph_name, distance, join, cap) for glyph_name, contours in glyphs_contours for distance, join, cap in options ]
+    different = [ run for run, original, fast in zip(runs, results[False], results[True]) if original != fast ]
+    report = { 'glyphs' : len(glyphs_contours), 'runs' : len(runs), 'original' : times[False], 'fast' : times[True], 'different' : different }
+    if verbose:
+        print('outline pens (%s glyphs, %s runs):\n' % (report['glyphs'], report['runs']))
+        print('\tOutlinePen: %.4f s' % report['original'])
+        print('\tFastOutlinePen: %.4f s' % report['fast'])
+        if report['fast']:
+            print('\tspeedup: %.2fx' % (report['original'] / report['fast']))
+        print('\tdifferent results: %s' % len(different))
+        print()
+    return report
+
+# objects
+
+class ContoursPointPen(AbstractPointPen):
+
+    '''A point pen which collects contours as lists of ``(x, y, segmentType, smooth)`` tuples. Components are ignored.'''
+
+    def __init__(self):
+        self.contours = []
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.contours.append([])
+
+    def endPath(self):
+        pass
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        x, y = pt
+        self.contours[-1].append((x, y, segmentType, smooth))
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        pass
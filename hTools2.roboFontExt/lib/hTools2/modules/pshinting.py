@@ -1,45 +1,59 @@
 # [h] hTools2.modules.pshinting
 
-from robofab.pens.marginPen import MarginPen
+import json
+import os
+import plistlib
+import time
+
+from collections import Counter
+
+from hTools2.modules.fileutils import walk
+from hTools2.modules.glyphcache import draw_glif_contours, get_cache, GeometryCache
+from hTools2.modules.scanline import FlattenPen
+from hTools2.modules.sysutils import lazy_import, map_parallel
+
+numpy = lazy_import('numpy')
+
+#: Relative heights (or widths) of the glyph bounds at which glyphs are sliced to measure stems.
+slices = [0.2, 0.35, 0.5, 0.65, 0.8]
+
+#: Maximum number of values in ``postscriptStemSnapH`` and ``postscriptStemSnapV``.
+max_stem_snaps = 12
 
 #----------
 # ps stems
 #----------
 
 def get_vstems(font, glyphs=['l', 'I']):
+    cache = get_cache(font)
     ref_y = font.info.xHeight / 2.0
     stems = []
     for glyph_name in glyphs:
         if glyph_name in font:
-            g = font[glyph_name]
             # get margins
-            pen = MarginPen(g, ref_y, isHorizontal=True)
-            g.draw(pen)
+            margins = cache.margins(glyph_name, ref_y, horizontal=True)
             # calculate stem from margins
-            try:
-                left_edge, right_edge = pen.getMargins()
+            if margins is not None: # glyph is empty
+                left_edge, right_edge = margins
                 stem = int(right_edge - left_edge)
                 stems.append(stem)
-            except:
-                pass # glyph is empty
+    cache.save()
     return stems
 
 def get_hstems(font, glyphs=['H']):
+    cache = get_cache(font)
     stems = []
     for glyph_name in glyphs:
         if glyph_name in font:
-            g = font[glyph_name]
-            ref_x = g.width / 2.0
+            ref_x = font[glyph_name].width / 2.0
             # get margins
-            pen = MarginPen(g, ref_x, isHorizontal=False)
-            g.draw(pen)
+            margins = cache.margins(glyph_name, ref_x, horizontal=False)
             # calculate stem from margins
-            try:
-                bottom_edge, top_edge = pen.getMargins()
+            if margins is not None: # glyph is empty
+                bottom_edge, top_edge = margins
                 stem = int(top_edge - bottom_edge)
                 stems.append(stem)
-            except:
-                pass # glyph is empty
+    cache.save()
     return stems
 
 def set_vstems(font, stems):
@@ -62,21 +76,26 @@ def set_stems(font, vstems=None, hstems=None):
 
 def get_bluezones(font):
     zones = []
-    # baseline
-    zones.append(font['o'].box[1])
+    references = [
+        # baseline
+        ('o', 1),
+        # xheight
+        ('x', 3),
+        ('o', 3),
+        # descender
+        ('g', 1),
+        ('p', 1),
+        # asscender
+        ('d', 3),
+        ('f', 3),
+        # capheight
+        # ('H', 3),
+        # ('O', 3),
+    ]
     zones.append(0)
-    # xheight
-    zones.append(font['x'].box[3])
-    zones.append(font['o'].box[3])
-    # descender
-    zones.append(font['g'].box[1])
-    zones.append(font['p'].box[1])
-    # asscender
-    zones.append(font['d'].box[3])
-    zones.append(font['f'].box[3])
-    # capheight
-    # zones.append(font['H'].box[3])
-    # zones.append(font['O'].box[3])
+    for glyph_name, i in references:
+        if glyph_name in font and font[glyph_name].box is not None:
+            zones.append(font[glyph_name].box[i])
     # done
     zones.sort()
     return zones
@@ -85,3 +104,212 @@ def set_bluezones(font, bluezones=None):
     if not bluezones:
         bluezones = get_bluezones(font)
     font.info.postscriptBlueValues = bluezones
+
+#-------------------
+# hinting analysis
+#-------------------
+
+def get_glif_edges(cache, glyph_name, tolerance=1.0):
+    """
+    Get the contours of a glyph in a ``.ufo`` font as a list of straight ``(x0, y0, x1, y1)`` edges, with curves flattened (see ``EdgesPen``). Components are ignored.
+
+    Edges are cached in the font's geometry cache, by the key of the glyph's own data (see ``GeometryCache.get_glif_key``).
+
+    """
+    key = 'edges%s:%s' % (tolerance, cache.get_glif_key(glyph_name))
+    if key not in cache.entries:
+        row = cache.db.execute('SELECT data FROM geometry WHERE hash=?', (key,)).fetchone()
+        if row is not None:
+            edges = json.loads(row[0])
+        else:
+            pen = EdgesPen(tolerance=tolerance)
+            draw_glif_contours(cache.get_glif_data(glyph_name), pen)
+            edges = pen.edges
+            cache.store(key, edges)
+        cache.entries[key] = edges
+    return cache.entries[key]
+
+def get_runs(edges, positions):
+    """
+    Slice a list of edges with horizontal lines at the given heights, and measure the lengths of the parts inside the contours (non-zero winding).
+
+    To slice with vertical lines, swap the x and y values of the edges.
+
+    :returns: A list of run lengths.
+
+    """
+    if not len(edges) or not len(positions):
+        return []
+    x0, y0, x1, y1 = numpy.asarray(edges, dtype=float).T
+    directions = numpy.where(y1 > y0, 1, -1)
+    Y = numpy.asarray(positions, dtype=float)[:, numpy.newaxis]
+    crossing = (y0 <= Y) != (y1 <= Y)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        X = x0 + (Y - y0) * (x1 - x0) / (y1 - y0)
+    runs = []
+    for i in range(len(positions)):
+        row_xs = X[i][crossing[i]]
+        order = numpy.argsort(row_xs, kind='mergesort')
+        row_xs = row_xs[order]
+        winding = numpy.cumsum(directions[crossing[i]][order])
+        inside = winding[:-1] != 0
+        runs += (row_xs[1:] - row_xs[:-1])[inside].tolist()
+    return runs
+
+def get_clusters(values, span):
+    """
+    Group a list of values into clusters. Each cluster starts at its lowest value and includes all values up to ``span`` units higher.
+
+    :returns: A list of clusters as ``(values, count)`` tuples, where ``values`` is a sorted list of distinct values and ``count`` the total number of values.
+
+    """
+    histogram = sorted(Counter(values).items())
+    clusters = []
+    for value, count in histogram:
+        if clusters and value - clusters[-1][0][0] <= span:
+            clusters[-1][0].append(value)
+            clusters[-1][1] += count
+        else:
+            clusters.append([[value], count])
+    return [ (cluster_values, count) for cluster_values, count in clusters ]
+
+def get_stem_snaps(stems, span=3, min_count=2):
+    """Propose stem snap values from a list of measured stems: the most frequent value in each of the largest clusters, sorted."""
+    histogram = Counter(stems)
+    clusters = [ (values, count) for values, count in get_clusters(stems, span) if count >= min_count ]
+    clusters.sort(key=lambda cluster: cluster[1], reverse=True)
+    snaps = [ max(values, key=lambda value: histogram[value]) for values, count in clusters[:max_stem_snaps] ]
+    return sorted(snaps)
+
+def get_zones(extremes, span=20, min_count=3):
+    """Propose zones from a list of glyph extremes, as ``(bottom, top, count)`` tuples for each cluster with at least ``min_count`` values."""
+    return [ (values[0], values[-1], count) for values, count in get_clusters(extremes, span) if count >= min_count ]
+
+def analyze_edges(glyphs_edges, units_per_em=1000, stem_span=3, zone_span=20, min_count=None):
+    """
+    Propose PostScript hinting parameters from the flattened contours of all glyphs in a font.
+
+    Each glyph is sliced at several heights and widths (see ``slices``). Stem widths are collected in histograms and clustered into ``postscriptStemSnapH`` and ``postscriptStemSnapV``; the bottoms and tops of all glyphs are clustered into zones. The zone containing the baseline and all top zones become ``postscriptBlueValues``, the other bottom zones ``postscriptOtherBlues``.
+
+    :param dict glyphs_edges: The edges of each glyph, by name.
+    :returns: A report dict with the proposed ``values``, the ``vstems`` and ``hstems`` histograms, and the ``zones`` with the number of glyphs supporting each.
+
+    """
+    if min_count is None:
+        min_count = max(2, len(glyphs_edges) // 50)
+    max_stem = units_per_em * 0.25
+    vstems, hstems, bottoms, tops = [], [], [], []
+    for glyph_name, edges in glyphs_edges.items():
+        if not edges:
+            continue
+        array = numpy.asarray(edges, dtype=float)
+        xmin, xmax = array[:, [0, 2]].min(), array[:, [0, 2]].max()
+        ymin, ymax = array[:, [1, 3]].min(), array[:, [1, 3]].max()
+        bottoms.append(int(round(ymin)))
+        tops.append(int(round(ymax)))
+        ys = [ ymin + (ymax - ymin) * f for f in slices ]
+        xs = [ xmin + (xmax - xmin) * f for f in slices ]
+        vstems += [ int(round(run)) for run in get_runs(edges, ys) if 1 <= run <= max_stem ]
+        swapped = array[:, [1, 0, 3, 2]]
+        hstems += [ int(round(run)) for run in get_runs(swapped, xs) if 1 <= run <= max_stem ]
+    bottom_zones = get_zones(bottoms, zone_span, min_count)
+    top_zones = get_zones(tops, zone_span, min_count)
+    # the baseline zone is the bottom zone closest to zero
+    baseline = min(bottom_zones, key=lambda zone: min(abs(zone[0]), abs(zone[1]))) if bottom_zones else None
+    blues = []
+    if baseline is not None:
+        blues.append(baseline)
+    top_zones.sort(key=lambda zone: zone[2], reverse=True)
+    blues += top_zones[:7 - len(blues)]
+    other_blues = [ zone for zone in bottom_zones if zone is not baseline ]
+    other_blues.sort(key=lambda zone: zone[2], reverse=True)
+    other_blues = other_blues[:5]
+    values = {
+        'postscriptStemSnapV' : get_stem_snaps(vstems, stem_span, min_count),
+        'postscriptStemSnapH' : get_stem_snaps(hstems, stem_span, min_count),
+        'postscriptBlueValues' : [ value for zone in sorted(blues) for value in zone[:2] ],
+        'postscriptOtherBlues' : [ value for zone in sorted(other_blues) for value in zone[:2] ],
+    }
+    return {
+        'values' : values,
+        'vstems' : Counter(vstems),
+        'hstems' : Counter(hstems),
+        'zones' : { 'blues' : sorted(blues), 'other_blues' : sorted(other_blues) },
+        'glyphs' : len(glyphs_edges),
+    }
+
+def analyze_font(font, tolerance=1.0, **kwargs):
+    """Analyze the hinting parameters of an open font (see ``analyze_edges``). Only glyphs with contours are used."""
+    glyphs_edges = {}
+    for glyph in font:
+        if len(glyph.contours):
+            pen = EdgesPen(tolerance=tolerance)
+            for contour in glyph.contours:
+                contour.draw(pen)
+            glyphs_edges[glyph.name] = pen.edges
+    return analyze_edges(glyphs_edges, font.info.unitsPerEm or 1000, **kwargs)
+
+def analyze_ufo(ufo_path, tolerance=1.0, **kwargs):
+    """Analyze the hinting parameters of a ``.ufo`` font, reading and caching flattened contours from the ``.glif`` files (see ``analyze_edges``)."""
+    start = time.time()
+    cache = GeometryCache(ufo_path=ufo_path)
+    glyphs_edges = {}
+    for glyph_name in cache.glyph_names():
+        edges = get_glif_edges(cache, glyph_name, tolerance)
+        if edges:
+            glyphs_edges[glyph_name] = edges
+    cache.close()
+    units_per_em = 1000
+    info_path = os.path.join(ufo_path, 'fontinfo.plist')
+    if os.path.exists(info_path):
+        with open(info_path, 'rb') as info_file:
+            units_per_em = plistlib.load(info_file).get('unitsPerEm', 1000)
+    report = analyze_edges(glyphs_edges, units_per_em, **kwargs)
+    report['path'] = ufo_path
+    report['time'] = time.time() - start
+    return report
+
+def analyze_masters(ufo_paths, workers=None, verbose=True):
+    """
+    Analyze the hinting parameters of several masters in parallel, one master per worker process.
+
+    :param list ufo_paths: A list of ``.ufo`` paths, or a folder containing ``.ufo`` fonts.
+    :returns: A list of reports, one per master.
+
+    """
+    if isinstance(ufo_paths, str):
+        ufo_paths = walk(ufo_paths, 'ufo')
+    reports = map_parallel(analyze_ufo, sorted(ufo_paths), workers)
+    if verbose:
+        for report in reports:
+            print_hinting_report(report)
+    return reports
+
+def print_hinting_report(report):
+    """Print the proposed hinting parameters, and the number of glyphs supporting each zone."""
+    if 'path' in report:
+        print('hinting parameters for %s (%s glyphs, %.2f s)...\n' % (os.path.basename(report['path']), report['glyphs'], report['time']))
+    else:
+        print('hinting parameters (%s glyphs)...\n' % report['glyphs'])
+    for attribute, values in sorted(report['values'].items()):
+        print('\t%s: %s' % (attribute, values))
+    print()
+    for zones_name in ['blues', 'other_blues']:
+        for bottom, top, count in report['zones'][zones_name]:
+            print('\t%s: %s %s (%s glyphs)' % (zones_name, bottom, top, count))
+    print('\n...done.\n')
+
+def set_hinting_parameters(font, report):
+    """Set the proposed stem snaps and blue zones in the font info."""
+    for attribute, values in report['values'].items():
+        setattr(font.info, attribute, values)
+
+# objects
+
+class EdgesPen(FlattenPen):
+
+    """A pen to convert glyph contours into straight edges, like ``scanline.FlattenPen``, but keeping horizontal edges, so contours can be sliced in both directions."""
+
+    def _add_edge(self, pt0, pt1):
+        if pt0 != pt1:
+            self.edges.append((pt0[0], pt0[1], pt1[0], pt1[1]))
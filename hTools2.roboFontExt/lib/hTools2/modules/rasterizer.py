@@ -1,12 +1,12 @@
 # [h] hTools2.modules.rasterizer
 
-import hTools2.modules.primitives
-import importlib
-importlib.reload(hTools2.modules.primitives)
-
 # imports
 
 import random
+import time
+
+from base64 import b64encode, b64decode
+from functools import partial
 
 try:
     from mojo.roboFont import NewFont
@@ -15,6 +15,12 @@ except:
     from fontParts.world import NewFont
 
 from hTools2.modules.primitives import oval, rect, element
+from hTools2.modules.sysutils import lazy_import, map_parallel
+
+numpy = lazy_import('numpy')
+
+if numpy is not None:
+    from hTools2.modules.scanline import get_edges, scan_edges
 
 # functions
 
@@ -105,6 +111,217 @@ def get_esize(font, element_src='_element'):
 
     return w, h
 
+#-------------------
+# bits lib encoding
+#-------------------
+
+#: The current version of the compact bits format.
+bits_format_version = 2
+
+def is_packed(coordenates):
+    """Check if bit coordenates from a glyph lib are in the compact format."""
+    return 'version' in coordenates
+
+def pack_bits(coordenates):
+    """
+    Convert bit coordenates into the compact format used in glyph libs.
+
+    Lines are stored from top to bottom, each line packed into bytes (8 bits per byte), and all lines encoded together as a base64 string. A header stores the version, the number of the top line, and the shape of the matrix.
+
+    :param dict coordenates: A dict of bit lines (lists of 0/1) by line number (as strings).
+    :returns: A dict with the keys ``version``, ``top``, ``rows``, ``columns`` and ``data``.
+
+    """
+    line_numbers = [ int(float(line)) for line in coordenates.keys() ]
+    lines = dict(zip(line_numbers, coordenates.values()))
+    if len(lines):
+        top, bottom = max(line_numbers), min(line_numbers)
+        columns = max([ len(bits) for bits in lines.values() ])
+    else:
+        top, bottom, columns = 0, 1, 0
+    data = bytearray()
+    for line in range(top, bottom - 1, -1):
+        bits = list(lines.get(line, []))
+        bits += [0] * (columns - len(bits))
+        bits += [0] * (-columns % 8)
+        for i in range(0, len(bits), 8):
+            byte = 0
+            for bit in bits[i:i+8]:
+                byte = (byte << 1) | (1 if bit else 0)
+            data.append(byte)
+    return {
+        'version' : bits_format_version,
+        'top' : top,
+        'rows' : top - bottom + 1,
+        'columns' : columns,
+        'data' : b64encode(bytes(data)).decode('ascii'),
+    }
+
+def unpack_bits(packed):
+    """
+    Convert bit coordenates in the compact format back into a dict of lines.
+
+    Bits in the old format (a dict of lines) are returned with normalized line numbers.
+
+    """
+    if not is_packed(packed):
+        return dict([ (str(int(float(line))), bits) for line, bits in packed.items() ])
+    data = b64decode(packed['data'])
+    columns = packed['columns']
+    row_bytes = (columns + 7) // 8
+    coordenates = {}
+    for i in range(packed['rows']):
+        bits = []
+        for byte in data[i*row_bytes:(i+1)*row_bytes]:
+            bits += [ (byte >> shift) & 1 for shift in range(7, -1, -1) ]
+        coordenates[str(packed['top'] - i)] = bits[:columns]
+    return coordenates
+
+def pack_font_bits(font, verbose=True):
+    """
+    Convert the bits stored in all glyph libs of a font from the old format (a dict of lines) to the compact format.
+
+    :returns: The number of converted glyphs.
+
+    """
+    count = 0
+    for glyph in font:
+        coordenates = glyph.lib.get(RasterGlyph.lib_key_coordenates)
+        if coordenates is not None and not is_packed(coordenates):
+            glyph.lib[RasterGlyph.lib_key_coordenates] = pack_bits(coordenates)
+            count += 1
+    if verbose:
+        print('converted bits in %s glyphs to compact format.\n' % count)
+    return count
+
+#----------------------
+# font-level rasterizer
+#----------------------
+
+def scan_bits(edges, box, res):
+    """
+    Scan a list of flattened edges (see ``scanline.get_edges``) into bit lines, with the same grid as ``RasterGlyph.get_bits``.
+
+    """
+    res_x, res_y = res
+    xMin, yMin, xMax, yMax = box
+    xMin, yMin, xMax, yMax = int(xMin), int(yMin), int(xMax), int(yMax)
+    xValues = list(range(xMin, xMax, res_x))
+    yValues = list(range(yMin, yMax, res_y))
+    yValues.reverse()
+    xCenters = [ x + (res_x / 2) for x in xValues ]
+    yCenters = [ y + (res_y / 2) for y in yValues ]
+    rows = scan_edges(edges, xCenters, yCenters)
+    lines = {}
+    for y, bits in zip(yValues, rows):
+        lines[str(y // res_y)] = bits.tolist()
+    return lines
+
+def get_offsets(coordenates, res):
+    """Get the positions of all element components for the given bit lines."""
+    res_x, res_y = res
+    offsets = []
+    for line in sorted(coordenates.keys(), key=int, reverse=True):
+        y = int(line) * res_y
+        for i, bit in enumerate(coordenates[line]):
+            if bit == 1:
+                offsets.append((i * res_x, y))
+    return offsets
+
+def place_components(glyph, base_glyph, offsets):
+    """
+    Add components of ``base_glyph`` at all ``offsets`` to the glyph in one operation, using a point pen.
+
+    In RoboFont, glyph notifications are held until all components have been added.
+
+    """
+    naked = glyph.naked() if hasattr(glyph, 'naked') else None
+    hold = hasattr(naked, 'holdNotifications')
+    if hold:
+        naked.holdNotifications()
+    pen = glyph.getPointPen()
+    for x, y in offsets:
+        pen.addComponent(base_glyph, (1, 0, 0, 1, x, y))
+    if hold:
+        naked.releaseHeldNotifications()
+
+def _scan_glyph(item, res):
+    glyph_name, edges, box = item
+    coordenates = scan_bits(edges, box, res)
+    return glyph_name, coordenates, get_offsets(coordenates, res)
+
+def rasterize_font(font, glyph_names=None, res=(125, 125), workers=None, color=None, element_src='_element'):
+    """
+    Scan and rasterize several glyphs in a font.
+
+    Glyph outlines are flattened in the current process; scanning and the calculation of component positions run in parallel worker processes (requires NumPy). Components are then placed into each glyph in one operation.
+
+    :param RFont font: The font containing the glyphs.
+    :param list glyph_names: The glyphs to rasterize. Defaults to all glyphs in the font.
+    :param tuple res: The grid resolution as a tuple of values for x and y.
+    :param int workers: The number of worker processes (``None`` uses all CPUs).
+    :param str element_src: The glyph used as component for each bit.
+
+    """
+    if glyph_names is None:
+        glyph_names = list(font.keys())
+    glyph_names = [ glyph_name for glyph_name in glyph_names if glyph_name != element_src ]
+    res_x, res_y = res
+    # no numpy: scan glyph by glyph
+    if numpy is None:
+        for glyph_name in glyph_names:
+            RasterGlyph(font[glyph_name]).rasterize(res=res, color=color, element_src=element_src)
+        font.update()
+        return
+    # collect outlines
+    items = []
+    for glyph_name in glyph_names:
+        glyph = font[glyph_name]
+        if len(glyph.contours) > 0:
+            items.append((glyph_name, get_edges(glyph), glyph.box))
+    # scan and get component positions
+    results = map_parallel(partial(_scan_glyph, res=res), items, workers)
+    # place components
+    for glyph_name, coordenates, offsets in results:
+        glyph = font[glyph_name]
+        raster_glyph = RasterGlyph(glyph)
+        raster_glyph.coordenates = coordenates
+        raster_glyph.leftMargin = glyph.leftMargin / res_x
+        raster_glyph.rightMargin = glyph.rightMargin / res_x
+        raster_glyph.save_bits_to_lib()
+        raster_glyph.render(glyph, offsets, res, color, element_src)
+    font.update()
+
+#-----------
+# benchmark
+#-----------
+
+def benchmark_scan(glyphs, resolutions=[(125, 125), (50, 50), (20, 20), (10, 10)]):
+    """
+    Compare the ``scanline`` and ``pointInside`` scanning engines on a list of glyphs, at several resolutions.
+
+    Prints the time taken by each engine, and the number of bits in which their results differ.
+
+    """
+    print('benchmarking rasterizer engines on %s glyphs...\n' % len(glyphs))
+    for res in resolutions:
+        times = {}
+        results = {}
+        for engine in ['pointInside', 'scanline']:
+            start = time.time()
+            results[engine] = [ RasterGlyph(glyph).get_bits(res, engine) for glyph in glyphs ]
+            times[engine] = time.time() - start
+        # count differing bits
+        diff = 0
+        for lines_1, lines_2 in zip(results['pointInside'], results['scanline']):
+            if lines_1 is None:
+                continue
+            for line in lines_1:
+                diff += sum([ 1 for b1, b2 in zip(lines_1[line], lines_2[line]) if b1 != b2 ])
+        speedup = times['pointInside'] / times['scanline'] if times['scanline'] else 0
+        print('\tres %sx%s: pointInside %.3f s, scanline %.3f s (%.1fx), %s different bits' % (res[0], res[1], times['pointInside'], times['scanline'], speedup, diff))
+    print('\n...done.\n')
+
 # objects
 
 class RasterGlyph:
@@ -121,36 +338,34 @@ class RasterGlyph:
     def __init__(self, sourceGlyph):
         self.g = sourceGlyph
 
-    def scan(self, res):
+    def get_bits(self, res, engine=None):
         """
-        Scan glyph and store bits into glyph lib.
+        Scan the glyph and return its bits, without storing them.
 
-        :param int res: The grid resolution to use when scanning the glyph, as a tuple of values for x and y.
-        :returns: A boolean indicating sucess or failure of the scan operation.
+        :param tuple res: The grid resolution to use when scanning the glyph, as a tuple of values for x and y.
+        :param str engine: ``scanline`` (fast, requires NumPy) or ``pointInside`` (one call to ``glyph.pointInside`` per bit). Defaults to ``scanline`` if NumPy is available. Both engines give the same bits, except for sample points lying within a fraction of a unit from the outline.
+        :returns: A dict of bit lines by line number (as strings), or ``None`` if the glyph has no contours.
 
         """
-
-        success = False
+        if len(self.g.contours) == 0:
+            return None
         res_x, res_y = res
+        if engine is None:
+            engine = 'scanline' if numpy is not None else 'pointInside'
 
-        # get margins
-        self.leftMargin = self.g.leftMargin / res_x
-        self.rightMargin = self.g.rightMargin / res_x
-
-        # scan glyph
-        if len(self.g.contours) > 0:
-
+        # scan lines
+        lines = {}
+        if engine == 'scanline':
+            lines = scan_bits(get_edges(self.g), self.g.box, res)
+        else:
             # get bounding box
             xMin, yMin, xMax, yMax = self.g.box
             xMin, yMin, xMax, yMax = int(xMin), int(yMin), int(xMax), int(yMax)
             xValues = list(range(xMin, xMax, res_x))
             yValues = list(range(yMin, yMax, res_y))
             yValues.reverse()
-
-            # scan lines
-            lines = {}
             for y in yValues:
-                lineNumber = y / res_y
+                lineNumber = y // res_y
                 bits = []
                 for x in xValues:
                     if self.g.pointInside((x+(res_x/2), y+(res_y/2))):
@@ -159,6 +374,30 @@ class RasterGlyph:
                         bits.append(0,)
                 lines[str(lineNumber)] = bits
 
+        # done
+        return lines
+
+    def scan(self, res, engine=None):
+        """
+        Scan glyph and store bits into glyph lib.
+
+        :param int res: The grid resolution to use when scanning the glyph, as a tuple of values for x and y.
+        :param str engine: The scanning engine, see ``get_bits``.
+        :returns: A boolean indicating sucess or failure of the scan operation.
+
+        """
+
+        success = False
+        res_x, res_y = res
+
+        # get margins
+        self.leftMargin = self.g.leftMargin / res_x
+        self.rightMargin = self.g.rightMargin / res_x
+
+        # scan glyph
+        lines = self.get_bits(res, engine)
+        if lines is not None:
+
             # store scanned data
             self.coordenates = lines
             self.save_bits_to_lib()
@@ -167,20 +406,25 @@ class RasterGlyph:
         # done
         return success
 
-    def save_bits_to_lib(self):
+    def save_bits_to_lib(self, packed=True):
         """
         Save bit coordenates and margins from attributes into the glyph lib.
 
+        :param bool packed: Store bits in the compact format (see ``pack_bits``) instead of a dict of lines.
+
         """
-        self.g.lib[self.lib_key_coordenates] = self.coordenates
+        if packed:
+            self.g.lib[self.lib_key_coordenates] = pack_bits(self.coordenates)
+        else:
+            self.g.lib[self.lib_key_coordenates] = self.coordenates
         self.g.lib[self.lib_key_margins] = self.leftMargin, self.rightMargin
 
     def read_bits_from_lib(self):
         """
-        Read bit coordenates and margins from the glyph lib into attributes.
+        Read bit coordenates and margins from the glyph lib into attributes. Works with both compact and old formats.
 
         """
-        self.coordenates = self.g.lib[self.lib_key_coordenates]
+        self.coordenates = unpack_bits(self.g.lib[self.lib_key_coordenates])
         self.leftMargin, self.rightMargin = self.g.lib[self.lib_key_margins]
 
     def print_bits(self, black="#", white="-", res=(125, 125)):
@@ -251,14 +495,14 @@ class RasterGlyph:
         print()
         print("-" * line_length, "\n")
 
-    def rasterize(self, destGlyph=None, res=(125, 125), color=None):
+    def rasterize(self, destGlyph=None, res=(125, 125), color=None, element_src='_element'):
         """
-        Render scanned bits into destination glyph using components.
+        Render scanned bits into destination glyph using components of the glyph ``element_src``.
 
         """
 
         res_x, res_y = res
-        element = "_element"
+        element = element_src
 
         # define destination glyph
         if destGlyph == None:
@@ -275,34 +519,34 @@ class RasterGlyph:
 
         if lib_exists:
 
-            # prepare glyphs
-            destGlyph.clear()
-
-            # prepare lines
-            lineNumbers = list(self.g.lib[self.lib_key_coordenates].keys())
-            lineNumbers.sort()
-            lineNumbers.reverse()
-
             # place components from matrix
-            for line in lineNumbers:
-                bitCount = 0
-                for bit in self.g.lib[self.lib_key_coordenates][line]:
-                    if bit == 1:
-                        x = bitCount * res_x
-                        y = int(line) * res_y
-                        destGlyph.appendComponent(element, (x, y), (1, 1))
-                    else:
-                        pass
-                    bitCount = bitCount + 1
-
-            # set glyph data & update
-            destGlyph.leftMargin = self.g.lib[self.lib_key_margins][0] * res_x
-            destGlyph.rightMargin = self.g.lib[self.lib_key_margins][1] * res_x
-            destGlyph.autoUnicodes()
-            if color:
-                destGlyph.mark = color
-            destGlyph.update()
+            self.read_bits_from_lib()
+            offsets = get_offsets(self.coordenates, res)
+            self.render(destGlyph, offsets, res, color, element)
 
         else:
             # print '\tglyph %s is empty.\n' % destGlyph.name
             pass
+
+    def render(self, destGlyph, offsets, res, color=None, element='_element'):
+        """
+        Replace the contents of the destination glyph with element components at the given offsets.
+
+        Margins are applied by shifting the offsets and setting the width directly, instead of moving all components afterwards.
+
+        """
+        res_x, res_y = res
+        destGlyph.clear()
+        if len(offsets):
+            # shift offsets to get the left margin
+            e_xMin, e_yMin, e_xMax, e_yMax = destGlyph.getParent()[element].box
+            xMin = min([ x for x, y in offsets ]) + e_xMin
+            xMax = max([ x for x, y in offsets ]) + e_xMax
+            shift = (self.leftMargin * res_x) - xMin
+            offsets = [ (x + shift, y) for x, y in offsets ]
+            place_components(destGlyph, element, offsets)
+            destGlyph.width = xMax + shift + (self.rightMargin * res_x)
+        destGlyph.autoUnicodes()
+        if color:
+            destGlyph.mark = color
+        destGlyph.update()
@@ -0,0 +1,123 @@
+# [h] hTools2.modules.scanline
+
+"""A scanline rasterizer to convert glyph outlines into a matrix of bits."""
+
+# imports
+
+from math import ceil, sqrt
+
+from fontTools.pens.basePen import BasePen
+
+from hTools2.modules.sysutils import lazy_import
+
+numpy = lazy_import('numpy')
+
+# objects
+
+class FlattenPen(BasePen):
+
+    """A pen to convert glyph contours into a list of straight edges, approximating curves with line segments."""
+
+    def __init__(self, glyphSet=None, tolerance=0.1):
+        BasePen.__init__(self, glyphSet)
+        #: The maximum distance between a curve and its flattened segments, in units.
+        self.tolerance = tolerance
+        #: A list of edges as ``(x0, y0, x1, y1)`` tuples.
+        self.edges = []
+        self.start = None
+
+    def _add_edge(self, pt0, pt1):
+        # horizontal edges never cross a scanline
+        if pt0[1] != pt1[1]:
+            self.edges.append((pt0[0], pt0[1], pt1[0], pt1[1]))
+
+    def _moveTo(self, pt):
+        self.start = pt
+
+    def _lineTo(self, pt):
+        self._add_edge(self._getCurrentPoint(), pt)
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        pt0 = self._getCurrentPoint()
+        x0, y0 = pt0
+        x1, y1 = pt1
+        x2, y2 = pt2
+        x3, y3 = pt3
+        # number of segments from the curve's second differences (Wang's formula)
+        dd = max(
+            sqrt((x0 - 2*x1 + x2)**2 + (y0 - 2*y1 + y2)**2),
+            sqrt((x1 - 2*x2 + x3)**2 + (y1 - 2*y2 + y3)**2))
+        steps = max(1, int(ceil(sqrt(0.75 * dd / self.tolerance))))
+        previous = pt0
+        for i in range(1, steps + 1):
+            t = float(i) / steps
+            mt = 1.0 - t
+            a = mt * mt * mt
+            b = 3 * mt * mt * t
+            c = 3 * mt * t * t
+            d = t * t * t
+            pt = (a*x0 + b*x1 + c*x2 + d*x3, a*y0 + b*y1 + c*y2 + d*y3)
+            self._add_edge(previous, pt)
+            previous = pt
+
+    def _closePath(self):
+        current = self._getCurrentPoint()
+        if self.start is not None and current is not None:
+            self._add_edge(current, self.start)
+        self.start = None
+
+    # open contours are filled as if they were closed
+    _endPath = _closePath
+
+# functions
+
+def get_edges(glyph, tolerance=0.1):
+    """
+    Flatten the contours of a glyph into a list of edges. Components are ignored, as in ``glyph.pointInside``.
+
+    """
+    pen = FlattenPen(tolerance=tolerance)
+    for contour in glyph:
+        contour.draw(pen)
+    return pen.edges
+
+def scan_edges(edges, x_values, y_values, even_odd=False):
+    """
+    Scan a list of edges at the given sample positions.
+
+    Each scanline is intersected with all edges at once, and the bits in the line are filled from the winding numbers of the crossings to the right of each sample point (the same rule used by ``PointInsidePen``).
+
+    :param list edges: A list of ``(x0, y0, x1, y1)`` edges.
+    :param list x_values: The x positions of the sample points in each line.
+    :param list y_values: The y positions of the scanlines.
+    :param bool even_odd: Use the even-odd fill rule instead of non-zero winding.
+    :returns: A list of bit rows as NumPy arrays, one for each y value.
+
+    """
+    xs = numpy.asarray(x_values, dtype=float)
+    ys = numpy.asarray(y_values, dtype=float)
+    if not len(edges):
+        return [ numpy.zeros(len(xs), dtype=numpy.uint8) for y in ys ]
+    x0, y0, x1, y1 = numpy.asarray(edges, dtype=float).T
+    directions = numpy.where(y1 > y0, 1, -1)
+    Y = ys[:, numpy.newaxis]
+    # an edge crosses a scanline if it starts on one side and ends on the other
+    crossing = (y0 <= Y) != (y1 <= Y)
+    X = x0 + (Y - y0) * (x1 - x0) / (y1 - y0)
+    rows = []
+    for i in range(len(ys)):
+        row_mask = crossing[i]
+        row_xs = X[i][row_mask]
+        order = numpy.argsort(row_xs, kind='mergesort')
+        row_xs = row_xs[order]
+        # crossings to the right of each sample point
+        index = numpy.searchsorted(row_xs, xs, side='right')
+        if even_odd:
+            bits = (len(row_xs) - index) % 2 == 1
+        else:
+            row_dirs = directions[row_mask][order]
+            winding = numpy.zeros(len(row_xs) + 1, dtype=int)
+            winding[:-1] = numpy.cumsum(row_dirs[::-1])[::-1]
+            bits = winding[index] != 0
+        rows.append(bits.astype(numpy.uint8))
+    return rows
@@ -1,6 +1,8 @@
 # [h] hTools2.modules.sysutils
 
+import importlib
 import os
+import time
 
 # objects
 
@@ -76,13 +78,147 @@ def get_context():
         context = 'NoneLab'
     return context
 
-# def load_modules(modules_list, debug=True):
-#     for module_name in modules_list:
-#         exec 'import %s' % module_name
-#         if debug:
-#             exec 'reload(%s)' % module_name
-#         except:
-#             print 'could not import module %s' % module_name
+def time_function(function, *args, **kwargs):
+    """Call ``function`` with the given arguments a number of times (``repeat``, default 3), and return the best time in seconds."""
+    repeat = kwargs.pop('repeat', 3)
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        function(*args, **kwargs)
+        times.append(time.time() - start)
+    return min(times)
+
+#-----------------
+# multiprocessing
+#-----------------
+
+def get_workers(workers=None):
+    """Return the number of worker processes to use, defaulting to the number of CPUs."""
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    return workers
+
+def map_parallel(function, items, workers=None):
+    """
+    Apply ``function`` to all ``items`` using a pool of worker processes.
+
+    Results are returned in the same order as ``items``. With ``workers=1`` everything runs serially in the current process. ``function`` must be a module-level function (or a ``functools.partial`` of one), so it can be pickled.
+
+    """
+    items = list(items)
+    workers = min(get_workers(workers), len(items))
+    if workers <= 1:
+        return [function(item) for item in items]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, items))
+
+#----------------
+# module loading
+#----------------
+
+#: Extension default key for developer mode in RoboFont.
+develop_mode_key = 'com.hipertipo.hTools2.develop'
+
+def get_develop_mode():
+    """
+    Check if hTools2 is running in developer mode.
+
+    Developer mode is turned on with the environment variable ``HTOOLS2_DEVELOP=1``, or in RoboFont with the extension default ``com.hipertipo.hTools2.develop``.
+
+    """
+    if os.environ.get('HTOOLS2_DEVELOP') == '1':
+        return True
+    if get_context() == 'RoboFont':
+        from mojo.extensions import getExtensionDefault
+        return bool(getExtensionDefault(develop_mode_key, fallback=False))
+    return False
+
+def reload_module(module):
+    """
+    Reload a module and all loaded hTools2 modules, so changes to the code are picked up without restarting.
+
+    This only happens in developer mode (see ``get_develop_mode``); otherwise the module is returned as is, and scripts use the modules which were loaded the first time.
+
+    """
+    if not get_develop_mode():
+        return module
+    # reload dependencies first: modules are added to sys.modules before the modules they import
+    names = [ name for name in list(sys.modules.keys()) if name.startswith('hTools2.') and name != module.__name__ ]
+    for name in reversed(names):
+        if sys.modules.get(name) is not None:
+            importlib.reload(sys.modules[name])
+    return importlib.reload(module)
+
+def lazy_import(module_name):
+    """
+    Import a module lazily: the module is registered at once, but its code only runs when one of its attributes is accessed for the first time.
+
+    Returns ``None`` if the module is not installed, so optional dependencies can be checked with ``module is not None``.
+
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    import importlib.util
+    spec = importlib.util.find_spec(module_name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    loader.exec_module(module)
+    return module
+
+def get_modules_names(package='hTools2.modules'):
+    """Get the names of all modules in a package."""
+    import pkgutil
+    package_module = importlib.import_module(package)
+    return [ '%s.%s' % (package, name) for finder, name, is_package in pkgutil.iter_modules(package_module.__path__) ]
+
+def benchmark_imports(modules_names=None, max_time=None, verbose=True):
+    """
+    Measure the time needed to import each module from scratch.
+
+    Before each import, all hTools2 modules are removed from ``sys.modules``, so each time includes the hTools2 modules it depends on (but not third-party modules which are already loaded). Modules which cannot be imported in the current environment are reported as errors.
+
+    :param list modules_names: The modules to import. Defaults to all modules in ``hTools2.modules``.
+    :param float max_time: Report modules which take longer than this to import, in milliseconds.
+    :returns: A list of ``(module_name, milliseconds, error)`` tuples, slowest first.
+
+    """
+    if modules_names is None:
+        modules_names = get_modules_names()
+    loaded = dict([ (name, module) for name, module in sys.modules.items() if name.startswith('hTools2.') ])
+    results = []
+    for module_name in modules_names:
+        for name in list(sys.modules.keys()):
+            if name.startswith('hTools2.'):
+                del sys.modules[name]
+        error = None
+        start = time.time()
+        try:
+            with SuppressPrint():
+                importlib.import_module(module_name)
+        except Exception as e:
+            error = '%s: %s' % (type(e).__name__, e)
+        results.append((module_name, (time.time() - start) * 1000, error))
+    # restore previously loaded modules
+    for name in list(sys.modules.keys()):
+        if name.startswith('hTools2.'):
+            del sys.modules[name]
+    sys.modules.update(loaded)
+    results.sort(key=lambda result: result[1], reverse=True)
+    if verbose:
+        print('import times:\n')
+        for module_name, ms, error in results:
+            if error:
+                print('\t%s: %s' % (module_name, error))
+            else:
+                warning = ' ###' if max_time is not None and ms > max_time else ''
+                print('\t%s: %.1f ms%s' % (module_name, ms, warning))
+        print()
+    return results
 
 #----------------
 # RoboFont tools
@@ -0,0 +1,200 @@
+# [h] hTools2.modules.transforms
+
+'''
+Font-wide transformations which respect components.
+
+Glyphs are processed in dependency order, base glyphs before the composites which use them. Composites are never decomposed: when a base glyph is transformed together with its composite, the component transformation is adjusted so the composite keeps the same relation to it; when only the composite is transformed, the component is transformed as a whole.
+
+'''
+
+# imports
+
+import os
+import time
+import traceback
+
+from functools import partial
+
+from fontTools.misc.transform import Transform
+
+from hTools2.modules.components import get_index
+from hTools2.modules.fileutils import walk
+from hTools2.modules.sysutils import map_parallel
+
+#: Transformations which can be applied to ``.ufo`` files with ``transform_ufos``.
+transforms_names = ['scale', 'move', 'gridfit']
+
+#------------
+# scheduling
+#------------
+
+def get_levels(font, glyph_names=None):
+    '''
+    Sort glyphs by their depth in the component tree.
+
+    The first level contains glyphs without components (or with components not in ``glyph_names``), the next level contains glyphs which use only glyphs from earlier levels, and so on. Glyphs in the same level do not depend on each other. Glyphs in circular references are returned together in the last level.
+
+    :returns: A list of lists of glyph names.
+
+    '''
+    index = get_index(font)
+    if glyph_names is None:
+        glyph_names = list(font.keys())
+    glyph_names = set(glyph_names)
+    # number of base glyphs still to be processed, for each glyph
+    waiting = {}
+    for glyph_name in glyph_names:
+        waiting[glyph_name] = len([ base_glyph for base_glyph in set(index.get_components(glyph_name)) if base_glyph in glyph_names and base_glyph != glyph_name ])
+    level = sorted([ glyph_name for glyph_name, count in waiting.items() if count == 0 ])
+    levels = []
+    done = set()
+    while level:
+        levels.append(level)
+        done.update(level)
+        next_level = set()
+        for glyph_name in level:
+            for user_name in index.get_users(glyph_name):
+                if user_name in waiting and user_name not in done:
+                    waiting[user_name] -= 1
+                    if waiting[user_name] == 0:
+                        next_level.add(user_name)
+        level = sorted(next_level)
+    cycles = sorted(glyph_names - done)
+    if cycles:
+        levels.append(cycles)
+    return levels
+
+def transform_font(font, glyph_function, glyph_names=None):
+    '''
+    Apply a function to glyphs in dependency order, with font notifications held until all glyphs are done.
+
+    :param function glyph_function: A function which takes a glyph and the set of glyph names being transformed (as the keyword argument ``names``).
+    :param list glyph_names: The glyphs to transform. Defaults to all glyphs.
+
+    '''
+    if glyph_names is None:
+        glyph_names = list(font.keys())
+    names = set(glyph_names)
+    naked = font.naked() if hasattr(font, 'naked') else None
+    hold = hasattr(naked, 'holdNotifications')
+    if hold:
+        naked.holdNotifications()
+    try:
+        for level in get_levels(font, names):
+            for glyph_name in level:
+                glyph_function(font[glyph_name], names=names)
+    finally:
+        if hold:
+            naked.releaseHeldNotifications()
+    font.update()
+
+#-----------------
+# transformations
+#-----------------
+
+def transform_glyph(glyph, matrix, names, width=True):
+    '''
+    Apply an affine transformation to a glyph's contours, anchors and components (and the advance width, if ``width=True``).
+
+    Components whose base glyph is in ``names`` are transformed by ``matrix * T * matrix^-1``, so they follow the transformed base glyph; other components are transformed by ``matrix * T``.
+
+    '''
+    for contour in glyph.contours:
+        contour.transformBy(tuple(matrix))
+    for anchor in glyph.anchors:
+        anchor.x, anchor.y = matrix.transformPoint((anchor.x, anchor.y))
+    inverse = matrix.inverse()
+    for component in glyph.components:
+        component_matrix = Transform(*component.transformation)
+        if component.baseGlyph in names:
+            component_matrix = matrix.transform(component_matrix).transform(inverse)
+        else:
+            component_matrix = matrix.transform(component_matrix)
+        component.transformation = tuple(component_matrix)
+    if width:
+        glyph.width = glyph.width * matrix.xx
+
+def gridfit_glyph(glyph, grid, names, width=True):
+    '''Round all points, anchors, component offsets (and the advance width, if ``width=True``) to a grid of size ``(size_x, size_y)``.'''
+    size_x, size_y = grid
+    def round_x(x):
+        return round(float(x) / size_x) * size_x
+    def round_y(y):
+        return round(float(y) / size_y) * size_y
+    for contour in glyph.contours:
+        for point in contour.points:
+            point.x = round_x(point.x)
+            point.y = round_y(point.y)
+    for anchor in glyph.anchors:
+        anchor.x = round_x(anchor.x)
+        anchor.y = round_y(anchor.y)
+    for component in glyph.components:
+        xx, xy, yx, yy, dx, dy = component.transformation
+        component.transformation = xx, xy, yx, yy, round_x(dx), round_y(dy)
+    if width:
+        glyph.width = round_x(glyph.width)
+
+def scale_font(font, factor, glyph_names=None):
+    '''Scale glyphs by a factor ``(x, y)``, including their advance widths. Margins are scaled horizontally with the glyphs.'''
+    factor_x, factor_y = factor
+    matrix = Transform(factor_x, 0, 0, factor_y, 0, 0)
+    transform_font(font, partial(transform_glyph, matrix=matrix), glyph_names)
+
+def move_font(font, delta, glyph_names=None):
+    '''Move glyphs by a distance ``(x, y)``. Advance widths are not changed.'''
+    delta_x, delta_y = delta
+    matrix = Transform(1, 0, 0, 1, delta_x, delta_y)
+    transform_font(font, partial(transform_glyph, matrix=matrix, width=False), glyph_names)
+
+def gridfit_font(font, grid, glyph_names=None, width=True):
+    '''Round glyphs to a grid of size ``(x, y)``.'''
+    transform_font(font, partial(gridfit_glyph, grid=grid, width=width), glyph_names)
+
+#--------------
+# .ufo batches
+#--------------
+
+def transform_ufo(ufo_path, transform_name, value):
+    '''
+    Open a ``.ufo`` font, apply one of ``transforms_names`` with the given value, save and close it.
+
+    :returns: A result dict with the keys ``path``, ``time`` and ``error``.
+
+    '''
+    from hTools2.modules.batch import open_font
+    functions = { 'scale' : scale_font, 'move' : move_font, 'gridfit' : gridfit_font }
+    result = { 'path' : ufo_path, 'time' : 0, 'error' : None }
+    start = time.time()
+    try:
+        font = open_font(ufo_path)
+        functions[transform_name](font, value)
+        font.save()
+        font.close()
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['time'] = time.time() - start
+    return result
+
+def transform_ufos(ufo_paths, transform_name, value, workers=None, verbose=True):
+    '''
+    Apply a transformation to all fonts in a list of ``.ufo`` paths (or in a folder), one font per worker process.
+
+    :param str transform_name: One of ``transforms_names``.
+    :param tuple value: The scale factor, distance or grid size, as an ``(x, y)`` tuple.
+    :returns: A list of result dicts, one per font.
+
+    '''
+    if isinstance(ufo_paths, str):
+        ufo_paths = walk(ufo_paths, 'ufo')
+    ufo_paths = sorted(ufo_paths)
+    if verbose:
+        print('applying %s %s to %s fonts...\n' % (transform_name, value, len(ufo_paths)))
+    results = map_parallel(partial(transform_ufo, transform_name=transform_name, value=value), ufo_paths, workers)
+    if verbose:
+        for result in results:
+            if result['error'] is None:
+                print('\t%s (%.2f s)' % (os.path.basename(result['path']), result['time']))
+            else:
+                print('\t### %s failed:\n%s' % (os.path.basename(result['path']), result['error']))
+        print('\n...done.\n')
+    return results
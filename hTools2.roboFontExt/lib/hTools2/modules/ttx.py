@@ -3,13 +3,11 @@
 # imports
 
 import os
+import tempfile
 import time
 
 from fontTools.ttLib import TTFont
 
-import hTools2.modules.sysutils
-import importlib
-importlib.reload(hTools2.modules.sysutils)
 
 from hTools2.modules.sysutils import SuppressPrint
 from hTools2.extras.ElementTree import parse
@@ -49,18 +47,22 @@ def otf2ttx(otf_path, ttx_path=None):
         tt.verbose = False
         tt.saveXML(ttx_path)
 
+#: nameIDs which are erased to make a font not installable on desktop OSs.
+strip_nameIDs = [1, 2, 4, 16, 17, 18]
+
+#: Top dict fields of the ``CFF `` table which contain text.
+CFF_elements = ['version', 'Notice', 'Copyright', 'FullName', 'FamilyName', 'Weight']
+
 def strip_names(ttx_path):
     """Clear several nameIDs to prevent the font from being installable on desktop OSs.
 
     ttx_path: Path of the .ttx font to be modified.
 
     """
-    # nameIDs which will be erased
-    nameIDs = [1, 2, 4, 16, 17, 18]
     tree = parse(ttx_path)
     root = tree.getroot()
     for child in root.find('name'):
-        if int(child.attrib['nameID']) in nameIDs:
+        if int(child.attrib['nameID']) in strip_nameIDs:
             child.text = ' '
     tree.write(ttx_path)
 
@@ -81,16 +83,18 @@ def set_unique_name(ttx_path, unique_name):
     tree.write(ttx_path)
 
 def fix_font_info(otf_path, family_name, style_name, version_major, version_minor, clear_ttx=True):
-    ttx_path = '%s.ttx' % os.path.splitext(otf_path)[0]
+    """Set the version string, unique name and font revision of an .otf font.
+
+    The font is edited in memory and saved once. ``clear_ttx`` is kept for backwards compatibility, no .ttx file is created.
+
+    """
     timestamp = time.strftime("%Y%m%d.%H%M%S", time.localtime())
     version_string = 'Version %s.%s' % (version_major, version_minor)
     unique_name = '%s %s: %s' % (family_name, style_name, timestamp)
-    otf2ttx(otf_path, ttx_path)
-    set_version_string(ttx_path, version_string)
-    set_unique_name(ttx_path, unique_name)
-    ttx2otf(ttx_path, otf_path)
-    if clear_ttx:
-        os.remove(ttx_path)
+    tt_font = open_ttfont(otf_path)
+    set_names(tt_font, { 5 : version_string, 3 : unique_name })
+    set_head_values(tt_font, { 'fontRevision' : float('%s.%s' % (version_major, version_minor)) })
+    save_ttfont(tt_font, otf_path)
 
 def makeDSIG(tt_font):
     '''
@@ -135,11 +139,24 @@ def extract_tables(otf_path, dest_folder, table_names=['name'], split=True):
     ttfont.saveXML(info_path, tables=table_names, splitTables=split)
 
 def find_and_replace_otf(otf_path, dest_path, find_string, replace_string, tables=['name']):
+    """Find and replace text in the ``name`` and/or ``CFF `` tables of an .otf font, in memory.
+
+    Returns the number of replaced records.
+
+    """
+    tt_font = open_ttfont(otf_path)
+    count = find_and_replace_ttfont(tt_font, find_string, replace_string, tables)
+    save_ttfont(tt_font, dest_path)
+    return count
+
+def find_and_replace_otf_xml(otf_path, dest_path, find_string, replace_string, tables=['name']):
+    """Same as ``find_and_replace_otf``, but using a round-trip through a .ttx file."""
     ttx_path = '%s.ttx' % os.path.splitext(otf_path)[0]
     otf2ttx(otf_path, ttx_path)
-    find_and_replace_ttx(ttx_path, find_string, replace_string, tables)
+    count = find_and_replace_ttx(ttx_path, find_string, replace_string, tables)
     ttx2otf(ttx_path, dest_path)
     os.remove(ttx_path)
+    return count
 
 def find_and_replace_ttx(ttx_path, find_string, replace_string, tables=['name']):
     count = 0
@@ -157,7 +174,6 @@ def find_and_replace_ttx(ttx_path, find_string, replace_string, tables=['name'])
 
     # 2. modify 'CFF ' table
     if 'CFF ' in tables:
-        CFF_elements = ['version', 'Notice', 'Copyright', 'FullName', 'FamilyName', 'Weight']
         tt_font = TTFont()
         tt_font.importXML(ttx_path)
         font_dict = tt_font['CFF '].cff.topDictIndex.items[0]
@@ -171,3 +187,114 @@ def find_and_replace_ttx(ttx_path, find_string, replace_string, tables=['name'])
 
     # done
     return count
+
+#-------------------------
+# in-memory table editing
+#-------------------------
+
+def open_ttfont(otf_path):
+    """Open a font with lazy table loading: only tables which are accessed get decompiled, all others are copied as binary data when saving."""
+    with SuppressPrint():
+        tt_font = TTFont(otf_path, lazy=True)
+    return tt_font
+
+def save_ttfont(tt_font, otf_path):
+    """Save a font opened with ``open_ttfont``. The source file may be overwritten: the font is saved to a temporary file first, which replaces ``otf_path`` after the source has been closed."""
+    temp_file, temp_path = tempfile.mkstemp(suffix=os.path.splitext(otf_path)[1], dir=os.path.dirname(os.path.abspath(otf_path)))
+    os.close(temp_file)
+    try:
+        with SuppressPrint():
+            tt_font.save(temp_path)
+        tt_font.close()
+        os.replace(temp_path, otf_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def set_names(tt_font, names):
+    """Set the text of all ``name`` records with the given nameIDs.
+
+    names: A dict of nameIDs (keys) and strings (values).
+
+    """
+    for record in tt_font['name'].names:
+        if record.nameID in names:
+            record.string = names[record.nameID]
+
+def clear_names(tt_font, nameIDs=strip_nameIDs):
+    """Clear the text of all ``name`` records with the given nameIDs (a single space, like ``strip_names``)."""
+    set_names(tt_font, dict([ (nameID, ' ') for nameID in nameIDs ]))
+
+def set_head_values(tt_font, values):
+    """Set attributes of the ``head`` table, for example ``fontRevision``.
+
+    values: A dict of attribute names (keys) and values.
+
+    """
+    head = tt_font['head']
+    for attribute, value in values.items():
+        setattr(head, attribute, value)
+
+def get_CFF_top_dict(tt_font):
+    """Get the top dict of the ``CFF `` table, or ``None`` for TrueType fonts."""
+    if 'CFF ' not in tt_font:
+        return None
+    return tt_font['CFF '].cff.topDictIndex[0]
+
+def set_CFF_values(tt_font, values):
+    """Set fields of the ``CFF `` top dict, for example ``FullName`` or ``Notice``."""
+    font_dict = get_CFF_top_dict(tt_font)
+    if font_dict is not None:
+        for element, value in values.items():
+            setattr(font_dict, element, value)
+
+def find_and_replace_ttfont(tt_font, find_string, replace_string, tables=['name']):
+    """Find and replace text in the ``name`` and/or ``CFF `` tables of a ``TTFont`` object.
+
+    Returns the number of replaced records.
+
+    """
+    count = 0
+    # 1. modify 'name' table
+    if 'name' in tables:
+        for record in tt_font['name'].names:
+            text = record.toUnicode()
+            if text.find(find_string) != -1:
+                record.string = text.replace(find_string, replace_string)
+                count += 1
+    # 2. modify 'CFF ' table
+    if 'CFF ' in tables:
+        font_dict = get_CFF_top_dict(tt_font)
+        if font_dict is not None:
+            for element in CFF_elements:
+                text = getattr(font_dict, element, None)
+                if text is not None and text.find(find_string) != -1:
+                    setattr(font_dict, element, text.replace(find_string, replace_string))
+                    count += 1
+    # done
+    return count
+
+def strip_names_otf(otf_path, dest_path=None):
+    """Clear several nameIDs in an .otf font, in memory. See ``strip_names``."""
+    if dest_path is None:
+        dest_path = otf_path
+    tt_font = open_ttfont(otf_path)
+    clear_names(tt_font)
+    save_ttfont(tt_font, dest_path)
+
+def benchmark_table_editing(otf_path, find_string, replace_string, tables=['name', 'CFF '], repeat=3):
+    """Compare the time needed to find and replace text in a font in memory and through a .ttx file.
+
+    Returns a tuple with the best times in seconds, in memory and with .ttx.
+
+    """
+    from hTools2.modules.sysutils import time_function
+    dest_path = '%s_benchmark%s' % os.path.splitext(otf_path)
+    t_memory = time_function(find_and_replace_otf, otf_path, dest_path, find_string, replace_string, tables, repeat=repeat)
+    t_xml = time_function(find_and_replace_otf_xml, otf_path, dest_path, find_string, replace_string, tables, repeat=repeat)
+    os.remove(dest_path)
+    print('find and replace in %s:' % os.path.basename(otf_path))
+    print('	in memory: %.3f s' % t_memory)
+    print('	ttx round-trip: %.3f s' % t_xml)
+    print('	speedup: %.1fx\n' % (t_xml / t_memory))
+    return t_memory, t_xml
@@ -0,0 +1,275 @@
+# [h] hTools2.modules.unidata
+
+'''
+A compiled store for Unicode, character set and language data.
+
+The data in ``unicode.py``, ``languages.py`` and the ``extras/*.txt`` files is compiled once into a versioned JSON file in the ``extras`` folder. Later sessions load this file directly, and build dictionaries and sorted arrays for fast lookups. The file is compiled again whenever one of the sources changes.
+
+'''
+
+# imports
+
+import json
+import os
+import tempfile
+
+from bisect import bisect_right
+
+#: Version of the compiled data format. Files with a different version are compiled again.
+data_format_version = 1
+
+#: Folder with data source files.
+extras_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'extras')
+
+#: Name of the compiled data file.
+data_file_name = 'unicode-data.json'
+
+#: Character set files and their names in the store.
+charsets_files = [
+    ('adobe-latin-1', 'adobe-latin-1.txt'),
+    ('adobe-latin-2', 'adobe-latin-2.txt'),
+    ('adobe-latin-3', 'adobe-latin-3.txt'),
+    ('adobe-latin-4', 'adobe-latin-4.txt'),
+    ('adobe-latin-5', 'adobe-latin-5.txt'),
+    ('underware-latin-plus', 'Underware_Latin_Plus_Data_1.txt'),
+]
+
+_data = None
+
+#-----------
+# compiling
+#-----------
+
+def get_sources():
+    '''Get the paths of all data source files.'''
+    modules_dir = os.path.dirname(__file__)
+    sources = [
+        os.path.join(modules_dir, 'unicode.py'),
+        os.path.join(modules_dir, 'languages.py'),
+        os.path.join(extras_dir, 'unicode-blocks.txt'),
+        os.path.join(extras_dir, 'unicode-ranges.txt'),
+    ]
+    sources += [ os.path.join(extras_dir, file_name) for name, file_name in charsets_files ]
+    return sources
+
+def get_sources_signature():
+    '''Get the names, sizes and modification times of all source files.'''
+    signature = []
+    for source in get_sources():
+        stat = os.stat(source)
+        signature.append([os.path.basename(source), stat.st_size, int(stat.st_mtime)])
+    return signature
+
+def read_blocks(file_path):
+    '''Read Unicode blocks as a list of ``[start, end, name]`` lists.'''
+    blocks = []
+    with open(file_path, 'r', encoding='utf-8') as blocks_file:
+        for line in blocks_file:
+            if line.startswith('#') or not line.strip():
+                continue
+            block_range, block_name = line.split(';')
+            start, end = block_range.split('..')
+            blocks.append([int(start, 16), int(end, 16), block_name.strip()])
+    blocks.sort()
+    return blocks
+
+def read_OS2_ranges(file_path):
+    '''Read OS/2 Unicode ranges as a list of ``[bit, name, start, end]`` lists.'''
+    ranges = []
+    with open(file_path, 'r', encoding='utf-8') as ranges_file:
+        for line in ranges_file:
+            parts = line.split(';')
+            if len(parts) == 5:
+                bit, range_name, start, end = [ part.strip() for part in parts[:4] ]
+                ranges.append([int(bit), range_name, int(start, 16), int(end, 16)])
+    return ranges
+
+def read_adobe_charset(file_path):
+    '''Read an Adobe Latin character set as a list of ``[codepoints, glyph_name]`` lists. Sequences without a glyph name are skipped.'''
+    charset = []
+    with open(file_path, 'r', encoding='utf-8') as charset_file:
+        lines = charset_file.readlines()
+    for line in lines[1:]:
+        parts = line.rstrip('\n').split('\t')
+        if len(parts) < 3 or parts[2] == 'n/a':
+            continue
+        codepoints = [ int(codepoint, 16) for codepoint in parts[0].split(',') ]
+        charset.append([codepoints, parts[2]])
+    return charset
+
+def read_underware_data(file_path):
+    '''
+    Read the Underware Latin Plus data file.
+
+    :returns: A tuple with the character set (a list of ``[codepoints, glyph_name]`` lists) and a dict of languages (with ``iso`` code and required ``glyphs``).
+
+    '''
+    charset = []
+    languages = {}
+    section = None
+    with open(file_path, 'r', encoding='utf-8') as data_file:
+        for line in data_file:
+            if line.startswith('# Languages:'):
+                section = 'languages'
+            elif line.startswith('# Character set:'):
+                section = 'charset'
+            if line.startswith('#') or not line.strip():
+                continue
+            parts = line.rstrip('\n').split('\t')
+            if section == 'languages':
+                glyphs = parts[2].split(',') if len(parts) > 2 and parts[2] else []
+                languages[parts[0]] = { 'iso' : parts[1] if len(parts) > 1 else '', 'glyphs' : glyphs }
+            elif section == 'charset' and len(parts) > 1:
+                # glyphs without unicode may have a note in the third column
+                try:
+                    codepoints = [ int(parts[2], 16) ]
+                except (IndexError, ValueError):
+                    codepoints = []
+                charset.append([codepoints, parts[1]])
+    return charset, languages
+
+def compile_data(data_path=None):
+    '''
+    Compile all data sources into one JSON file.
+
+    If the ``extras`` folder is not writable, the file is saved in the temporary folder.
+
+    :returns: The compiled data as a dict.
+
+    '''
+    from hTools2.modules.unicode import unicode2psnames, unicodes_extra
+    from hTools2.modules.languages import diacritics_chars
+    data = {
+        'version' : data_format_version,
+        'sources' : get_sources_signature(),
+        'names' : [ [ codepoint, glyph_name ] for codepoint, glyph_name in unicode2psnames.items() ],
+        'extra' : dict([ (glyph_name, int(value, 16)) for glyph_name, value in unicodes_extra.items() ]),
+        'blocks' : read_blocks(os.path.join(extras_dir, 'unicode-blocks.txt')),
+        'OS2_ranges' : read_OS2_ranges(os.path.join(extras_dir, 'unicode-ranges.txt')),
+        'charsets' : {},
+        'languages' : {},
+    }
+    # languages: lists of lowercase and uppercase glyph names
+    for language, chars in diacritics_chars.items():
+        data['languages'][language] = [ [ unicode2psnames[ord(char)] for char in case_chars.split() if ord(char) in unicode2psnames ] for case_chars in chars ]
+    for charset_name, file_name in charsets_files:
+        file_path = os.path.join(extras_dir, file_name)
+        if charset_name == 'underware-latin-plus':
+            data['charsets'][charset_name], data['underware_languages'] = read_underware_data(file_path)
+        else:
+            data['charsets'][charset_name] = read_adobe_charset(file_path)
+    if data_path is None:
+        data_path = get_data_path()
+    try:
+        with open(data_path, 'w') as data_file:
+            json.dump(data, data_file, separators=(',', ':'))
+    except (IOError, OSError):
+        data_path = os.path.join(tempfile.gettempdir(), data_file_name)
+        with open(data_path, 'w') as data_file:
+            json.dump(data, data_file, separators=(',', ':'))
+    return data
+
+#---------
+# loading
+#---------
+
+def get_data_path():
+    '''Get the path of the compiled data file.'''
+    data_path = os.path.join(extras_dir, data_file_name)
+    if not os.path.exists(data_path):
+        temp_path = os.path.join(tempfile.gettempdir(), data_file_name)
+        if os.path.exists(temp_path):
+            return temp_path
+    return data_path
+
+def read_data(data_path):
+    '''Read a compiled data file. Returns ``None`` if the file is missing, has another format version, or its sources have changed.'''
+    if not os.path.exists(data_path):
+        return None
+    try:
+        with open(data_path, 'r') as data_file:
+            data = json.load(data_file)
+    except ValueError:
+        return None
+    if data.get('version') != data_format_version or data.get('sources') != get_sources_signature():
+        return None
+    return data
+
+def build_indexes(data):
+    '''Add lookup indexes to the compiled data.'''
+    data['name2codepoint'] = {}
+    data['codepoint2name'] = {}
+    for codepoint, glyph_name in data['names']:
+        data['codepoint2name'][codepoint] = glyph_name
+        data['name2codepoint'][glyph_name] = codepoint
+    # additional names are used only for names which are not in the main list
+    for glyph_name, codepoint in data['extra'].items():
+        data['name2codepoint'].setdefault(glyph_name, codepoint)
+    data['blocks_starts'] = [ block[0] for block in data['blocks'] ]
+    data['blocks_names'] = dict([ (block[2], (block[0], block[1])) for block in data['blocks'] ])
+    return data
+
+def get_data():
+    '''Get the compiled data with lookup indexes, compiling it first if necessary.'''
+    global _data
+    if _data is None:
+        data = read_data(get_data_path())
+        if data is None:
+            data = compile_data()
+        _data = build_indexes(data)
+    return _data
+
+#---------
+# lookups
+#---------
+
+def get_name(codepoint):
+    '''Get the glyph name for a Unicode codepoint, or ``None``.'''
+    return get_data()['codepoint2name'].get(codepoint)
+
+def get_codepoint(glyph_name):
+    '''Get the Unicode codepoint (an integer) for a glyph name, including the additional mappings in ``unicodes_extra``; or ``None``.'''
+    return get_data()['name2codepoint'].get(glyph_name)
+
+def get_block(codepoint):
+    '''Get the name of the Unicode block containing a codepoint, or ``None``.'''
+    data = get_data()
+    i = bisect_right(data['blocks_starts'], codepoint) - 1
+    if i < 0:
+        return None
+    start, end, block_name = data['blocks'][i]
+    if codepoint > end:
+        return None
+    return block_name
+
+def get_block_range(block_name):
+    '''Get the first and last codepoints of a Unicode block, or ``None``.'''
+    return get_data()['blocks_names'].get(block_name)
+
+def get_blocks():
+    '''Get all Unicode blocks as a list of ``(start, end, name)`` tuples.'''
+    return [ tuple(block) for block in get_data()['blocks'] ]
+
+def get_OS2_ranges():
+    '''Get all OS/2 Unicode ranges as a list of ``(bit, name, start, end)`` tuples.'''
+    return [ tuple(OS2_range) for OS2_range in get_data()['OS2_ranges'] ]
+
+def get_charsets_names():
+    '''Get the names of all character sets.'''
+    return [ charset_name for charset_name, file_name in charsets_files ]
+
+def get_charset(charset_name):
+    '''Get the glyph names in a character set.'''
+    return [ glyph_name for codepoints, glyph_name in get_data()['charsets'][charset_name] ]
+
+def get_charset_codepoints(charset_name):
+    '''Get the character set as a list of ``(codepoints, glyph_name)`` tuples.'''
+    return [ (tuple(codepoints), glyph_name) for codepoints, glyph_name in get_data()['charsets'][charset_name] ]
+
+def get_languages_glyphnames():
+    '''Get a dict with lists of lowercase and uppercase glyph names for each language (see ``languages.diacritics_chars``).'''
+    return get_data()['languages']
+
+def get_underware_languages():
+    '''Get a dict with the ISO code and the required glyphs for each language in the Underware Latin Plus data.'''
+    return get_data()['underware_languages']
@@ -1,15 +1,44 @@
 # [h] hTools2.modules.vmetrics
 
+# imports
+
+import os
+import plistlib
+import time
+
+from math import ceil, floor
+
+from fontTools.misc.transform import Transform
+
+from hTools2.modules.fileutils import walk
+from hTools2.modules.glyphcache import get_cache, GeometryCache
+from hTools2.modules.sysutils import map_parallel
+
+#: Font info attributes set by the family vertical metrics solver.
+family_vmetrics_attributes = [
+    'openTypeHheaAscender',
+    'openTypeHheaDescender',
+    'openTypeHheaLineGap',
+    'openTypeOS2TypoAscender',
+    'openTypeOS2TypoDescender',
+    'openTypeOS2TypoLineGap',
+    'openTypeOS2WinAscent',
+    'openTypeOS2WinDescent',
+]
+
 # functions
 
 def get_min_max_y(font, r=None):
+    cache = get_cache(font)
     ymax_ = []
     ymin_ = []
-    for g in font:
-        if g.box is not None:
-            xmin, ymin, xmax, ymax = g.box
+    for glyph_name in font.keys():
+        box = cache.bounds(glyph_name)
+        if box is not None:
+            xmin, ymin, xmax, ymax = box
             ymax_.append(ymax)
             ymin_.append(ymin)
+    cache.save()
     ymax = max(ymax_)
     ymin = min(ymin_)
     if r is not None:
@@ -24,27 +53,33 @@ def set_vmetrics(font, xheight, capheight, ascender, descender, emsquare, gridsi
     font.info.ascender = ascender * gridsize
     font.info.unitsPerEm = emsquare * gridsize
 
-def auto_set_vmetrics(font, ascender, descender, ymax, ymin):
-    hhea_ascender = ymax
-    hhea_descender = ymin
-    hhea_linegap = 0
+def get_vmetrics_values(ascender, descender, ymax, ymin):
+    """
+    Calculate hhea and OS/2 vertical metrics from the ascender and descender (both as positive values) and the lowest and highest points in the font.
+
+    """
     os2_win_ascent = ymax
     os2_win_descent = abs(ymin)
     os2_typo_ascender = ascender
-    os2_typo_descender = descender
-    os2_typo_linegap = (os2_win_ascent + abs(os2_win_descent)) - (os2_typo_ascender + abs(os2_typo_descender))
+    os2_typo_descender = -abs(descender)
+    return {
+        'openTypeHheaAscender' : ymax,
+        'openTypeHheaDescender' : ymin,
+        'openTypeHheaLineGap' : 0,
+        'openTypeOS2TypoAscender' : os2_typo_ascender,
+        'openTypeOS2TypoDescender' : os2_typo_descender,
+        'openTypeOS2TypoLineGap' : (os2_win_ascent + os2_win_descent) - (os2_typo_ascender + abs(os2_typo_descender)),
+        'openTypeOS2WinAscent' : os2_win_ascent,
+        'openTypeOS2WinDescent' : os2_win_descent,
+    }
+
+def auto_set_vmetrics(font, ascender, descender, ymax, ymin):
     # set data
     font.info.ascender = ascender
     font.info.descender = -descender
     font.info.unitsPerEm = ascender + descender
-    font.info.openTypeHheaAscender = hhea_ascender
-    font.info.openTypeHheaDescender = hhea_descender
-    font.info.openTypeHheaLineGap = hhea_linegap
-    font.info.openTypeOS2TypoAscender = os2_typo_ascender
-    font.info.openTypeOS2TypoDescender = os2_typo_descender
-    font.info.openTypeOS2TypoLineGap = os2_typo_linegap
-    font.info.openTypeOS2WinAscent = os2_win_ascent
-    font.info.openTypeOS2WinDescent = os2_win_descent
+    for attribute, value in get_vmetrics_values(ascender, descender, ymax, ymin).items():
+        setattr(font.info, attribute, value)
     # round vmetrics to integer
     round_vmetrics(font)
 
@@ -84,3 +119,139 @@ def set_vmetrics_lineheight(font, ratio=0.75, line_space=None):
         ymax = ascender * line_space
     # set font metrics
     auto_set_vmetrics(font, ascender, descender, ymax, ymin)
+
+#-----------------
+# family vmetrics
+#-----------------
+
+def get_glyph_bounds(cache, glyph_name, bounds, _parents=()):
+    """
+    Get the bounding box of a glyph, including its components.
+
+    Contour bounds come from the geometry cache; component bounds are the bounds of the base glyph (including its own components), transformed. For components which are only scaled and moved, this is exact; for rotated or skewed components, the transformed bounding box is used.
+
+    :param dict bounds: Bounds already calculated for other glyphs, which are reused and updated.
+    :returns: A tuple ``(xmin, ymin, xmax, ymax)``, or ``None`` for empty glyphs.
+
+    """
+    if glyph_name in bounds:
+        return bounds[glyph_name]
+    entry = cache.contour_bounds(glyph_name)
+    box = tuple(entry['bounds']) if entry['bounds'] is not None else None
+    for base_glyph, transformation in entry['components']:
+        if base_glyph in _parents or not cache.has_glyph(base_glyph):
+            continue
+        base_box = get_glyph_bounds(cache, base_glyph, bounds, _parents + (glyph_name,))
+        if base_box is None:
+            continue
+        matrix = Transform(*transformation)
+        xmin, ymin, xmax, ymax = base_box
+        points = [ matrix.transformPoint((x, y)) for x in (xmin, xmax) for y in (ymin, ymax) ]
+        if box is not None:
+            points += [ (box[0], box[1]), (box[2], box[3]) ]
+        xs = [ x for x, y in points ]
+        ys = [ y for x, y in points ]
+        box = min(xs), min(ys), max(xs), max(ys)
+    bounds[glyph_name] = box
+    return box
+
+def get_ufo_extremes(ufo_path):
+    """
+    Find the lowest and highest points in a ``.ufo`` font, reading ``.glif`` files directly and caching the measurements next to the font (see ``glyphcache.get_cache_path``).
+
+    :returns: A dict with the font ``path``, its ``ascender``, ``descender`` and ``unitsPerEm``, the ``ymin`` and ``ymax`` values as ``(value, glyph_name)`` tuples, the number of ``glyphs`` and the ``time`` in seconds.
+
+    """
+    start = time.time()
+    cache = GeometryCache(ufo_path=ufo_path)
+    bounds = {}
+    ymin, ymax = None, None
+    for glyph_name in sorted(cache.glyph_names()):
+        box = get_glyph_bounds(cache, glyph_name, bounds)
+        if box is None:
+            continue
+        if ymin is None or box[1] < ymin[0]:
+            ymin = box[1], glyph_name
+        if ymax is None or box[3] > ymax[0]:
+            ymax = box[3], glyph_name
+    cache.close()
+    info = {}
+    info_path = os.path.join(ufo_path, 'fontinfo.plist')
+    if os.path.exists(info_path):
+        with open(info_path, 'rb') as info_file:
+            info = plistlib.load(info_file)
+    return {
+        'path' : ufo_path,
+        'ascender' : info.get('ascender'),
+        'descender' : info.get('descender'),
+        'unitsPerEm' : info.get('unitsPerEm'),
+        'ymin' : ymin,
+        'ymax' : ymax,
+        'glyphs' : len(bounds),
+        'time' : time.time() - start,
+    }
+
+def get_family_vmetrics(ufo_paths, workers=None, r=None):
+    """
+    Calculate one consistent set of vertical metrics for all fonts in a family.
+
+    Each font is measured in a separate process, and the results are reduced to the lowest and highest points in the whole family. Typo ascender and descender are the largest values found in the fonts' info.
+
+    :param list ufo_paths: A list of ``.ufo`` paths, or a folder containing ``.ufo`` fonts.
+    :param int r: Round the extremes outwards to multiples of ``r``.
+    :returns: A report dict with the font info ``values``, the ``ymin`` and ``ymax`` extremes as ``(value, ufo_path, glyph_name)`` tuples, and the results for each font in ``fonts``. If no font has outlines, ``values``, ``ymin`` and ``ymax`` are ``None``.
+
+    """
+    if isinstance(ufo_paths, str):
+        ufo_paths = walk(ufo_paths, 'ufo')
+    results = map_parallel(get_ufo_extremes, sorted(ufo_paths), workers)
+    measured = [ result for result in results if result['ymin'] is not None ]
+    if not measured:
+        return { 'values' : None, 'ymin' : None, 'ymax' : None, 'fonts' : results }
+    ymin = min([ (result['ymin'][0], result['path'], result['ymin'][1]) for result in measured ])
+    ymax = max([ (result['ymax'][0], result['path'], result['ymax'][1]) for result in measured ])
+    ymin_value, ymax_value = ymin[0], ymax[0]
+    if r is not None:
+        ymin_value = int(floor(float(ymin_value) / r) * r)
+        ymax_value = int(ceil(float(ymax_value) / r) * r)
+    ascender = max([ result['ascender'] for result in results if result['ascender'] is not None ] or [ymax_value])
+    descender = max([ abs(result['descender']) for result in results if result['descender'] is not None ] or [abs(ymin_value)])
+    values = get_vmetrics_values(ascender, descender, ymax_value, ymin_value)
+    values = dict([ (attribute, int(round(value))) for attribute, value in values.items() ])
+    return { 'values' : values, 'ymin' : ymin, 'ymax' : ymax, 'fonts' : results }
+
+def print_family_vmetrics(report):
+    """Print a family vertical metrics report: the values, the glyphs responsible for the extremes, and the extremes in each font."""
+    print('family vertical metrics (%s fonts)...\n' % len(report['fonts']))
+    if report['values'] is None:
+        print('\tno outlines found in any font.')
+        print('\n...done.\n')
+        return
+    for attribute in family_vmetrics_attributes:
+        print('\t%s: %s' % (attribute, report['values'][attribute]))
+    print()
+    for extreme in ['ymax', 'ymin']:
+        value, ufo_path, glyph_name = report[extreme]
+        print('\t%s: %s (%s in %s)' % (extreme, value, glyph_name, os.path.basename(ufo_path)))
+    print()
+    for result in report['fonts']:
+        if result['ymin'] is None:
+            print('\t%s: no outlines' % os.path.basename(result['path']))
+            continue
+        print('\t%s: %s (%s) / %s (%s), %s glyphs in %.2f s' % (os.path.basename(result['path']), result['ymin'][0], result['ymin'][1], result['ymax'][0], result['ymax'][1], result['glyphs'], result['time']))
+    print('\n...done.\n')
+
+def set_family_vmetrics(ufo_paths, report):
+    """Write the values from a family vertical metrics report into the font info of all fonts."""
+    from hTools2.modules.batch import open_font
+    if report['values'] is None:
+        print('no vertical metrics to set, no outlines found in any font.\n')
+        return
+    if isinstance(ufo_paths, str):
+        ufo_paths = walk(ufo_paths, 'ufo')
+    for ufo_path in ufo_paths:
+        font = open_font(ufo_path)
+        for attribute in family_vmetrics_attributes:
+            setattr(font.info, attribute, report['values'][attribute])
+        font.save()
+        font.close()
@@ -17,8 +17,7 @@ import shutil
 
 from base64 import b64encode
 
-from hTools2.modules.ttx import otf2ttx, ttx2otf
-from hTools2.modules.ttx import strip_names as ttx_strip_names
+from hTools2.modules.ttx import strip_names_otf
 from hTools2.modules.sysutils import SuppressPrint
 
 try:
@@ -38,13 +37,8 @@ def generate_webfont(otf_path, strip_names=False, woff=True, woff_path=None, wof
 
     # strip font infos (webfont obfuscation)
     if strip_names:
-        ttx_path = '%s.ttx' % file_name
-        otf2ttx(otf_path, ttx_path)
-        ttx_strip_names(ttx_path)
-        otf_path_tmp = '%s_tmp.otf' % file_name
-        ttx2otf(ttx_path, otf_path_tmp)
-        if clear_ttx:
-            os.remove(ttx_path)
+        otf_path_tmp = '%s_tmp%s' % (file_name, extension)
+        strip_names_otf(otf_path, otf_path_tmp)
         otf_path = otf_path_tmp
 
     # generate woff